@@ -0,0 +1,404 @@
+import asyncio
+import atexit
+import threading
+import urllib.parse
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from playwright.async_api import async_playwright
+
+
+# User agent needed, so MobyGames doesn't consider Playwright as a bot. It's set once for every browser context instead
+# of being passed as an extra header on every single page
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/140.0.0.0 Safari/537.36"
+)
+
+
+# Only these kinds of requests are let through by default. The scrapers read the text of the page and a few "src"
+# attributes, so images, fonts, stylesheets and media are never needed
+DEFAULT_ALLOWED_RESOURCE_TYPES = ["document", "script", "xhr", "fetch"]
+
+# Requests to any other domain (ads, analytics, trackers, CDNs of third parties) are blocked
+DEFAULT_ALLOWED_DOMAINS = ["mobygames.com", "wikipedia.org", "wikimedia.org"]
+
+# A blocked request is never made, so its size can't be measured. These are the rough average sizes used to estimate
+# how much data the blocking saved
+DEFAULT_BLOCKED_SIZE_ESTIMATES = {
+    "image": 40_000,
+    "font": 60_000,
+    "stylesheet": 30_000,
+    "media": 200_000,
+    "script": 50_000,
+    "other": 5_000,
+}
+
+
+# Counts what happened to the requests of one page - how many were let through (and how many bytes they downloaded) and
+# how many were blocked
+class PageTraffic:
+    def __init__(self, size_estimates: dict):
+        self.size_estimates = size_estimates
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.estimated_bytes_saved = 0
+
+    def block(self, resource_type: str):
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        self.estimated_bytes_saved += self.size_estimates.get(resource_type, self.size_estimates.get("other", 0))
+
+    def as_dict(self) -> dict:
+        return {
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
+
+    def report(self, url: str):
+        by_type = ", ".join(f"{k} {v}" for k, v in sorted(self.blocked_by_type.items())) or "none"
+        print(f"[BROWSER POOL] {url}: {self.allowed_requests} request(s) allowed "
+              f"({self.allowed_bytes / 1024:.1f} KB), {self.blocked_requests} blocked ({by_type}), "
+              f"~{self.estimated_bytes_saved / 1024:.1f} KB saved.")
+
+
+def _host_allowed(url: str, domains) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme in ("data", "blob", "about"):
+        return True
+    host = (parts.hostname or "").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+# One launched Chromium together with the contexts opened in it. The number of pages opened is counted so that the
+# browser can be restarted after a while, since long-living Chromium processes tend to slowly eat more and more memory.
+# Once it has served enough pages it's "draining" - it doesn't take any new leases, and the slots given back in the
+# meantime are parked until the last lease ends and the browser is recycled
+class _PooledBrowser:
+    def __init__(self, index: int, contexts_per_browser: int):
+        self.index = index
+        self.contexts_per_browser = contexts_per_browser
+        self.browser = None
+        self.contexts = []
+        self.pages_opened = 0
+        self.active_leases = 0
+        self.draining = False
+        self.parked = []
+        self.lock = asyncio.Lock()
+
+    # Every slot points at one of the contexts by its index, so a browser that didn't get all of them isn't usable
+    def is_healthy(self) -> bool:
+        return (self.browser is not None and self.browser.is_connected()
+                and len(self.contexts) == self.contexts_per_browser)
+
+
+# A single "seat" in the pool. Every browser has a few of them (one per context) and a scraper leases one seat at a time
+class _ContextSlot:
+    def __init__(self, entry: _PooledBrowser, index: int):
+        self.entry = entry
+        self.index = index
+
+    @property
+    def context(self):
+        return self.entry.contexts[self.index]
+
+
+# Launching Chromium from scratch was the biggest fixed cost of every search and every game import, so instead of doing
+# that for every request the app keeps a few browsers warm for the whole lifetime of the process. Playwright objects are
+# bound to the event loop they were created in, and the views used to call asyncio.run() which creates a brand-new loop
+# every time. Because of that the pool owns its own event loop running in a background thread and every scraper
+# coroutine is sent there with run() (or run_scraper() below). Each request then only opens a fresh page in one of the
+# already running browser contexts
+class BrowserPool:
+    def __init__(self, browsers: int = 2, contexts_per_browser: int = 2, recycle_after: int = 200,
+                 headless: bool = True, allowed_resource_types=None, allowed_domains=None,
+                 blocked_size_estimates=None):
+        self.browsers = max(1, browsers)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.recycle_after = max(1, recycle_after)
+        self.headless = headless
+        self.allowed_resource_types = set(allowed_resource_types or DEFAULT_ALLOWED_RESOURCE_TYPES)
+        self.allowed_domains = [d.lower() for d in (allowed_domains or DEFAULT_ALLOWED_DOMAINS)]
+        self.blocked_size_estimates = blocked_size_estimates or DEFAULT_BLOCKED_SIZE_ESTIMATES
+        self._traffic = {}
+
+        self._loop = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self._playwright = None
+        self._entries = []
+        self._owners = {}
+        self._free = None
+        self._start_lock = None
+        self._started = False
+
+    # The event loop of the pool lives in a daemon thread, so it doesn't stop Django from shutting down
+    def _ensure_loop(self):
+        with self._thread_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="scraper-loop", daemon=True)
+                thread.start()
+                self._loop = loop
+                self._thread = thread
+        return self._loop
+
+    @property
+    def loop(self):
+        return self._ensure_loop()
+
+    # Runs the coroutine on the pool's event loop and blocks the calling thread until it's done. This is what replaced
+    # asyncio.run() in the views
+    def run(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    # The same for the async views. The coroutine still runs on the pool's event loop (Playwright objects can only be
+    # used on the loop they were created on), but the view awaits it instead of blocking a thread, so the server's loop
+    # keeps serving other requests in the meantime
+    async def arun(self, coro):
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _start(self):
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._started:
+                return
+            print(f"[BROWSER POOL] Starting {self.browsers} browser(s) with "
+                  f"{self.contexts_per_browser} context(s) each.")
+            self._playwright = await async_playwright().start()
+            self._free = asyncio.Queue()
+            for i in range(self.browsers):
+                entry = _PooledBrowser(i, self.contexts_per_browser)
+                try:
+                    await self._launch(entry)
+                except Exception as e:
+                    # The browser will be launched again by the health check when it's leased for the first time
+                    print(f"[BROWSER POOL] Could not launch browser #{i}: {e}")
+                self._entries.append(entry)
+                for j in range(self.contexts_per_browser):
+                    self._free.put_nowait(_ContextSlot(entry, j))
+            self._started = True
+
+    async def _launch(self, entry: _PooledBrowser):
+        entry.browser = await self._playwright.chromium.launch(headless=self.headless)
+        entry.contexts = []
+        try:
+            for _ in range(self.contexts_per_browser):
+                context = await entry.browser.new_context(user_agent=USER_AGENT)
+                # Every request of every page in the context goes through _route first
+                await context.route("**/*", self._route)
+                entry.contexts.append(context)
+                self._owners[id(context)] = entry
+        except Exception:
+            # A browser with only some of its contexts would hand out slots pointing at nothing, so it's closed right
+            # away and the next health check launches it again
+            await self._close(entry)
+            raise
+        entry.pages_opened = 0
+
+    async def _close(self, entry: _PooledBrowser):
+        for context in entry.contexts:
+            self._owners.pop(id(context), None)
+        if entry.browser is not None:
+            try:
+                await entry.browser.close()
+            except Exception as e:
+                print(f"[BROWSER POOL] Error while closing browser #{entry.index}: {e}")
+        entry.browser = None
+        entry.contexts = []
+
+    # Closes the browser of the entry and launches a new one in its place. It's used both when the browser has crashed
+    # and when it has served enough pages
+    async def _recycle(self, entry: _PooledBrowser, reason: str):
+        print(f"[BROWSER POOL] Recycling browser #{entry.index} ({reason}).")
+        await self._close(entry)
+        await self._launch(entry)
+
+    # Leases one browser context from the pool. If all of them are in use, the caller waits for the first one that is
+    # given back. Before the context is handed over the browser it belongs to goes through a quick health check
+    @asynccontextmanager
+    async def context(self):
+        await self._start()
+        while True:
+            slot = await self._free.get()
+            entry = slot.entry
+            if not entry.draining:
+                break
+            # A draining browser refuses new leases, otherwise a busy pool would keep it alive forever
+            entry.parked.append(slot)
+        try:
+            async with entry.lock:
+                if not entry.is_healthy():
+                    await self._recycle(entry, "health check failed")
+
+            entry.active_leases += 1
+            try:
+                yield slot.context
+            finally:
+                entry.active_leases -= 1
+                if entry.pages_opened >= self.recycle_after:
+                    entry.draining = True
+                # The browser is recycled only when nobody is using it anymore
+                async with entry.lock:
+                    if entry.draining and entry.active_leases == 0:
+                        try:
+                            await self._recycle(entry, f"served {entry.pages_opened} pages")
+                        except Exception as e:
+                            print(f"[BROWSER POOL] Recycling browser #{entry.index} failed: {e}")
+                        entry.draining = False
+                        for parked in entry.parked:
+                            self._free.put_nowait(parked)
+                        entry.parked = []
+        finally:
+            if entry.draining:
+                entry.parked.append(slot)
+            else:
+                self._free.put_nowait(slot)
+
+    # The request interception. Only the allowed resource types from the allowed domains get through, everything else
+    # is aborted before anything is downloaded
+    async def _route(self, route):
+        request = route.request
+        try:
+            traffic = self._traffic.get(request.frame.page)
+        except Exception:
+            traffic = None
+
+        if request.resource_type in self.allowed_resource_types and _host_allowed(request.url, self.allowed_domains):
+            if traffic is not None:
+                traffic.allowed_requests += 1
+            await route.continue_()
+        else:
+            if traffic is not None:
+                traffic.block(request.resource_type)
+            await route.abort("blockedbyclient")
+
+    def _count_response(self, page, response):
+        traffic = self._traffic.get(page)
+        if traffic is None:
+            return
+        try:
+            traffic.allowed_bytes += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
+
+    # Opens a new page in an already leased context. Used by the scrapers that want to open more than one page inside
+    # the same context
+    async def new_page(self, context):
+        page = await context.new_page()
+        self._traffic[page] = PageTraffic(self.blocked_size_estimates)
+        page.on("response", lambda response: self._count_response(page, response))
+        entry = self._owners.get(id(context))
+        if entry is not None:
+            entry.pages_opened += 1
+            if entry.pages_opened >= self.recycle_after:
+                entry.draining = True
+        return page
+
+    # How many requests of the page were allowed and blocked so far
+    def traffic(self, page) -> dict:
+        traffic = self._traffic.get(page)
+        return traffic.as_dict() if traffic is not None else {}
+
+    # Closes the page opened with new_page and prints how much the request blocking saved on it
+    async def close_page(self, page):
+        traffic = self._traffic.pop(page, None)
+        if traffic is not None:
+            traffic.report(page.url)
+        try:
+            await page.close()
+        except Exception as e:
+            print(f"[BROWSER POOL] Error while closing the page: {e}")
+
+    # The most common way of using the pool - lease a context, open one fresh page in it and close that page afterwards
+    @asynccontextmanager
+    async def page(self):
+        async with self.context() as context:
+            page = await self.new_page(context)
+            try:
+                yield page
+            finally:
+                await self.close_page(page)
+
+    # Basic information about the state of the pool, useful when checking whether the browsers are alive
+    def stats(self) -> dict:
+        return {
+            "started": self._started,
+            "free_contexts": self._free.qsize() if self._free is not None else 0,
+            "browsers": [
+                {
+                    "index": entry.index,
+                    "connected": entry.is_healthy(),
+                    "pages_opened": entry.pages_opened,
+                    "active_leases": entry.active_leases,
+                    "draining": entry.draining,
+                }
+                for entry in self._entries
+            ],
+        }
+
+    async def _shutdown(self):
+        for entry in self._entries:
+            if entry.browser is not None:
+                try:
+                    await entry.browser.close()
+                except Exception:
+                    pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._started = False
+
+    def shutdown(self, timeout: float = 10):
+        if self._loop is None or not self._started:
+            return
+        try:
+            self.run(self._shutdown(), timeout=timeout)
+        except Exception as e:
+            print(f"[BROWSER POOL] Error during shutdown: {e}")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# The pool is process-wide, so it's created only once, with the sizes taken from settings.py
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool(
+                    browsers=getattr(settings, "SCRAPER_POOL_BROWSERS", 2),
+                    contexts_per_browser=getattr(settings, "SCRAPER_POOL_CONTEXTS_PER_BROWSER", 2),
+                    recycle_after=getattr(settings, "SCRAPER_POOL_RECYCLE_AFTER_PAGES", 200),
+                    allowed_resource_types=getattr(settings, "SCRAPER_ALLOWED_RESOURCE_TYPES", None),
+                    allowed_domains=getattr(settings, "SCRAPER_ALLOWED_DOMAINS", None),
+                    blocked_size_estimates=getattr(settings, "SCRAPER_BLOCKED_SIZE_ESTIMATES", None),
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+# Shortcut used by the views in place of asyncio.run(...)
+def run_scraper(coro, timeout=None):
+    return get_browser_pool().run(coro, timeout=timeout)
+
+
+# Shortcut used by the async views
+async def arun_scraper(coro):
+    return await get_browser_pool().arun(coro)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Compilations
+from .utils import scrape_game_info
+
+
+# The list of games in a compilation basically never changes, so it's kept for COMPILATION_MAX_AGE_DAYS before the
+# page is scraped again
+def _max_age() -> timedelta:
+    return timedelta(days=getattr(settings, "COMPILATION_MAX_AGE_DAYS", 30))
+
+
+def get_fresh_compilation(url: str):
+    return Compilations.objects.filter(mobygames_url=url, scraped_at__gte=timezone.now() - _max_age()).first()
+
+
+# Saves (or refreshes) the compilation scraped by scrape_game_info
+def save_compilation(url: str, data: dict) -> Compilations:
+    compilation, _ = Compilations.objects.update_or_create(
+        mobygames_url=url,
+        defaults={
+            "title": (data.get("title") or "Unknown Compilation")[:255],
+            "included_games": data.get("included_games", []),
+            "scraped_at": timezone.now(),
+        },
+    )
+    return compilation
+
+
+# What the compilation page gets - the same keys compilation_view has always returned
+def compilation_payload(compilation: Compilations) -> dict:
+    return {"title": compilation.title, "included_games": compilation.included_games}
+
+
+# The compilation from the database when it's fresh enough, otherwise it's scraped and saved. None means that the page
+# isn't a compilation (or couldn't be scraped)
+async def get_compilation(url: str):
+    compilation = await sync_to_async(get_fresh_compilation)(url)
+    if compilation is None:
+        data = await scrape_game_info(url, settings.MEDIA_ROOT)
+        if not data or not data.get("is_compilation"):
+            return None
+        compilation = await sync_to_async(save_compilation)(url, data)
+    return compilation_payload(compilation)
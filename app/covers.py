@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+
+from .fetchers import get_http_client
+from .outbound import get_scheduler
+
+
+# The covers used to be saved as one full-size JPEG named after the game's title (media/game_icons/<title>_icon.jpg), so
+# two games with the same name overwrote each other's cover and every list of games sent the whole image to the browser
+# even for the tiny tiles. Now every cover is saved under the hash of its content (media/covers/ab/abcdef.../), so the
+# same image downloaded for two games is stored only once, and it's saved in every size of COVER_SIZES, each of them
+# in WebP and JPEG. The database keeps the path of the large JPEG and the views pick the size they need with cover_url
+COVER_DIR = "covers"
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+_stored_path = re.compile(rf"^{COVER_DIR}/([0-9a-f]{{2}})/([0-9a-f]{{64}})/")
+
+
+def cover_sizes() -> dict:
+    return getattr(settings, "COVER_SIZES", {"small": (96, 128), "medium": (400, 520), "large": (640, 900)})
+
+
+def _save_variant(img: Image.Image, path: str, fmt: str):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if fmt == "webp":
+        img.save(tmp_path, "WEBP", quality=getattr(settings, "COVER_WEBP_QUALITY", 80), method=4)
+    else:
+        img.save(tmp_path, "JPEG", quality=getattr(settings, "COVER_JPEG_QUALITY", 85), optimize=True,
+                 progressive=True)
+    os.replace(tmp_path, path)
+
+
+# Covers with transparency (PNG, GIF) are put on a white background, otherwise the transparent parts turn black
+def _to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+# Saves the downloaded cover in all the sizes and formats and returns the path (relative to the media folder) which goes
+# into Games.cover_image. When the same image is already stored, nothing is decoded or written again. The sizes are
+# boxes the cover is shrunk into with its proportions kept, a cover smaller than the box is never enlarged. Every file
+# is written under a temporary name first, so two imports of the same cover at once (in two processes or two
+# threads of the cover pool below) can't leave a broken one behind.
+# This is CPU work (decoding and encoding), so it shouldn't be called directly on the event loop
+def store_cover(data: bytes, media_root: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    rel_dir = f"{COVER_DIR}/{digest[:2]}/{digest}"
+    out_dir = os.path.join(media_root, COVER_DIR, digest[:2], digest)
+    sizes = cover_sizes()
+    expected = [os.path.join(out_dir, f"{size}.{ext}") for size in sizes for ext in FORMATS]
+    if all(os.path.exists(path) for path in expected):
+        return f"{rel_dir}/large.jpg"
+
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(BytesIO(data)) as original:
+        img = _to_rgb(original)
+    for size, box in sizes.items():
+        variant = img.copy()
+        variant.thumbnail(box, Image.LANCZOS)
+        for ext in FORMATS:
+            _save_variant(variant, os.path.join(out_dir, f"{size}.{ext}"), ext)
+    print(f"[COVERS] Stored the cover {digest[:12]} ({img.width}x{img.height}) in {len(sizes)} sizes.")
+    return f"{rel_dir}/large.jpg"
+
+
+_executor = None
+
+
+# Decoding and encoding the covers is CPU work which would stop every other scraper on the event loop for the whole
+# time, so it runs in its own small pool of threads. Pillow releases the GIL while it decodes, resizes and encodes, so
+# threads are enough (and the images don't have to be copied into another process). The pool is bounded by
+# COVER_WORKERS, so a compilation import can't start dozens of covers at once
+def get_cover_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, getattr(settings, "COVER_WORKERS", 2)),
+                                       thread_name_prefix="covers")
+    return _executor
+
+
+# Downloads the cover with the shared HTTP client (through the outbound scheduler, like every other request of the
+# scrapers) and stores it in the cover store, without blocking the event loop at any point. Returns the same path as
+# store_cover
+async def download_cover(url: str, media_root: str) -> str:
+    resp = await get_scheduler().get(get_http_client(), url)
+    resp.raise_for_status()
+    return await asyncio.get_running_loop().run_in_executor(get_cover_executor(), store_cover, resp.content,
+                                                            media_root)
+
+
+# The path of the cover in the given size and format. The covers saved before the store existed (game_icons/...) have
+# only the one image, so that one is used for every size
+def cover_path(value, size: str = "large", fmt: str = None) -> str | None:
+    if not value:
+        return None
+    value = str(value)
+    match = _stored_path.match(value)
+    if not match:
+        return value
+    if size not in cover_sizes():
+        size = "large"
+    fmt = fmt or getattr(settings, "COVER_FORMAT", "webp")
+    return f"{COVER_DIR}/{match.group(1)}/{match.group(2)}/{size}.{fmt}"
+
+
+# The same as cover_path, but as the url the browser loads
+def cover_url(value, size: str = "large", fmt: str = None) -> str | None:
+    path = cover_path(value, size, fmt)
+    return f"{settings.MEDIA_URL}{path}" if path else None
@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import httpx
+from bs4 import BeautifulSoup
+from django.conf import settings
+from PIL import Image
+
+from .browser_pool import USER_AGENT
+
+
+# The fixtures use this placeholder instead of the address of the server, so the same pages work on any port
+BASE_URL_PLACEHOLDER = "{{BASE_URL}}"
+
+REAL_MOBYGAMES_URL = "https://www.mobygames.com"
+REAL_WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+
+NO_RESULTS_PAGE = """<html><body><main><h1>Search results</h1>
+<p>No results found for that query</p></main></body></html>"""
+
+
+# The name under which the search for the given query is saved, e.g. "The Witcher 3" -> "the-witcher-3"
+def query_slug(query: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (query or "").lower()).strip("-") or "empty"
+
+
+# The title is quoted, because titles like "The Witcher 3: Wild Hunt" are not valid file names on Windows
+def _article_file(title: str) -> str:
+    return urllib.parse.quote(title.replace(" ", "_"), safe="_()',!-.") + ".html"
+
+
+# The MediaWiki API capitalizes the first letter of every title (and treats spaces and underscores the same way)
+def _normalize_title(title: str) -> str:
+    title = title.replace("_", " ").strip()
+    return title[:1].upper() + title[1:]
+
+
+# Splits the html of the whole article into the sections the way the "parse" API does it. Every <div class="mw-heading">
+# starts a new section, which ends at the next heading of the same or a higher level
+def article_sections(html: str) -> list:
+    soup = BeautifulSoup(html, "html.parser")
+    root = soup.select_one("div.mw-parser-output") or soup.body or soup
+    headings = root.find_all("div", class_="mw-heading", recursive=False)
+
+    sections = []
+    for index, div in enumerate(headings, start=1):
+        tag = div.find(re.compile(r"^h[1-6]$"))
+        if tag is None:
+            continue
+        level = int(tag.name[1])
+        parts = [str(div)]
+        for sibling in div.find_next_siblings():
+            if sibling.name == "div" and "mw-heading" in (sibling.get("class") or []):
+                other = sibling.find(re.compile(r"^h[1-6]$"))
+                if other is not None and int(other.name[1]) <= level:
+                    break
+            parts.append(str(sibling))
+        sections.append({
+            "toclevel": level - 1,
+            "level": str(level),
+            "line": tag.get_text(strip=True),
+            "number": str(index),
+            "index": str(index),
+            "anchor": tag.get("id") or tag.get_text(strip=True).replace(" ", "_"),
+            "html": "".join(parts),
+        })
+    return sections
+
+
+# A stand-in for MobyGames and Wikipedia, so the scrapers can be run and measured without the network. It serves the
+# pages saved in the fixture directory:
+#
+#   mobygames/search/<query slug>.html  - the search page (the "no results" page when there isn't one)
+#   mobygames/game/<id>.html            - the game and compilation pages, /game/<id>/<anything>/
+#   wikipedia/<Article_Title>.html      - the html of the whole article
+#
+# On top of the articles it answers the few MediaWiki API requests the WikipediaClient makes (which titles exist, the
+# list of sections and the html of one section). Every /images/... url returns a generated image, so the covers and the
+# thumbnails are downloaded the way they normally are. Every response waits "latency" seconds (plus a random "jitter"),
+# which imitates the time the real websites take to answer. With "rate_limit" the server behaves like a website
+# protecting itself from bursts - the requests above that many in the last second are answered with 429 and Retry-After.
+#
+# With record=True a page which isn't in the fixtures yet is downloaded from the real website and saved, so the set of
+# pages can be extended by simply running the scrapers against the server once
+class FakeSites:
+    def __init__(self, fixture_dir: str = None, latency: float = 0.0, jitter: float = 0.0, record: bool = False,
+                 rate_limit: int = None):
+        self.fixture_dir = fixture_dir or getattr(
+            settings, "FAKE_SITES_FIXTURE_DIR", os.path.join(settings.BASE_DIR, "app", "fixtures", "fake_sites")
+        )
+        self.latency = latency
+        self.jitter = jitter
+        self.record = record
+        self.rate_limit = rate_limit
+        self._recent = deque()
+        self.base_url = ""
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._images = {}
+        self._server = None
+        self._thread = None
+
+    def _path(self, *parts) -> str:
+        return os.path.join(self.fixture_dir, *parts)
+
+    def _read(self, *parts):
+        path = self._path(*parts)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read().replace(BASE_URL_PLACEHOLDER, self.base_url)
+
+    def _write(self, html: str, *parts):
+        path = self._path(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"[FAKE SITES] Recorded {os.path.relpath(path, self.fixture_dir)}")
+
+    # The recorded MobyGames pages link to the fake server - the images are replaced with generated ones and the links
+    # to MobyGames become relative
+    def _localize(self, html: str) -> str:
+        soup = BeautifulSoup(html, "html.parser")
+        for script in soup.find_all("script"):
+            script.decompose()
+        for img in soup.find_all("img", src=True):
+            name = os.path.basename(urllib.parse.urlsplit(img["src"]).path) or "image.jpg"
+            img["src"] = f"{BASE_URL_PLACEHOLDER}/images/{name}"
+        for a in soup.find_all("a", href=True):
+            if a["href"].startswith(REAL_MOBYGAMES_URL):
+                a["href"] = a["href"][len(REAL_MOBYGAMES_URL):] or "/"
+        return str(soup)
+
+    def _record_mobygames(self, path_and_query: str, *parts):
+        if not self.record:
+            return None
+        resp = httpx.get(REAL_MOBYGAMES_URL + path_and_query, headers={"User-Agent": USER_AGENT},
+                         follow_redirects=True, timeout=30)
+        if resp.status_code != 200:
+            return None
+        self._write(self._localize(resp.text), *parts)
+        return self._read(*parts)
+
+    def _record_article(self, title: str):
+        if not self.record:
+            return None
+        resp = httpx.get(REAL_WIKIPEDIA_API_URL, headers={"User-Agent": USER_AGENT}, timeout=30, params={
+            "action": "parse", "page": title, "prop": "text", "redirects": "1", "disableeditsection": "1",
+            "disabletoc": "1", "format": "json", "formatversion": "2",
+        })
+        data = resp.json().get("parse") if resp.status_code == 200 else None
+        if not data:
+            return None
+        self._write(data["text"], "wikipedia", _article_file(title))
+        return self._read("wikipedia", _article_file(title))
+
+    def search_page(self, query: str):
+        slug = query_slug(query)
+        html = self._read("mobygames", "search", f"{slug}.html")
+        if html is None:
+            html = self._record_mobygames("/search/?q=" + urllib.parse.quote(query), "mobygames", "search",
+                                          f"{slug}.html")
+        return html or NO_RESULTS_PAGE
+
+    def game_page(self, game_id: str, path: str):
+        html = self._read("mobygames", "game", f"{game_id}.html")
+        if html is None:
+            html = self._record_mobygames(path, "mobygames", "game", f"{game_id}.html")
+        return html
+
+    def article(self, title: str):
+        title = _normalize_title(title)
+        html = self._read("wikipedia", _article_file(title))
+        if html is None:
+            html = self._record_article(title)
+        return html
+
+    def api(self, params: dict) -> dict:
+        action = params.get("action")
+        if action == "query":
+            titles = [t for t in params.get("titles", "").split("|") if t]
+            normalized = []
+            pages = []
+            for title in titles:
+                canonical = _normalize_title(title)
+                if canonical != title:
+                    normalized.append({"from": title, "to": canonical})
+                if self.article(canonical) is None:
+                    pages.append({"ns": 0, "title": canonical, "missing": True})
+                else:
+                    pages.append({"pageid": abs(hash(canonical)) % 10 ** 8, "ns": 0, "title": canonical})
+            return {"batchcomplete": True, "query": {"normalized": normalized, "pages": pages}}
+
+        if action == "parse":
+            title = _normalize_title(params.get("page", ""))
+            html = self.article(title)
+            if html is None:
+                return {"error": {"code": "missingtitle", "info": "The page you specified doesn't exist."}}
+            sections = article_sections(html)
+            if params.get("prop") == "sections":
+                return {"parse": {"title": title, "sections": [
+                    {k: v for k, v in s.items() if k != "html"} for s in sections
+                ]}}
+            if "section" in params:
+                section = next((s for s in sections if s["index"] == params["section"]), None)
+                text = section["html"] if section else ""
+            else:
+                text = html
+            return {"parse": {"title": title, "text": f'<div class="mw-parser-output">{text}</div>'}}
+
+        return {"error": {"code": "badvalue", "info": f"Unsupported action '{action}'."}}
+
+
+    # Every image is generated once and kept in memory. The name of the file decides its color, so different
+    # thumbnails are actually different images
+    def image(self, name: str) -> bytes:
+        if name not in self._images:
+            color = tuple(int(c, 16) for c in re.findall("..", format(abs(hash(name)) % 0xFFFFFF, "06x")))
+            size = (64, 80) if "thumb" in name else (300, 400)
+            buf = BytesIO()
+            Image.new("RGB", size, color).save(buf, "JPEG", quality=85)
+            self._images[name] = buf.getvalue()
+        return self._images[name]
+
+    def count(self, kind: str):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    # False when there were already rate_limit requests in the last second
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 1:
+                self._recent.popleft()
+            if self.rate_limit and len(self._recent) >= self.rate_limit:
+                self.requests["throttled"] = self.requests.get("throttled", 0) + 1
+                return False
+            self._recent.append(now)
+            return True
+
+    def wait(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    # Starts the server in a background thread and returns its address. Port 0 means any free port
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        sites = self
+
+        class Handler(_FakeSitesHandler):
+            pass
+
+        Handler.sites = sites
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-sites", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # The settings which point the scrapers at this server
+    def settings(self) -> dict:
+        return {
+            "MOBYGAMES_URL": self.base_url,
+            "WIKIPEDIA_API_URL": f"{self.base_url}/w/api.php",
+            "WIKIPEDIA_ARTICLE_URL": f"{self.base_url}/wiki/",
+            "WIKIPEDIA_FIXTURE_MODE": "off",
+        }
+
+
+class _FakeSitesHandler(BaseHTTPRequestHandler):
+    sites: FakeSites = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # Every page gets an ETag (the hash of its content) and a request with the same If-None-Match gets an empty 304,
+    # the way the real websites answer the revalidation of the HTTP cache
+    def _send(self, status: int, body, content_type: str = "text/html; charset=utf-8", headers: dict = None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        if status == 200:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                self.sites.count("not modified")
+                status, body = 304, b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        sites = self.sites
+        if not sites.allow():
+            return self._send(429, "Too many requests", headers={"Retry-After": "1"})
+        parts = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        path = parts.path
+        sites.wait()
+
+        try:
+            if path.rstrip("/") == "/search":
+                sites.count("search")
+                return self._send(200, sites.search_page(params.get("q", "")))
+
+            match = re.match(r"^/game/(\d+)(/|$)", path)
+            if match:
+                sites.count("game")
+                html = sites.game_page(match.group(1), self.path)
+                return self._send(200, html) if html else self._send(404, "Not found")
+
+            if path == "/w/api.php":
+                sites.count("wikipedia api")
+                return self._send(200, json.dumps(sites.api(params)), "application/json")
+
+            if path.startswith("/wiki/"):
+                sites.count("wikipedia article")
+                html = sites.article(urllib.parse.unquote(path[len("/wiki/"):]))
+                return self._send(200, html) if html else self._send(404, "Not found")
+
+            if path.startswith("/images/"):
+                sites.count("image")
+                return self._send(200, sites.image(os.path.basename(path)), "image/jpeg")
+        except Exception as e:
+            print(f"[FAKE SITES] Error while serving {self.path}: {e}")
+            return self._send(500, "Internal error")
+
+        sites.count("not found")
+        self._send(404, "Not found")
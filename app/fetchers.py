@@ -0,0 +1,211 @@
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+from django.conf import settings
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from .browser_pool import USER_AGENT, get_browser_pool
+from .http_cache import cached_get
+from .outbound import get_scheduler
+from .parsers import make_soup
+
+
+# What every fetcher returns - the final url (after redirects), the status code and the html of the page. The html is
+# parsed (with lxml, see make_soup in parsers.py) only when someone actually asks for the soup and then it's kept, so
+# it's never parsed twice
+class FetchResult:
+    def __init__(self, url: str, html: str, status: int = 200, via: str = "", timings: dict = None,
+                 traffic: dict = None, content_hash: str = None, cache: str = None):
+        self.url = url
+        self.html = html or ""
+        self.status = status
+        self.via = via
+        self.timings = timings or {}
+        self.traffic = traffic or {}
+        # The hash of the page and what the HTTP cache did with it (see http_cache.py), only for the HTTP fetcher
+        self.content_hash = content_hash
+        self.cache = cache
+        self._soup = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = make_soup(self.html)
+        return self._soup
+
+
+# Most of the pages on MobyGames and Wikipedia are rendered on the server, so they can be downloaded with a simple HTTP
+# request. The client is shared by every scraper, which means the connections to both websites stay open between the
+# requests. All the scrapers run on the event loop of the browser pool, so one client is enough for the whole process
+_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.9",
+            },
+            follow_redirects=True,
+            timeout=httpx.Timeout(getattr(settings, "SCRAPER_HTTP_TIMEOUT", 20)),
+            limits=httpx.Limits(
+                max_connections=getattr(settings, "SCRAPER_HTTP_MAX_CONNECTIONS", 20),
+                max_keepalive_connections=getattr(settings, "SCRAPER_HTTP_MAX_KEEPALIVE", 10),
+            ),
+        )
+    return _client
+
+
+# Describes when a page has everything a scraper needs - when at least one of the css selectors can be found on it or
+# when it contains the given text (e.g. "No results found for that query"). The same object is used in two ways: the
+# HTTP result is checked with it after it has been parsed, and the browser waits exactly until it's satisfied instead of
+# waiting for "networkidle" and then sleeping for a fixed amount of time
+class ReadyWhen:
+    def __init__(self, *selectors, text: str = None):
+        self.selectors = selectors
+        self.text = text
+
+    def __call__(self, soup: BeautifulSoup) -> bool:
+        if any(soup.select_one(sel) is not None for sel in self.selectors):
+            return True
+        return bool(self.text) and self.text in soup.get_text(" ")
+
+    def locator(self, page):
+        locator = None
+        for sel in self.selectors:
+            locator = page.locator(sel) if locator is None else locator.or_(page.locator(sel))
+        if self.text:
+            by_text = page.get_by_text(self.text)
+            locator = by_text if locator is None else locator.or_(by_text)
+        return locator
+
+    async def wait(self, page, timeout: float):
+        locator = self.locator(page)
+        if locator is not None:
+            await locator.first.wait_for(state="attached", timeout=timeout)
+
+    def __repr__(self):
+        return f"ReadyWhen({', '.join(self.selectors)}{', text=' + repr(self.text) if self.text else ''})"
+
+
+# The base class of all the fetchers. "ready" is a function taking the parsed page and returning True when the page
+# has everything the scraper needs
+class BaseFetcher:
+    name = "base"
+
+    async def fetch(self, url: str, ready=None) -> FetchResult | None:
+        raise NotImplementedError
+
+
+# Plain HTTP fetcher using the shared httpx client. The request waits for its turn in the outbound scheduler (see
+# outbound.py), so the time measured includes the waiting for the rate limit of the host. The pages are revalidated
+# against the on-disk HTTP cache (see http_cache.py), so a page which hasn't changed isn't downloaded again
+class HttpFetcher(BaseFetcher):
+    name = "http"
+
+    async def fetch(self, url: str, ready=None) -> FetchResult | None:
+        start = time.perf_counter()
+        resp = await cached_get(get_http_client(), url)
+        return FetchResult(str(resp.url), resp.text, status=resp.status_code, via=self.name,
+                           timings={"http": time.perf_counter() - start},
+                           content_hash=resp.extensions.get("content_hash"), cache=resp.extensions.get("cache"))
+
+
+# The old way of getting the pages - a real browser. It leases a page from the browser pool, so it's still much cheaper
+# than it used to be, but it's only used when the static html doesn't have what the scraper needs. The browser no longer
+# waits for the network to go quiet and then sleeps for a second or two "just in case". The html is taken as soon as
+# the elements described by "ready" are on the page. If they never appear, the page is returned the way it is after the
+# timeout and the scraper deals with the missing elements itself
+class BrowserFetcher(BaseFetcher):
+    name = "browser"
+
+    async def fetch(self, url: str, ready=None) -> FetchResult | None:
+        timeout = getattr(settings, "SCRAPER_READY_TIMEOUT", 20000)
+        timings = {}
+        pool = get_browser_pool()
+        async with pool.page() as page:
+            start = time.perf_counter()
+            # Only the page itself is counted by the rate limit, its scripts and xhr requests aren't
+            await get_scheduler().acquire(url)
+            wait_until = "domcontentloaded" if isinstance(ready, ReadyWhen) else "load"
+            response = await page.goto(url, timeout=30000, wait_until=wait_until)
+            timings["navigate"] = time.perf_counter() - start
+
+            if isinstance(ready, ReadyWhen):
+                start = time.perf_counter()
+                try:
+                    await ready.wait(page, timeout)
+                except PlaywrightTimeoutError:
+                    print(f"[FETCHER] {ready} not satisfied after {timeout} ms on {url}")
+                timings["ready"] = time.perf_counter() - start
+
+            html = await page.content()
+            status = response.status if response else 200
+            return FetchResult(page.url, html, status=status, via=self.name, timings=timings,
+                               traffic=pool.traffic(page))
+
+
+# Tries the fetchers one after another. The first result that has everything the scraper needs wins. A 404 is treated
+# as the final answer, because a missing page will not appear after rendering it in the browser either (this is the
+# usual case of a game without its own article on Wikipedia)
+class FallbackFetcher(BaseFetcher):
+    name = "fallback"
+
+    def __init__(self, fetchers):
+        self.fetchers = list(fetchers)
+
+    async def fetch(self, url: str, ready=None) -> FetchResult | None:
+        last = None
+        # The time spent in the fetchers that didn't succeed is added to the result, so it's visible in the timings
+        timings = {}
+        for fetcher in self.fetchers:
+            try:
+                result = await fetcher.fetch(url, ready=ready)
+            except Exception as e:
+                print(f"[FETCHER] {fetcher.name} failed for {url}: {e}")
+                continue
+
+            if result is None:
+                continue
+            timings.update(result.timings)
+            result.timings = dict(timings)
+            last = result
+            if result.status == 404:
+                return result
+            if result.ok and (ready is None or ready(result.soup)):
+                return result
+            print(f"[FETCHER] {fetcher.name} result for {url} is incomplete (status {result.status}), "
+                  f"trying the next fetcher.")
+        return last
+
+
+FETCHERS = {
+    "http": HttpFetcher,
+    "browser": BrowserFetcher,
+}
+
+
+_fetcher = None
+
+
+# Builds the fetcher chain from SCRAPER_FETCHERS in settings.py. By default it's the plain HTTP fetcher with the browser
+# as a fallback, but e.g. ["browser"] brings back the old behaviour
+def get_fetcher() -> BaseFetcher:
+    global _fetcher
+    if _fetcher is None:
+        names = getattr(settings, "SCRAPER_FETCHERS", ["http", "browser"])
+        fetchers = []
+        for name in names:
+            if name not in FETCHERS:
+                raise ValueError(f"Unknown fetcher '{name}' in SCRAPER_FETCHERS")
+            fetchers.append(FETCHERS[name]())
+        _fetcher = fetchers[0] if len(fetchers) == 1 else FallbackFetcher(fetchers)
+    return _fetcher
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import httpx
+from django.conf import settings
+
+from .outbound import get_scheduler
+
+
+# What happened to a request that went through the cache:
+#   "revalidated" - the server answered 304, the saved body was used and nothing was downloaded
+#   "unchanged"   - the server sent the whole page again (it doesn't support the validators), but it's the same
+#   "changed"     - the page is different from the saved one
+#   "new"         - the page wasn't in the cache yet
+CACHE_STATES = ("revalidated", "unchanged", "changed", "new")
+
+_stats = {state: 0 for state in CACHE_STATES}
+_stats["bytes_saved"] = 0
+_last_prune = 0.0
+
+
+def content_hash(body) -> str:
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body or b"").hexdigest()
+
+
+def _cache_dir() -> str:
+    return getattr(settings, "SCRAPER_HTTP_CACHE_DIR", os.path.join(settings.BASE_DIR, ".cache", "http"))
+
+
+def _key(url: str, params: dict = None) -> str:
+    key = url + "?" + json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _paths(key: str):
+    base = os.path.join(_cache_dir(), key[:2], key)
+    return base + ".json", base + ".body"
+
+
+def _load(key: str):
+    meta_path, body_path = _paths(key)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+# The body is written first and the metadata (with the hash of that body) after it, both through a temporary file, so
+# a crash or two processes saving the same page at once never leave a half-written entry behind
+def _save(key: str, meta: dict, body: bytes):
+    meta_path, body_path = _paths(key)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    suffix = f".{os.getpid()}.{id(body)}.tmp"
+    with open(body_path + suffix, "wb") as f:
+        f.write(body)
+    os.replace(body_path + suffix, body_path)
+    with open(meta_path + suffix, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + suffix, meta_path)
+
+
+# Removes the entries which haven't been used for SCRAPER_HTTP_CACHE_MAX_AGE seconds
+def prune_cache(max_age: int) -> int:
+    removed = 0
+    cutoff = time.time() - max_age
+    for root, _, files in os.walk(_cache_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    if removed:
+        print(f"[HTTP CACHE] Removed {removed} old file(s).")
+    return removed
+
+
+def _schedule_prune():
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < 60 * 60:
+        return
+    _last_prune = now
+    max_age = getattr(settings, "SCRAPER_HTTP_CACHE_MAX_AGE", 30 * 24 * 60 * 60)
+    asyncio.get_running_loop().run_in_executor(None, prune_cache, max_age)
+
+
+# The pages the scrapers download are kept on the disk together with their validators (ETag and Last-Modified) and the
+# hash of their content. The next time the same page is needed, the request is sent with If-None-Match and
+# If-Modified-Since, and when the server answers 304 the saved page is used without downloading it again. Every
+# response gets the hash of its content and the state of the cache (see CACHE_STATES above) in resp.extensions, so the
+# scrapers can tell whether anything changed since the last time. With SCRAPER_HTTP_CACHE_ENABLED = False it's a plain
+# request through the outbound scheduler. Reading and writing the entries is blocking file I/O, so it's done in a thread
+# and never on the event loop the scrapers share
+async def cached_get(client: httpx.AsyncClient, url: str, params: dict = None, **kwargs) -> httpx.Response:
+    if not getattr(settings, "SCRAPER_HTTP_CACHE_ENABLED", True):
+        resp = await get_scheduler().get(client, url, params=params, **kwargs)
+        resp.extensions["content_hash"] = content_hash(resp.content)
+        return resp
+
+    key = _key(url, params)
+    meta, body = await asyncio.to_thread(_load, key)
+    if meta is not None and meta.get("sha256") != content_hash(body):
+        meta, body = None, None
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    resp = await get_scheduler().get(client, url, params=params, headers=headers, **kwargs)
+    _schedule_prune()
+
+    if resp.status_code == 304 and meta is not None:
+        _stats["revalidated"] += 1
+        _stats["bytes_saved"] += len(body)
+        # The saved page is returned as if it was downloaded again. The metadata is saved once more, so the entry
+        # counts as recently used
+        meta["checked_at"] = time.time()
+        await asyncio.to_thread(_save, key, meta, body)
+        cached = httpx.Response(meta.get("status", 200), content=body, headers=meta.get("headers", {}),
+                                request=resp.request)
+        cached.extensions["content_hash"] = meta["sha256"]
+        cached.extensions["cache"] = "revalidated"
+        return cached
+
+    digest = content_hash(resp.content)
+    resp.extensions["content_hash"] = digest
+    if resp.status_code != 200:
+        return resp
+
+    if meta is None:
+        state = "new"
+    else:
+        state = "unchanged" if meta.get("sha256") == digest else "changed"
+    _stats[state] += 1
+    resp.extensions["cache"] = state
+
+    await asyncio.to_thread(_save, key, {
+        "url": str(resp.url),
+        "status": resp.status_code,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        # Only the headers the scrapers read are kept (the encoding of the text and the type of the content)
+        "headers": {k: v for k, v in resp.headers.items() if k.lower() == "content-type"},
+        "sha256": digest,
+        "checked_at": time.time(),
+    }, resp.content)
+    return resp
+
+
+def http_cache_stats() -> dict:
+    requests = sum(_stats[s] for s in CACHE_STATES)
+    return {
+        **_stats,
+        "requests": requests,
+        "not_modified_rate": round(_stats["revalidated"] / requests, 3) if requests else 0.0,
+    }
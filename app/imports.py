@@ -0,0 +1,198 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .compilations import get_compilation, get_fresh_compilation, save_compilation
+from .models import Games, GamePlots, ImportLock
+from .utils import scrape_game_info
+
+# The imports currently running in this process, by MobyGames url. All of them run on the event loop of the browser
+# pool, so a plain dictionary is enough (nothing else touches it from another thread)
+_inflight = {}
+
+
+# What every import returns. "status" is one of "created", "existing", "compilation" or "failed"
+class ImportResult:
+    def __init__(self, status: str, game_id: int = None):
+        self.status = status
+        self.game_id = game_id
+
+    def __repr__(self):
+        return f"ImportResult({self.status}, game_id={self.game_id})"
+
+
+def _find_game(url: str):
+    return Games.objects.filter(mobygames_url=url).order_by("id").first()
+
+
+# Saves the scraped game and its plot. The scraper could have followed the link to the base game, so the url of the
+# base game is checked once more before anything is created. mobygames_url is unique, so when another process saved the
+# same game in the meantime get_or_create returns that game instead of creating a second one, and the plot is saved in
+# the same transaction, so there is never a game without its plot
+def _save_game(data: dict) -> ImportResult:
+    url = data.get("mobygames_url")
+    existing = _find_game(url)
+    if existing:
+        return ImportResult("existing", existing.id)
+
+    for key, val in list(data.items()):
+        if isinstance(val, Decimal):
+            data[key] = float(val)
+
+    fields = {
+        "title": data.get('title') or 'Unknown',
+        "release_date": data.get('release_date'),
+        "genre": data.get('genre'),
+        "studio": data.get('studio'),
+        "score": data.get('score'),
+        "cover_image": data.get('cover_image'),
+        "wikipedia_url": data.get('wikipedia_url'),
+    }
+
+    with transaction.atomic():
+        if url:
+            game, created = Games.objects.get_or_create(mobygames_url=url, defaults=fields)
+            if not created:
+                return ImportResult("existing", game.id)
+        else:
+            game = Games.objects.create(mobygames_url=None, **fields)
+
+        GamePlots.objects.create(
+            game_id=game,
+            full_plot=data.get('full_plot') or '',
+            summary=data.get('summary') or ''
+        )
+    return ImportResult("created", game.id)
+
+
+async def _scrape_and_save(url: str) -> ImportResult:
+    existing = await sync_to_async(_find_game)(url)
+    if existing:
+        return ImportResult("existing", existing.id)
+    if await sync_to_async(get_fresh_compilation)(url):
+        return ImportResult("compilation")
+
+    data = await scrape_game_info(url, media_root=settings.MEDIA_ROOT, save_image=True)
+    if not data:
+        return ImportResult("failed")
+    if data.get("is_compilation"):
+        # The list of the games is kept, so the compilation page doesn't have to scrape the same page again
+        await sync_to_async(save_compilation)(url, data)
+        return ImportResult("compilation")
+    return await sync_to_async(_save_game)(data)
+
+
+# The lock shared by all the worker processes is a row in ImportLocks. Its url is unique, so when several processes
+# insert the row at the same moment the database lets only one of them do it. The lock expires after IMPORT_LOCK_TIMEOUT
+# seconds in case the process holding it dies, and the next process which wants it removes the expired row first
+def _acquire_lock(url: str, token: str, timeout: int) -> bool:
+    now = timezone.now()
+    ImportLock.objects.filter(url=url, expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            ImportLock.objects.create(url=url, token=token, expires_at=now + timedelta(seconds=timeout))
+        return True
+    except IntegrityError:
+        return False
+
+
+# The lock is removed only when it's still ours (it might have expired and been taken by someone else)
+def _release_lock(url: str, token: str):
+    ImportLock.objects.filter(url=url, token=token).delete()
+
+
+def _lock_held(url: str) -> bool:
+    return ImportLock.objects.filter(url=url, expires_at__gte=timezone.now()).exists()
+
+
+async def _import_with_lock(url: str) -> ImportResult:
+    lock_timeout = getattr(settings, "IMPORT_LOCK_TIMEOUT", 300)
+    poll_interval = getattr(settings, "IMPORT_LOCK_POLL_INTERVAL", 0.5)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+
+    while True:
+        if await sync_to_async(_acquire_lock)(url, token, lock_timeout):
+            try:
+                return await _scrape_and_save(url)
+            finally:
+                await sync_to_async(_release_lock)(url, token)
+
+        # Another process is importing this game, so this one waits until the game shows up in the database. If the
+        # lock disappears without the game (the other import failed), this process tries to import it itself
+        print(f"[IMPORT] '{url}' is being imported by another process, waiting for it.")
+        while await sync_to_async(_lock_held)(url):
+            existing = await sync_to_async(_find_game)(url)
+            if existing:
+                return ImportResult("existing", existing.id)
+            if time.monotonic() > deadline:
+                return ImportResult("failed")
+            await asyncio.sleep(poll_interval)
+
+
+# Imports the game from the given MobyGames url exactly once, no matter how many users click it at the same time. The
+# first caller runs the scraper and everybody else who asks for the same url waits for its result instead of running
+# the browser and the summarizer again and creating the same game twice. Inside one process the callers share one
+# task, and between the processes the lock in the database decides who does the work
+async def import_game(url: str) -> ImportResult:
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_import_with_lock(url))
+        _inflight[url] = task
+        task.add_done_callback(lambda _: _inflight.pop(url, None))
+    else:
+        print(f"[IMPORT] '{url}' is already being imported, joining the running import.")
+    # shield() makes sure one impatient caller can't cancel the import for all the others
+    return await asyncio.shield(task)
+
+
+def _existing_games(urls) -> dict:
+    return dict(Games.objects.filter(mobygames_url__in=urls).values_list("mobygames_url", "id"))
+
+
+# Imports every game included in the compilation at the same time (at most COMPILATION_IMPORT_CONCURRENCY of them at
+# once, they all share the browser pool anyway), so the whole collection takes about as long as its slowest game. The
+# games which are already in the database are skipped. Every change of a game's status is passed to on_progress, which
+# is how the job shows the progress of every game separately. None means that the page isn't a compilation
+async def import_compilation(url: str, on_progress=None, concurrency: int = None):
+    payload = await get_compilation(url)
+    if payload is None:
+        return None
+
+    games = [{"title": g.get("title"), "url": g.get("url"), "year": g.get("year"), "status": "pending",
+              "game_id": None} for g in payload["included_games"]]
+    existing = await sync_to_async(_existing_games)([g["url"] for g in games])
+    for game in games:
+        if game["url"] in existing:
+            game["status"] = "existing"
+            game["game_id"] = existing[game["url"]]
+
+    async def report():
+        if on_progress:
+            await on_progress(games)
+
+    semaphore = asyncio.Semaphore(concurrency or getattr(settings, "COMPILATION_IMPORT_CONCURRENCY", 4))
+
+    async def one(game):
+        async with semaphore:
+            game["status"] = "importing"
+            await report()
+            try:
+                result = await import_game(game["url"])
+                game["status"] = result.status
+                game["game_id"] = result.game_id
+            except Exception as e:
+                print(f"[IMPORT] Could not import '{game['url']}': {e}")
+                game["status"] = "failed"
+            await report()
+
+    await report()
+    await asyncio.gather(*(one(g) for g in games if g["status"] == "pending"))
+    return {"title": payload["title"], "games": games}
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .compilations import get_compilation
+from .imports import import_compilation, import_game
+from .models import ScrapeJob, ScrapeJobWatcher, UserModel
+from .outbound import PRIORITY_BULK, with_priority
+
+
+ACTIVE_STATUSES = [ScrapeJob.STATUS_QUEUED, ScrapeJob.STATUS_RUNNING]
+
+
+# The key of a job while it's queued or running (see ScrapeJob.active_key)
+def active_key(kind: str, url: str) -> str:
+    return hashlib.sha256(f"{kind}\0{url}".encode("utf-8")).hexdigest()
+
+
+# Creates the job for the given url. When the same url is already waiting in the queue or being scraped, that job is
+# returned instead (and the user is added to its watchers), so clicking the same game many times doesn't fill the queue
+# with copies of it. active_key is unique, so when two requests create the job at the same moment the database lets
+# only one of them do it and the other one returns that job
+def enqueue_job(kind: str, url: str, user=None) -> ScrapeJob:
+    user = user if isinstance(user, UserModel) else None
+    key = active_key(kind, url)
+    job = ScrapeJob.objects.filter(active_key=key).first()
+    if job:
+        return _watch(job, user)
+    try:
+        with transaction.atomic():
+            job = ScrapeJob.objects.create(kind=kind, url=url, active_key=key, user_id=user)
+    except IntegrityError:
+        job = ScrapeJob.objects.filter(active_key=key).first()
+        if job:
+            return _watch(job, user)
+        raise
+    print(f"[JOBS] Queued job {job.id}: {kind} {url}")
+    return job
+
+
+def _watch(job: ScrapeJob, user) -> ScrapeJob:
+    if user is not None and job.user_id_id != user.id:
+        ScrapeJobWatcher.objects.get_or_create(job_id=job, user_id=user)
+    return job
+
+
+# The status of a job is only shown to the user who queued it, the users waiting for it and the admins. The url of a
+# job and the games it imported are nobody else's business
+def can_see_job(job: ScrapeJob, user) -> bool:
+    if getattr(user, "is_admin", False):
+        return True
+    if not isinstance(user, UserModel):
+        return False
+    return job.user_id_id == user.id or job.watchers.filter(user_id=user).exists()
+
+
+# What the status endpoint returns. The result of the job is merged into the response, so the frontend gets exactly the
+# same keys it used to get from the views (new_game_id, redirect_compilation, included_games...). The import of a whole
+# compilation also keeps the status of every game in there while it's still running
+def job_status(job: ScrapeJob) -> dict:
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+    }
+    if job.result and job.status in (ScrapeJob.STATUS_DONE, ScrapeJob.STATUS_RUNNING):
+        data.update(job.result)
+    return data
+
+
+# Every worker process has its own id, which is saved in the jobs it takes
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# Takes up to "limit" of the oldest queued jobs and marks them as running by the given worker. "skip_locked" lets many
+# workers take jobs at the same time without two of them getting the same job
+def claim_jobs(limit: int, worker_id: str = None) -> list:
+    close_old_connections()
+    with transaction.atomic():
+        ids = list(
+            ScrapeJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ScrapeJob.STATUS_QUEUED)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        if ids:
+            now = timezone.now()
+            ScrapeJob.objects.filter(id__in=ids).update(
+                status=ScrapeJob.STATUS_RUNNING, progress="Started", started_at=now, worker_id=worker_id,
+                heartbeat_at=now, attempts=F("attempts") + 1,
+            )
+    return list(ScrapeJob.objects.filter(id__in=ids).order_by("created_at"))
+
+
+# The worker says that it's still alive and running its jobs
+def heartbeat(worker_id: str, job_ids: list) -> int:
+    if not job_ids:
+        return 0
+    close_old_connections()
+    return ScrapeJob.objects.filter(id__in=job_ids, worker_id=worker_id, status=ScrapeJob.STATUS_RUNNING).update(
+        heartbeat_at=timezone.now()
+    )
+
+
+# Jobs left "running" by a worker which was killed are put back into the queue (or marked as failed after
+# SCRAPE_JOB_MAX_ATTEMPTS tries). A live worker moves the heartbeat of its jobs every SCRAPE_JOB_HEARTBEAT_INTERVAL
+# seconds, however long they take, so only the jobs whose worker hasn't done it for SCRAPE_JOB_STALE_AFTER seconds are
+# taken from it
+def requeue_stale_jobs() -> int:
+    stale_after = getattr(settings, "SCRAPE_JOB_STALE_AFTER", 2 * 60)
+    max_attempts = getattr(settings, "SCRAPE_JOB_MAX_ATTEMPTS", 3)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    with transaction.atomic():
+        # The jobs started before the workers had the heartbeat only have started_at
+        stale = ScrapeJob.objects.select_for_update(skip_locked=True).filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+            status=ScrapeJob.STATUS_RUNNING,
+        )
+        ids = list(stale.values_list("id", flat=True))
+        stale = ScrapeJob.objects.filter(id__in=ids)
+        failed = stale.filter(attempts__gte=max_attempts).update(
+            status=ScrapeJob.STATUS_FAILED, error="The worker stopped while running this job.",
+            finished_at=timezone.now(), active_key=None,
+        )
+        requeued = stale.filter(status=ScrapeJob.STATUS_RUNNING).update(
+            status=ScrapeJob.STATUS_QUEUED, progress="Requeued", worker_id=None, heartbeat_at=None,
+        )
+    if failed or requeued:
+        print(f"[JOBS] Requeued {requeued} and failed {failed} stale job(s).")
+    return requeued
+
+
+# Removes the jobs which finished more than SCRAPE_JOB_KEEP_FOR seconds ago, otherwise every import ever made would
+# stay in the table
+def prune_finished_jobs() -> int:
+    keep_for = getattr(settings, "SCRAPE_JOB_KEEP_FOR", 7 * 24 * 60 * 60)
+    cutoff = timezone.now() - timedelta(seconds=keep_for)
+    _, deleted = ScrapeJob.objects.filter(
+        status__in=[ScrapeJob.STATUS_DONE, ScrapeJob.STATUS_FAILED], finished_at__lt=cutoff
+    ).delete()
+    # The count of the deleted rows includes their watchers
+    removed = deleted.get(ScrapeJob._meta.label, 0)
+    if removed:
+        print(f"[JOBS] Removed {removed} old job(s).")
+    return removed
+
+
+def _update(job_id: int, **fields):
+    ScrapeJob.objects.filter(id=job_id).update(**fields)
+
+
+async def _finish(job: ScrapeJob, status: str, result: dict = None, error: str = None, game_id: int = None):
+    await sync_to_async(_update)(job.id, status=status, result=result, error=error, game_id_id=game_id,
+                                 progress="Finished" if status == ScrapeJob.STATUS_DONE else "Failed",
+                                 finished_at=timezone.now(), active_key=None)
+    print(f"[JOBS] Job {job.id} {status}" + (f": {error}" if error else ""))
+
+
+async def _run_details(job: ScrapeJob):
+    await sync_to_async(_update)(job.id, progress="Scraping the game")
+    result = await import_game(job.url)
+    if result.status == "failed":
+        await _finish(job, ScrapeJob.STATUS_FAILED, error="Scraper failed")
+    elif result.status == "compilation":
+        await _finish(job, ScrapeJob.STATUS_DONE, result={"redirect_compilation": True})
+    else:
+        key = "new_game_id" if result.status == "created" else "redirect_game_id"
+        await _finish(job, ScrapeJob.STATUS_DONE, result={key: result.game_id}, game_id=result.game_id)
+
+
+async def _run_compilation(job: ScrapeJob):
+    await sync_to_async(_update)(job.id, progress="Reading the compilation")
+    payload = await get_compilation(job.url)
+    if payload is None:
+        await _finish(job, ScrapeJob.STATUS_FAILED, error="Not a compilation")
+        return
+    await _finish(job, ScrapeJob.STATUS_DONE, result=payload)
+
+
+async def _run_compilation_import(job: ScrapeJob):
+    async def progress(games):
+        done = sum(g["status"] not in ("pending", "importing") for g in games)
+        await sync_to_async(_update)(job.id, progress=f"{done}/{len(games)} games imported", result={"games": games})
+
+    result = await with_priority(PRIORITY_BULK, import_compilation(job.url, on_progress=progress))
+    if result is None:
+        await _finish(job, ScrapeJob.STATUS_FAILED, error="Not a compilation")
+        return
+    await _finish(job, ScrapeJob.STATUS_DONE, result=result)
+
+
+JOB_RUNNERS = {
+    ScrapeJob.KIND_DETAILS: _run_details,
+    ScrapeJob.KIND_COMPILATION: _run_compilation,
+    ScrapeJob.KIND_COMPILATION_IMPORT: _run_compilation_import,
+}
+
+
+async def run_job(job: ScrapeJob):
+    print(f"[JOBS] Running job {job.id}: {job.kind} {job.url}")
+    try:
+        await JOB_RUNNERS[job.kind](job)
+    except Exception as e:
+        await _finish(job, ScrapeJob.STATUS_FAILED, error=str(e) or e.__class__.__name__)
+
+
+# The main loop of the worker. It keeps up to "concurrency" jobs running at the same time on the event loop of the
+# browser pool and takes new ones from the queue as soon as any of them finishes. Every SCRAPE_JOB_HEARTBEAT_INTERVAL
+# seconds it moves the heartbeat of its jobs and puts back into the queue the jobs of the workers which died, and once
+# an hour it removes the old finished jobs. With once=True it stops when the queue is empty
+async def work(concurrency: int, poll_interval: float, once: bool = False, worker_id: str = None):
+    worker_id = worker_id or new_worker_id()
+    heartbeat_interval = getattr(settings, "SCRAPE_JOB_HEARTBEAT_INTERVAL", 30)
+    running = {}
+    next_heartbeat = time.monotonic() + heartbeat_interval
+    next_prune = time.monotonic()
+    while True:
+        free = concurrency - len(running)
+        if free > 0:
+            for job in await sync_to_async(claim_jobs)(free, worker_id):
+                running[asyncio.ensure_future(run_job(job))] = job.id
+
+        if time.monotonic() >= next_heartbeat:
+            next_heartbeat = time.monotonic() + heartbeat_interval
+            await sync_to_async(heartbeat)(worker_id, list(running.values()))
+            await sync_to_async(requeue_stale_jobs)()
+
+        if time.monotonic() >= next_prune:
+            next_prune = time.monotonic() + 60 * 60
+            await sync_to_async(prune_finished_jobs)()
+
+        if not running:
+            if once:
+                return
+            await asyncio.sleep(poll_interval)
+            continue
+
+        done, _ = await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            running.pop(task)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+# Sends the same request many times at once to a running server and measures how many of them it can serve per second.
+# It's meant to compare the same endpoint served in two ways, e.g. the old sync views under "manage.py runserver" (WSGI)
+# and the async views under "uvicorn gamelore.asgi:application". The access token of a logged-in user is needed, because
+# all the scraper endpoints require it
+class Command(BaseCommand):
+    help = "Measures the throughput and latency of an endpoint under concurrent requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/app/search/",
+                            help="The endpoint to benchmark.")
+        parser.add_argument("--method", default="POST", help="HTTP method of the requests.")
+        parser.add_argument("--json", dest="payload", default='{"game": "The Witcher 3"}',
+                            help="JSON body of the requests (ignored for GET).")
+        parser.add_argument("--token", default="", help="Access token (sent as the access_token cookie).")
+        parser.add_argument("--requests", type=int, default=50, help="How many requests are sent in total.")
+        parser.add_argument("--concurrency", type=int, default=10, help="How many requests are sent at the same time.")
+        parser.add_argument("--timeout", type=float, default=120.0, help="Timeout of a single request in seconds.")
+
+    def handle(self, *args, **options):
+        result = asyncio.run(self.run(options))
+
+        self.stdout.write(f"[BENCHMARK] {options['method']} {options['url']}")
+        self.stdout.write(f"  requests:     {result['requests']} ({options['concurrency']} at a time)")
+        self.stdout.write(f"  statuses:     {result['statuses']}")
+        self.stdout.write(f"  total time:   {result['total']:.2f}s")
+        self.stdout.write(f"  throughput:   {result['throughput']:.2f} req/s")
+        if result["latencies"]:
+            lat = sorted(result["latencies"])
+            self.stdout.write(f"  latency p50:  {statistics.median(lat):.2f}s")
+            self.stdout.write(f"  latency p95:  {lat[max(0, int(len(lat) * 0.95) - 1)]:.2f}s")
+            self.stdout.write(f"  latency max:  {lat[-1]:.2f}s")
+
+    async def run(self, options):
+        payload = json.loads(options["payload"]) if options["payload"] else None
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        latencies = []
+        statuses = {}
+
+        async with httpx.AsyncClient(
+            timeout=options["timeout"],
+            cookies={"access_token": options["token"]} if options["token"] else None,
+            headers={"Accept": "application/json", "x-requested-with": "XMLHttpRequest"},
+            limits=httpx.Limits(max_connections=options["concurrency"]),
+        ) as client:
+
+            async def one():
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        if options["method"].upper() == "GET":
+                            resp = await client.get(options["url"])
+                        else:
+                            resp = await client.request(options["method"].upper(), options["url"], json=payload)
+                        status = str(resp.status_code)
+                    except httpx.HTTPError as e:
+                        status = e.__class__.__name__
+                    latencies.append(time.perf_counter() - start)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(options["requests"])))
+            total = time.perf_counter() - start
+
+        return {
+            "requests": options["requests"],
+            "statuses": statuses,
+            "total": total,
+            "throughput": options["requests"] / total if total else 0.0,
+            "latencies": latencies,
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+import urllib.parse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from app import fetchers, outbound, wikipedia
+from app.browser_pool import run_scraper
+from app.fake_sites import FakeSites
+from app.parsers import mobygames_url
+from app.utils import scrape_game_info, search_mobygames
+
+
+# What every scenario runs. The searches and the games cycle through the pages saved in app/fixtures/fake_sites - the
+# plain games, an edition which leads to its base game, a compilation and a game without a Wikipedia article
+SEARCH_QUERIES = ["the witcher", "the witcher 3", "tetris"]
+GAME_PATHS = [
+    "/game/101/the-witcher-3-wild-hunt/",
+    "/game/102/the-witcher-3-wild-hunt-game-of-the-year-edition/",
+    "/game/103/the-witcher-2-assassins-of-kings/",
+    "/game/104/the-witcher/",
+    "/game/105/the-witcher-trilogy/",
+    "/game/106/tetris/",
+]
+
+
+def _percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * p)) - 1)] if values else 0.0
+
+
+# Measures the scrapers end to end without the network. The fake MobyGames and Wikipedia server (see fake_sites.py) is
+# started in this process with the given latency and the scrapers are pointed at it. Every scenario is run at every
+# concurrency level, so it's possible to see how the latency of one search or import and the overall throughput change
+# when more of them run at the same time. The "import" scenario is scrape_game_info with the cover download, i.e.
+# everything an import does apart from saving the rows, so the database isn't needed. Since the pages and the latency
+# are always the same, two runs (e.g. before and after a change of the scrapers) can be compared directly
+class Command(BaseCommand):
+    help = "Benchmarks the search and the game import against the local fake MobyGames and Wikipedia."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", choices=["search", "import", "all"], default="all",
+                            help="Which scraper to benchmark.")
+        parser.add_argument("--levels", default="1,4,8", help="Comma separated concurrency levels.")
+        parser.add_argument("--requests", type=int, default=24, help="How many scrapes are run at every level.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Delay of every fake response in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.05,
+                            help="A random extra delay of up to this many seconds.")
+        parser.add_argument("--rate-limit", type=int, default=None,
+                            help="The fake sites answer with 429 above this many requests per second.")
+        parser.add_argument("--host-rate", type=float, default=None,
+                            help="Rate limit (requests per second) of the outbound scheduler for the fake sites.")
+        parser.add_argument("--host-burst", type=int, default=None,
+                            help="Burst of the outbound scheduler for the fake sites (defaults to the rate).")
+        parser.add_argument("--base-url", default=None,
+                            help="Use an already running fake sites server (run_fake_sites) instead of starting one.")
+        parser.add_argument("--output", default=None, help="Save the results into this JSON file.")
+        parser.add_argument("--verbose", action="store_true", help="Show the output of the scrapers.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(x) for x in options["levels"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--levels has to be a comma separated list of numbers, e.g. 1,4,8")
+        scenarios = ["search", "import"] if options["scenario"] == "all" else [options["scenario"]]
+
+        sites = None
+        if options["base_url"]:
+            base_url = options["base_url"].rstrip("/")
+            site_settings = {
+                "MOBYGAMES_URL": base_url,
+                "WIKIPEDIA_API_URL": f"{base_url}/w/api.php",
+                "WIKIPEDIA_ARTICLE_URL": f"{base_url}/wiki/",
+                "WIKIPEDIA_FIXTURE_MODE": "off",
+            }
+        else:
+            sites = FakeSites(latency=options["latency"], jitter=options["jitter"],
+                              rate_limit=options["rate_limit"])
+            base_url = sites.start()
+            site_settings = sites.settings()
+        self.stdout.write(f"[BENCHMARK] Fake sites on {base_url}, latency {options['latency']}s "
+                          f"+ up to {options['jitter']}s")
+
+        host = urllib.parse.urlsplit(base_url).hostname
+        rate_limits = {}
+        if options["host_rate"]:
+            rate_limits[host] = {"rate": options["host_rate"],
+                                 "burst": options["host_burst"] or max(1, int(options["host_rate"]))}
+
+        results = []
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(**site_settings, SCRAPER_FETCHERS=["http"],
+                                       SCRAPER_HOST_RATE_LIMITS=rate_limits):
+                    for scenario in scenarios:
+                        for level in levels:
+                            # The fetcher, the Wikipedia client and the scheduler read the settings when they are
+                            # created, so they are created again with the ones pointing at the fake server (and once
+                            # more afterwards). Every level starts with an empty scheduler, so its stats are its own
+                            self.reset()
+                            result = self.run_level(scenario, level, options, media_root, host)
+                            results.append(result)
+                            self.report(result)
+                self.reset()
+        finally:
+            if sites is not None:
+                sites.stop()
+                self.stdout.write(f"[BENCHMARK] Requests served by the fake sites: {sites.requests}")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"options": {k: options[k] for k in ("latency", "jitter", "requests", "levels")},
+                           "results": results}, f, indent=2)
+            self.stdout.write(f"[BENCHMARK] Results saved to {options['output']}")
+
+    def reset(self):
+        fetchers._fetcher = None
+        wikipedia._client = None
+        outbound._scheduler = None
+
+    def run_level(self, scenario: str, concurrency: int, options: dict, media_root: str, host: str) -> dict:
+        # Every level gets an empty media folder and HTTP cache, otherwise the thumbnails and the pages downloaded by the
+        # previous level would be reused and the later levels would look faster than they are
+        media_root = tempfile.mkdtemp(dir=media_root)
+        http_cache_dir = os.path.join(media_root, "http-cache")
+        if scenario == "search":
+            jobs = [lambda i=i: search_mobygames(SEARCH_QUERIES[i % len(SEARCH_QUERIES)])
+                    for i in range(options["requests"])]
+        else:
+            jobs = [lambda i=i: scrape_game_info(mobygames_url() + GAME_PATHS[i % len(GAME_PATHS)],
+                                                 media_root=media_root, save_image=True)
+                    for i in range(options["requests"])]
+
+        output = contextlib.nullcontext() if options["verbose"] else contextlib.redirect_stdout(io.StringIO())
+        with output, override_settings(MEDIA_ROOT=media_root, SCRAPER_HTTP_CACHE_DIR=http_cache_dir):
+            latencies, failures, total = run_scraper(self.run_jobs(jobs, concurrency))
+
+        stats = outbound.get_scheduler().stats().get(host, {})
+        waits = stats.get("wait", {}).get(outbound.PRIORITY_INTERACTIVE, {})
+        return {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "requests": len(jobs),
+            "failures": failures,
+            "total": round(total, 3),
+            "throughput": round(len(jobs) / total, 3) if total else 0.0,
+            "p50": round(statistics.median(latencies), 3) if latencies else 0.0,
+            "p95": round(_percentile(latencies, 0.95), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0,
+            "retries": stats.get("retries", 0),
+            "throttled": stats.get("throttled", 0),
+            "max_queue_depth": stats.get("max_queue_depth", 0),
+            "avg_wait": waits.get("avg", 0.0),
+        }
+
+    async def run_jobs(self, jobs: list, concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+
+        async def one(job):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await job()
+                except Exception as e:
+                    print(f"[BENCHMARK] Scraper failed: {e}")
+                    result = None
+                latencies.append(time.perf_counter() - start)
+                if not result:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(job) for job in jobs))
+        return latencies, failures, time.perf_counter() - start
+
+    def report(self, r: dict):
+        self.stdout.write(
+            f"  {r['scenario']:<7} concurrency {r['concurrency']:>3}: {r['requests']} in {r['total']:.2f}s, "
+            f"{r['throughput']:.2f}/s, p50 {r['p50']:.2f}s, p95 {r['p95']:.2f}s, max {r['max']:.2f}s"
+            + (f", {r['failures']} failed" if r["failures"] else "")
+        )
+        if r["retries"] or r["max_queue_depth"]:
+            self.stdout.write(f"{'':<30}scheduler: {r['retries']} retries ({r['throttled']} after 429), "
+                              f"up to {r['max_queue_depth']} waiting, {r['avg_wait']:.2f}s average wait")
@@ -0,0 +1,149 @@
+import contextlib
+import io
+import json
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import GamePlots
+from app.summarization import BACKENDS, SummarizationEngine, backend_name, configure_torch_threads, load_summarizer, \
+    word_count
+from app.utils import summarize_plot_from_markdown
+
+
+def _percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * p)) - 1)] if values else 0.0
+
+
+# ROUGE-L F1 of two summaries - how much of the longest common sequence of words they share (1.0 means the same words in
+# the same order). It's how close the summaries of a faster backend are to the ones of the full model
+def _rouge_l(reference: str, candidate: str) -> float:
+    ref = re.findall(r"\w+", (reference or "").lower())
+    cand = re.findall(r"\w+", (candidate or "").lower())
+    if not ref or not cand:
+        return 1.0 if ref == cand else 0.0
+    previous = [0] * (len(cand) + 1)
+    for r in ref:
+        current = [0]
+        for j, c in enumerate(cand):
+            current.append(previous[j] + 1 if r == c else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+# Measures how fast the plots are summarized. Every plot is summarized the same way "Generate summary" does it
+# (summarize_plot_from_markdown) once for every batch size. Batch size 1 is the old loop - one model call for every
+# section and chunk, one after another - so the first row is the baseline the batched engine is compared to. With
+# --backends the same is done for every backend (see BACKENDS in summarization.py), and the summaries of every row are
+# compared with the ones of the first row (ROUGE-L), so it's possible to see how much faster a backend is and how much
+# its summaries differ. The plots are the ones already in the database (GamePlots.full_plot), the ones too short to be
+# summarized are skipped
+class Command(BaseCommand):
+    help = "Benchmarks the plot summaries (speed and quality) with different backends and batch sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=10, help="How many plots are summarized.")
+        parser.add_argument("--batch-sizes", default=f"1,{getattr(settings, 'SUMMARIZER_BATCH_SIZE', 8)}",
+                            help="Comma separated batch sizes, 1 is the old one-by-one loop.")
+        parser.add_argument("--backends", default=None,
+                            help=f"Comma separated backends ({', '.join(BACKENDS)}), defaults to SUMMARIZER_BACKEND.")
+        parser.add_argument("--threads", type=int, default=None, help="How many threads torch uses.")
+        parser.add_argument("--output", default=None, help="Save the results into this JSON file.")
+        parser.add_argument("--verbose", action="store_true", help="Show the output of the summarizer.")
+
+    def handle(self, *args, **options):
+        try:
+            batch_sizes = [int(x) for x in options["batch_sizes"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--batch-sizes has to be a comma separated list of numbers, e.g. 1,8")
+
+        backends = [b.strip() for b in (options["backends"] or backend_name()).split(",") if b.strip()]
+        unknown = [b for b in backends if b not in BACKENDS]
+        if unknown:
+            raise CommandError(f"Unknown backend(s): {', '.join(unknown)}. Available: {', '.join(BACKENDS)}")
+
+        plots = self.load_plots(options["limit"])
+        if not plots:
+            raise CommandError("There are no plots to summarize.")
+        words = sum(word_count(md) for _, md in plots)
+        self.stdout.write(f"[BENCHMARK] {len(plots)} plot(s), {words} words")
+        configure_torch_threads(options["threads"])
+
+        results = []
+        reference = None
+        for backend in backends:
+            load_start = time.perf_counter()
+            model = load_summarizer(backend)
+            # The model is run once before anything is measured, so the first batch size doesn't pay for the warm-up
+            model("warm up " * 100, max_length=20, min_length=5, do_sample=False)
+            load_time = time.perf_counter() - load_start
+
+            for batch_size in batch_sizes:
+                result, summaries = self.run(backend, model, batch_size, plots, options["verbose"])
+                if reference is None:
+                    reference = summaries
+                scores = [_rouge_l(ref, summary) for ref, summary in zip(reference, summaries)]
+                result["load_time"] = round(load_time, 3)
+                result["rouge_l"] = round(statistics.mean(scores), 3)
+                result["rouge_l_min"] = round(min(scores), 3)
+                results.append(result)
+                self.stdout.write(
+                    f"  {backend:<10} batch {batch_size:>3}: {result['total']:.1f}s, "
+                    f"{result['words_per_second']:.0f} words/s, per game p50 {result['p50']:.1f}s, "
+                    f"p95 {result['p95']:.1f}s, max {result['max']:.1f}s, {result['model_calls']} model call(s) "
+                    f"for {result['texts']} text(s), ROUGE-L {result['rouge_l']:.3f} (min {result['rouge_l_min']:.3f})"
+                )
+            del model
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump({"backends": backends, "results": results}, f, indent=2)
+            self.stdout.write(f"[BENCHMARK] Results saved to {options['output']}")
+
+    def run(self, backend: str, model, batch_size: int, plots: list, verbose: bool):
+        engine = SummarizationEngine(model=model, batch_size=batch_size, cache=False)
+        latencies = []
+        summaries = []
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            start = time.perf_counter()
+            for _, md in plots:
+                game_start = time.perf_counter()
+                summaries.append(summarize_plot_from_markdown(md, engine=engine))
+                latencies.append(time.perf_counter() - game_start)
+            total = time.perf_counter() - start
+
+        words = sum(word_count(md) for _, md in plots)
+        return {
+            "backend": backend,
+            "batch_size": batch_size,
+            "games": len(plots),
+            "words": words,
+            "total": round(total, 3),
+            "words_per_second": round(words / total, 1) if total else 0.0,
+            "p50": round(statistics.median(latencies), 3),
+            "p95": round(_percentile(latencies, 0.95), 3),
+            "max": round(max(latencies), 3),
+            "model_calls": engine.model_calls,
+            "texts": engine.texts,
+        }, summaries
+
+    def load_plots(self, limit: int) -> list:
+        plots = []
+        qs = (GamePlots.objects.exclude(full_plot__isnull=True).exclude(full_plot__contains="No Plot Found")
+              .select_related("game_id").order_by("id"))
+        for plot in qs.iterator():
+            # The same limit as summarize_plot_from_markdown, the shorter plots wouldn't be summarized at all
+            if word_count(plot.full_plot) > 200:
+                plots.append((plot.game_id.title, plot.full_plot))
+            if len(plots) >= limit:
+                break
+        return plots
@@ -0,0 +1,67 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.browser_pool import run_scraper
+from app.refresh import Checkpoint, catalog_order, refresh_catalog
+
+
+# Checks the plots of all the games in the catalog against Wikipedia, the same way the admin reload does it for one game.
+# The stale games go first and then the most viewed ones, several of them at the same time. Only the plots which really
+# changed are summarized again and saved. The progress is kept in a checkpoint file, so when the refresh is killed (or
+# stopped by --max-duration) the next run continues where it stopped instead of starting over. It's meant to be run
+# every night, e.g. from cron:
+#
+#   0 2 * * * cd /path/to/GameLore && python manage.py refresh_catalog --max-duration 14400
+class Command(BaseCommand):
+    help = "Refreshes the plots of all the games (stale and most viewed first), resuming an unfinished run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int,
+                            default=getattr(settings, "CATALOG_REFRESH_CONCURRENCY", 4),
+                            help="How many games are refreshed at the same time.")
+        parser.add_argument("--stale-days", type=float,
+                            default=getattr(settings, "CATALOG_REFRESH_STALE_DAYS", 7),
+                            help="Games not refreshed for this many days go first.")
+        parser.add_argument("--max-duration", type=float, default=None,
+                            help="Stop starting new games after this many seconds (the rest is left for the next run).")
+        parser.add_argument("--limit", type=int, default=None, help="Refresh at most this many games.")
+        parser.add_argument("--checkpoint", default=getattr(
+            settings, "CATALOG_REFRESH_CHECKPOINT", os.path.join(settings.BASE_DIR, ".cache", "refresh_catalog.json")
+        ), help="Where the progress is saved.")
+        parser.add_argument("--restart", action="store_true",
+                            help="Start a new refresh even when the previous one hasn't finished.")
+        parser.add_argument("--force", action="store_true",
+                            help="Summarize every plot again, even the ones which haven't changed.")
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options["checkpoint"])
+        if not options["restart"] and checkpoint.load() and not checkpoint.finished:
+            self.stdout.write(f"[REFRESH] Resuming the refresh started at {checkpoint.data['started_at']}, "
+                              f"{len(checkpoint.pending())} game(s) left.")
+        else:
+            order = catalog_order(timedelta(days=options["stale_days"]), limit=options["limit"])
+            checkpoint.start(order)
+            self.stdout.write(f"[REFRESH] Refreshing {len(order)} game(s), {options['concurrency']} at a time.")
+
+        total = len(checkpoint.data["order"])
+
+        def progress(game_id, title, status):
+            done = total - len(checkpoint.pending())
+            self.stdout.write(f"[REFRESH] {done}/{total} {title or game_id}: {status}")
+
+        try:
+            run_scraper(refresh_catalog(checkpoint, options["concurrency"], max_duration=options["max_duration"],
+                                        force=options["force"], on_progress=progress))
+        except KeyboardInterrupt:
+            self.stdout.write("[REFRESH] Stopped, the next run will continue from the checkpoint.")
+            return
+
+        counts = ", ".join(f"{status} {n}" for status, n in sorted(checkpoint.counts().items())) or "nothing"
+        if checkpoint.finished:
+            self.stdout.write(f"[REFRESH] Finished: {counts}.")
+        else:
+            self.stdout.write(f"[REFRESH] Stopped after --max-duration with {len(checkpoint.pending())} game(s) "
+                              f"left ({counts}), the next run will continue from the checkpoint.")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.fake_sites import FakeSites
+
+
+# Runs the fake MobyGames and Wikipedia (see fake_sites.py) on its own, e.g. to run the whole website against it. The
+# settings printed at the start have to be set in the environment of the website for the scrapers to use it
+class Command(BaseCommand):
+    help = "Serves the saved MobyGames and Wikipedia pages locally, with an artificial latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+        parser.add_argument("--port", type=int, default=8900, help="The port to listen on.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Delay of every response in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.05,
+                            help="A random extra delay of up to this many seconds.")
+        parser.add_argument("--rate-limit", type=int, default=None,
+                            help="Answer with 429 when there were more requests than this in the last second.")
+        parser.add_argument("--fixture-dir", default=None, help="Where the pages are read from.")
+        parser.add_argument("--record", action="store_true",
+                            help="Download the pages which aren't saved yet from the real websites and save them.")
+
+    def handle(self, *args, **options):
+        sites = FakeSites(fixture_dir=options["fixture_dir"], latency=options["latency"], jitter=options["jitter"],
+                          record=options["record"], rate_limit=options["rate_limit"])
+        base_url = sites.start(options["host"], options["port"])
+        self.stdout.write(f"[FAKE SITES] Serving {sites.fixture_dir} on {base_url} "
+                          f"(latency {options['latency']}s + up to {options['jitter']}s)")
+        self.stdout.write("[FAKE SITES] Point the website at it with:")
+        # The browser pool blocks every domain other than the real websites, so only the HTTP fetcher is used
+        for key, value in {**sites.settings(), "SCRAPER_FETCHERS": "http"}.items():
+            self.stdout.write(f"  {key}={value}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            sites.stop()
+            self.stdout.write(f"[FAKE SITES] Stopped. Requests served: {sites.requests}")
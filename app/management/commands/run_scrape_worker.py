@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.browser_pool import run_scraper
+from app.jobs import requeue_stale_jobs, work
+
+
+# Runs the game imports queued by the views. Several jobs are scraped at the same time, all of them sharing the pool
+# of browsers and the HTTP client of this process. More workers can be started side by side (each one takes different
+# jobs from the queue)
+class Command(BaseCommand):
+    help = "Runs the queued scrape jobs (game imports and compilations)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int,
+                            default=getattr(settings, "SCRAPE_WORKER_CONCURRENCY", 3),
+                            help="How many jobs are scraped at the same time.")
+        parser.add_argument("--poll-interval", type=float,
+                            default=getattr(settings, "SCRAPE_WORKER_POLL_INTERVAL", 1.0),
+                            help="How often (in seconds) the queue is checked for new jobs.")
+        parser.add_argument("--once", action="store_true",
+                            help="Stop when the queue is empty instead of waiting for new jobs.")
+
+    def handle(self, *args, **options):
+        requeue_stale_jobs()
+        self.stdout.write(f"[WORKER] Running up to {options['concurrency']} job(s) at a time.")
+        try:
+            run_scraper(work(options["concurrency"], options["poll_interval"], once=options["once"]))
+        except KeyboardInterrupt:
+            self.stdout.write("[WORKER] Stopped.")
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.summarization import BACKENDS, SummarizationEngine, backend_name, configure_torch_threads, load_summarizer, \
+    model_name, service_address, service_authkey
+from app.summarizer_service import SummarizerService
+
+
+# Runs the summarizer service - the one process on the host which holds the summarization model. The web servers send
+# their texts to it when SUMMARIZER_SERVICE_ADDRESS is set (to the same address), e.g.
+#
+#   SUMMARIZER_SERVICE_ADDRESS=127.0.0.1:8765 python manage.py run_summarizer --threads 4
+class Command(BaseCommand):
+    help = "Runs the summarizer service which owns the summarization model and serves the web servers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default=None,
+                            help="host:port to listen on (defaults to SUMMARIZER_SERVICE_ADDRESS).")
+        parser.add_argument("--threads", type=int, default=getattr(settings, "SUMMARIZER_TORCH_THREADS", None),
+                            help="How many threads torch uses for the model.")
+        parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                            help="How the model runs (defaults to SUMMARIZER_BACKEND).")
+        parser.add_argument("--batch-size", type=int, default=getattr(settings, "SUMMARIZER_BATCH_SIZE", 8),
+                            help="How many texts go through the model at once.")
+
+    def handle(self, *args, **options):
+        address = service_address()
+        if options["address"]:
+            host, _, port = options["address"].rpartition(":")
+            if not port.isdigit():
+                raise CommandError("--address has to be host:port, e.g. 127.0.0.1:8765")
+            address = (host or "127.0.0.1", int(port))
+        if address is None:
+            raise CommandError("Set SUMMARIZER_SERVICE_ADDRESS or pass --address.")
+
+        configure_torch_threads(options["threads"])
+        # The model is loaded before the first request comes, so nobody waits for it
+        self.stdout.write("[SUMMARIZER] Loading the model...")
+        backend = options["backend"] or backend_name()
+        model = load_summarizer(backend)
+        engine = SummarizationEngine(model=model, batch_size=options["batch_size"],
+                                     model_id=f"{model_name()}:{backend}")
+        service = SummarizerService(address, service_authkey(), engine=engine)
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("[SUMMARIZER] Stopped.")
@@ -0,0 +1,51 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.covers import COVER_DIR, store_cover
+from app.models import Games
+
+
+# Moves the covers saved before the cover store existed (media/game_icons/<title>_icon.jpg) into it, so the old games
+# get the small and medium sizes and the WebP versions as well. The covers already in the store are skipped, so it's
+# safe to run it again
+class Command(BaseCommand):
+    help = "Saves the existing game covers into the content-addressed cover store in all the sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete-old", action="store_true",
+                            help="Remove the old cover files once they are in the store.")
+
+    def handle(self, *args, **options):
+        stored = missing = 0
+        old_files = set()
+        for game in Games.objects.exclude(cover_image__isnull=True).exclude(cover_image="").order_by("id"):
+            value = str(game.cover_image)
+            if value.startswith(f"{COVER_DIR}/"):
+                continue
+            path = os.path.join(settings.MEDIA_ROOT, value)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                self.stdout.write(f"[COVERS] {game.title}: the file {value} is missing.")
+                missing += 1
+                continue
+
+            try:
+                new_value = store_cover(data, settings.MEDIA_ROOT)
+            except Exception as e:
+                self.stdout.write(f"[COVERS] {game.title}: could not store the cover: {e}")
+                continue
+            Games.objects.filter(id=game.id).update(cover_image=new_value)
+            old_files.add(path)
+            stored += 1
+
+        if options["delete_old"]:
+            for path in old_files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self.stdout.write(f"[COVERS] Stored {stored} cover(s), {missing} missing.")
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_auto_20251106_1847'),
+    ]
+
+    operations = [
+        # The columns and the ratings table already exist in the database (see 0003), they were only missing from the
+        # migration state
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='UserRatings',
+                    fields=[
+                        ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                        ('rating', models.IntegerField(db_column='rating')),
+                        ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                        ('updated_at', models.DateTimeField(auto_now=True, db_column='updated_at')),
+                    ],
+                    options={
+                        'db_table': 'UserRatings',
+                        'managed': False,
+                    },
+                ),
+                migrations.AddField(
+                    model_name='games',
+                    name='mobygames_url',
+                    field=models.CharField(blank=True, db_column='mobygames_url', max_length=500, null=True),
+                ),
+                migrations.AddField(
+                    model_name='games',
+                    name='wikipedia_url',
+                    field=models.CharField(blank=True, db_column='wikipedia_url', max_length=500, null=True),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.CreateModel(
+            name='ScrapeJob',
+            fields=[
+                ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('details', 'Game details'), ('compilation', 'Compilation')], db_column='kind', default='details', max_length=20)),
+                ('url', models.CharField(db_column='url', max_length=500)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_column='status', default='queued', max_length=20)),
+                ('progress', models.CharField(blank=True, db_column='progress', default='', max_length=255)),
+                ('result', models.JSONField(blank=True, db_column='result', null=True)),
+                ('error', models.TextField(blank=True, db_column='error', null=True)),
+                ('attempts', models.IntegerField(db_column='attempts', default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('started_at', models.DateTimeField(blank=True, db_column='started_at', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, db_column='finished_at', null=True)),
+                ('game_id', models.ForeignKey(blank=True, db_column='game_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scrape_jobs', to='app.games')),
+                ('user_id', models.ForeignKey(blank=True, db_column='user_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scrape_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ScrapeJobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='scrapejobs_status_idx'), models.Index(fields=['url'], name='scrapejobs_url_idx')],
+            },
+        ),
+    ]
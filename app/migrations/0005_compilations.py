@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_scrapejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compilations',
+            fields=[
+                ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                ('mobygames_url', models.CharField(db_column='mobygames_url', max_length=500, unique=True)),
+                ('title', models.CharField(db_column='title', max_length=255)),
+                ('included_games', models.JSONField(db_column='included_games', default=list)),
+                ('scraped_at', models.DateTimeField(db_column='scraped_at')),
+            ],
+            options={
+                'db_table': 'Compilations',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_compilations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scrapejob',
+            name='kind',
+            field=models.CharField(choices=[('details', 'Game details'), ('compilation', 'Compilation'), ('compilation_import', 'Import of all the games in a compilation')], db_column='kind', default='details', max_length=20),
+        ),
+    ]
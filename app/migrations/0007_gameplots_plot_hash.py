@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_scrapejob_compilation_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameplots',
+            name='plot_hash',
+            field=models.CharField(blank=True, db_column='plot_hash', max_length=64, null=True),
+        ),
+    ]
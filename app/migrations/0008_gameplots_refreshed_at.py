@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_gameplots_plot_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameplots',
+            name='refreshed_at',
+            field=models.DateTimeField(blank=True, db_column='refreshed_at', null=True),
+        ),
+    ]
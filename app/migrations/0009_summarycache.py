@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_gameplots_refreshed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryCache',
+            fields=[
+                ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                ('cache_key', models.CharField(db_column='cache_key', max_length=64, unique=True)),
+                ('tier', models.CharField(db_column='tier', max_length=10)),
+                ('model_id', models.CharField(db_column='model_id', max_length=255)),
+                ('summary', models.TextField(db_column='summary')),
+                ('hits', models.IntegerField(db_column='hits', default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('last_used_at', models.DateTimeField(auto_now=True, db_column='last_used_at')),
+            ],
+            options={
+                'db_table': 'SummaryCache',
+            },
+        ),
+    ]
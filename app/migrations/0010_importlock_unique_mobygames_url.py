@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+# The url columns were added to the database by hand (see 0004), so a database made only from the migrations, e.g. the
+# one of the tests, doesn't have them yet
+def add_missing_url_columns(apps, schema_editor):
+    Games = apps.get_model('app', 'Games')
+    with schema_editor.connection.cursor() as cursor:
+        columns = {c.name for c in schema_editor.connection.introspection.get_table_description(
+            cursor, Games._meta.db_table)}
+    for name in ('mobygames_url', 'wikipedia_url'):
+        if name not in columns:
+            schema_editor.add_field(Games, Games._meta.get_field(name))
+
+
+# The games imported twice before mobygames_url was unique. The oldest one keeps the url (it's the one the imports have
+# always found), the newer copies lose it, and the empty urls become NULL, so the unique index can be created
+def clear_duplicate_urls(apps, schema_editor):
+    Games = apps.get_model('app', 'Games')
+    Games.objects.filter(mobygames_url='').update(mobygames_url=None)
+    seen = set()
+    duplicates = []
+    for game_id, url in Games.objects.exclude(mobygames_url__isnull=True).order_by('id').values_list('id',
+                                                                                                  'mobygames_url'):
+        if url in seen:
+            duplicates.append(game_id)
+        seen.add(url)
+    Games.objects.filter(id__in=duplicates).update(mobygames_url=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_summarycache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportLock',
+            fields=[
+                ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                ('url', models.CharField(db_column='url', max_length=500, unique=True)),
+                ('token', models.CharField(db_column='token', max_length=32)),
+                ('expires_at', models.DateTimeField(db_column='expires_at')),
+            ],
+            options={
+                'db_table': 'ImportLocks',
+            },
+        ),
+        migrations.RunPython(add_missing_url_columns, migrations.RunPython.noop),
+        migrations.RunPython(clear_duplicate_urls, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='games',
+            name='mobygames_url',
+            field=models.CharField(blank=True, db_column='mobygames_url', max_length=500, null=True, unique=True),
+        ),
+    ]
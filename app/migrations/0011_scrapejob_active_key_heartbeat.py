@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:41
+
+import hashlib
+
+from django.db import migrations, models
+
+
+# The jobs still queued or running get their key, so they're deduplicated like the new ones. The same as active_key in
+# jobs.py, and when the same url is active more than once, only the oldest job gets it
+def fill_active_keys(apps, schema_editor):
+    ScrapeJob = apps.get_model('app', 'ScrapeJob')
+    seen = set()
+    for job in ScrapeJob.objects.filter(status__in=['queued', 'running']).order_by('id'):
+        key = hashlib.sha256(f"{job.kind}\0{job.url}".encode('utf-8')).hexdigest()
+        if key in seen:
+            continue
+        seen.add(key)
+        ScrapeJob.objects.filter(id=job.id).update(active_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_importlock_unique_mobygames_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapejob',
+            name='active_key',
+            field=models.CharField(blank=True, db_column='active_key', max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, db_column='heartbeat_at', null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapejob',
+            name='worker_id',
+            field=models.CharField(blank=True, db_column='worker_id', max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_active_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_scrapejob_active_key_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeJobWatcher',
+            fields=[
+                ('id', models.BigAutoField(db_column='id', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('job_id', models.ForeignKey(db_column='job_id', on_delete=django.db.models.deletion.CASCADE, related_name='watchers', to='app.scrapejob')),
+                ('user_id', models.ForeignKey(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, related_name='watched_scrape_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ScrapeJobWatchers',
+                'unique_together': {('job_id', 'user_id')},
+            },
+        ),
+    ]
@@ -77,7 +77,8 @@ class Games(models.Model):
     studio = models.TextField(db_column='studio')
     score = models.DecimalField(max_digits=3, decimal_places=1, db_column='score')
     cover_image = models.CharField(max_length=500, null=True, blank=True, db_column='cover_image')
-    mobygames_url = models.CharField(max_length=500, null=True, blank=True, db_column='mobygames_url')
+    # A game is saved once for every MobyGames page, so two imports of the same page can't both create it
+    mobygames_url = models.CharField(max_length=500, null=True, blank=True, unique=True, db_column='mobygames_url')
     wikipedia_url = models.CharField(max_length=500, null=True, blank=True, db_column='wikipedia_url')
     created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
 
@@ -90,6 +91,11 @@ class GamePlots(models.Model):
     game_id = models.ForeignKey(Games, on_delete=models.CASCADE, related_name="plots", db_column='game_id')
     full_plot = models.TextField(db_column='full_plot')
     summary = models.TextField(null=True, blank=True, db_column='summary')
+    # The hash of the Wikipedia plot (its extracted text) the summary was generated from. The admin reload skips the
+    # games whose plot still has the same hash
+    plot_hash = models.CharField(max_length=64, null=True, blank=True, db_column='plot_hash')
+    # When the plot was last checked against Wikipedia (the admin reload or the catalog refresh), changed or not
+    refreshed_at = models.DateTimeField(null=True, blank=True, db_column='refreshed_at')
     created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
 
     class Meta:
@@ -136,3 +142,116 @@ class UserRatings(models.Model):
     def __str__(self):
         return f"{self.user_id} rated {self.game_id} = {self.rating}"
 
+
+
+# A MobyGames page which turned out to be a compilation, with the list of the games it includes. It's saved the first
+# time the page is scraped, so opening the compilation page again is only a read from the database
+class Compilations(models.Model):
+    id = models.BigAutoField(primary_key=True, db_column='id')
+    mobygames_url = models.CharField(max_length=500, unique=True, db_column='mobygames_url')
+    title = models.CharField(max_length=255, db_column='title')
+    included_games = models.JSONField(default=list, db_column='included_games')
+    scraped_at = models.DateTimeField(db_column='scraped_at')
+
+    class Meta:
+        db_table = 'Compilations'
+
+    def __str__(self):
+        return f"{self.title} ({len(self.included_games)} games)"
+
+
+# One import of a game (or a compilation) from MobyGames. The views only create the job and return its id, the scraping
+# itself is done by the worker (python manage.py run_scrape_worker) and the frontend polls the job's status
+class ScrapeJob(models.Model):
+    KIND_DETAILS = "details"
+    KIND_COMPILATION = "compilation"
+    KIND_COMPILATION_IMPORT = "compilation_import"
+    KIND_CHOICES = [(KIND_DETAILS, "Game details"), (KIND_COMPILATION, "Compilation"),
+                    (KIND_COMPILATION_IMPORT, "Import of all the games in a compilation")]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [(STATUS_QUEUED, "Queued"), (STATUS_RUNNING, "Running"), (STATUS_DONE, "Done"),
+                      (STATUS_FAILED, "Failed")]
+
+    id = models.BigAutoField(primary_key=True, db_column='id')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_DETAILS, db_column='kind')
+    url = models.CharField(max_length=500, db_column='url')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_column='status')
+    progress = models.CharField(max_length=255, blank=True, default='', db_column='progress')
+    result = models.JSONField(null=True, blank=True, db_column='result')
+    error = models.TextField(null=True, blank=True, db_column='error')
+    attempts = models.IntegerField(default=0, db_column='attempts')
+    game_id = models.ForeignKey(Games, on_delete=models.SET_NULL, null=True, blank=True, related_name="scrape_jobs",
+                                db_column='game_id')
+    user_id = models.ForeignKey(UserModel, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name="scrape_jobs", db_column='user_id')
+    # The hash of the kind and the url while the job is queued or running, NULL once it's finished. It's unique, so the
+    # same game can't be queued twice even when two requests try at the same moment (MySQL has no partial unique
+    # indexes, and several NULLs don't break a unique index)
+    active_key = models.CharField(max_length=64, null=True, blank=True, unique=True, db_column='active_key')
+    # The worker running the job and the last time it said it's still alive (see jobs.py)
+    worker_id = models.CharField(max_length=64, null=True, blank=True, db_column='worker_id')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, db_column='heartbeat_at')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+    started_at = models.DateTimeField(null=True, blank=True, db_column='started_at')
+    finished_at = models.DateTimeField(null=True, blank=True, db_column='finished_at')
+
+    class Meta:
+        db_table = 'ScrapeJobs'
+        indexes = [models.Index(fields=["status", "created_at"], name="scrapejobs_status_idx"),
+                   models.Index(fields=["url"], name="scrapejobs_url_idx")]
+
+
+# A user waiting for a job somebody else queued - the same url was already in the queue when they asked for it, so
+# they got that job instead of a new one (see enqueue_job). Only the user of the job and its watchers can see it
+class ScrapeJobWatcher(models.Model):
+    id = models.BigAutoField(primary_key=True, db_column='id')
+    job_id = models.ForeignKey(ScrapeJob, on_delete=models.CASCADE, related_name="watchers", db_column='job_id')
+    user_id = models.ForeignKey(UserModel, on_delete=models.CASCADE, related_name="watched_scrape_jobs",
+                                db_column='user_id')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+
+    class Meta:
+        db_table = 'ScrapeJobWatchers'
+        unique_together = ('job_id', 'user_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.url} ({self.status})"
+
+
+# A summary the model has already made, under the hash of the text, its length tier and the model which made it (see
+# summary_cache.py). The same section of a plot is then never summarized twice, not even after a reload of the game
+class SummaryCache(models.Model):
+    id = models.BigAutoField(primary_key=True, db_column='id')
+    cache_key = models.CharField(max_length=64, unique=True, db_column='cache_key')
+    tier = models.CharField(max_length=10, db_column='tier')
+    model_id = models.CharField(max_length=255, db_column='model_id')
+    summary = models.TextField(db_column='summary')
+    hits = models.IntegerField(default=0, db_column='hits')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+    last_used_at = models.DateTimeField(auto_now=True, db_column='last_used_at')
+
+    class Meta:
+        db_table = 'SummaryCache'
+
+    def __str__(self):
+        return f"{self.model_id} {self.tier} {self.cache_key[:12]} ({self.hits} hits)"
+
+
+# The lock of the import of one MobyGames page, shared by all the worker processes (see imports.py). The url is unique,
+# so only one process can insert the row, and "expires_at" lets the others take it over when the process holding it
+# died without removing it
+class ImportLock(models.Model):
+    id = models.BigAutoField(primary_key=True, db_column='id')
+    url = models.CharField(max_length=500, unique=True, db_column='url')
+    token = models.CharField(max_length=32, db_column='token')
+    expires_at = models.DateTimeField(db_column='expires_at')
+
+    class Meta:
+        db_table = 'ImportLocks'
+
+    def __str__(self):
+        return f"{self.url} (until {self.expires_at})"
@@ -0,0 +1,259 @@
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import random
+import time
+import urllib.parse
+
+import httpx
+from django.conf import settings
+
+
+# The priorities of the outbound requests, the lower the number the sooner the request is sent. A user waiting for the
+# search results goes before the admin reloading a game, and both go before the bulk imports (whole compilations, the
+# catalog refresh) which nobody is actively waiting for
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_ADMIN = "admin"
+PRIORITY_BULK = "bulk"
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_ADMIN: 1, PRIORITY_BULK: 2}
+
+# The responses which mean "try again later" - throttling and the errors of an overloaded server
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# The priority of everything the current task downloads. It's a context variable, so it doesn't have to be passed
+# through every scraper function - the tasks started by a scraper (asyncio.gather) inherit it
+_priority = contextvars.ContextVar("scrape_priority", default=PRIORITY_INTERACTIVE)
+
+
+# Runs the coroutine with the given priority of its outbound requests, e.g.
+# await run_scraper(with_priority(PRIORITY_BULK, import_compilation(url)))
+async def with_priority(priority: str, coro):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}'")
+    token = _priority.set(priority)
+    try:
+        return await coro
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+# The limits of the host - SCRAPER_HOST_RATE_LIMITS is matched by the domain, so "www.mobygames.com" and
+# "cdn.mobygames.com" both use the limit of "mobygames.com" (each of them with its own bucket). Hosts which aren't
+# listed are not limited, their requests are only counted
+def host_limit(host: str):
+    limits = getattr(settings, "SCRAPER_HOST_RATE_LIMITS", {})
+    for domain, limit in limits.items():
+        if host == domain or host.endswith("." + domain):
+            return limit.get("rate"), limit.get("burst", 1)
+    return None, None
+
+
+# A token bucket of one host. "rate" tokens are added every second, up to "burst" of them, and every request takes one.
+# The requests which can't get a token right away wait in a heap ordered by their priority (and then by the order in
+# which they came), so an interactive search which comes later still goes before the waiting bulk imports
+class HostBucket:
+    def __init__(self, host: str, rate: float = None, burst: int = 1):
+        self.host = host
+        self.rate = rate
+        self.burst = max(1, burst or 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        # Until when the host is paused after it answered with 429 and Retry-After
+        self.paused_until = 0.0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._timer = None
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.max_queue = 0
+        self.wait_total = {p: 0.0 for p in PRIORITIES}
+        self.wait_max = {p: 0.0 for p in PRIORITIES}
+        self.waited = {p: 0 for p in PRIORITIES}
+
+    def _refill(self, now: float):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self, now: float) -> bool:
+        if not self.rate:
+            return now >= self.paused_until
+        self._refill(now)
+        if now >= self.paused_until and self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    # How long until the next request can be sent
+    def _delay(self, now: float) -> float:
+        delay = max(0.0, self.paused_until - now)
+        if self.rate and self.tokens < 1:
+            delay = max(delay, (1 - self.tokens) / self.rate)
+        return delay
+
+    def _record_wait(self, priority: str, waited: float):
+        self.waited[priority] += 1
+        self.wait_total[priority] += waited
+        self.wait_max[priority] = max(self.wait_max[priority], waited)
+
+    # Lets the waiting requests through, as many as there are tokens, and sets the timer for the rest
+    def _dispatch(self):
+        self._timer = None
+        now = time.monotonic()
+        while self._waiters:
+            _, _, started, priority, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take(now):
+                break
+            heapq.heappop(self._waiters)
+            self._record_wait(priority, now - started)
+            future.set_result(None)
+        if self._waiters and self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self._delay(now), self._dispatch)
+
+    async def acquire(self, priority: str):
+        now = time.monotonic()
+        self.requests += 1
+        if not self._waiters and self._take(now):
+            self._record_wait(priority, 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[priority], next(self._counter), now, priority, future))
+        self.max_queue = max(self.max_queue, self.queue_depth)
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._delay(now), self._dispatch)
+        await future
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(not w[4].done() for w in self._waiters)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue,
+            "wait": {
+                p: {
+                    "requests": self.waited[p],
+                    "avg": round(self.wait_total[p] / self.waited[p], 3) if self.waited[p] else 0.0,
+                    "max": round(self.wait_max[p], 3),
+                }
+                for p in PRIORITIES
+            },
+        }
+
+
+# Every request the scrapers send to MobyGames, Wikipedia and the image servers goes through here. Before, dozens of
+# concurrent searches and imports hit the websites all at once, and the bursts were answered with 429 or blocked
+# altogether, which was much slower than sending the same requests at a steady pace. The scheduler keeps one token
+# bucket per host (see HostBucket above), orders the waiting requests by their priority and retries the requests
+# answered with 429/5xx (or failed on the network) after an exponential backoff with jitter. A Retry-After header
+# pauses the whole host, not only the one request. The scheduler lives on the event loop of the browser pool together
+# with all the scrapers, so the limits are per process
+class OutboundScheduler:
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, url: str) -> HostBucket:
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        if host not in self.buckets:
+            rate, burst = host_limit(host)
+            self.buckets[host] = HostBucket(host, rate, burst)
+        return self.buckets[host]
+
+    # Waits for the turn of the request (used directly by the browser, which makes the request itself)
+    async def acquire(self, url: str, priority: str = None):
+        await self.bucket(url).acquire(priority or current_priority())
+
+    # Retry-After is respected, but never longer than SCRAPER_RETRY_MAX_DELAY, so a user isn't left waiting for minutes
+    def _backoff(self, attempt: int, resp=None) -> float:
+        base = getattr(settings, "SCRAPER_RETRY_BASE_DELAY", 0.5)
+        cap = getattr(settings, "SCRAPER_RETRY_MAX_DELAY", 10.0)
+        if resp is not None and resp.headers.get("Retry-After"):
+            retry_after = _parse_retry_after(resp.headers["Retry-After"])
+            if retry_after is not None:
+                return min(cap, retry_after)
+        # "Full jitter" - a random delay up to the exponential one, so the retries of many requests don't all come back
+        # at the same moment
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, priority: str = None, **kwargs):
+        bucket = self.bucket(url)
+        priority = priority or current_priority()
+        attempts = max(1, getattr(settings, "SCRAPER_RETRY_ATTEMPTS", 3))
+        for attempt in range(attempts):
+            await bucket.acquire(priority)
+            try:
+                resp = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                bucket.errors += 1
+                if attempt == attempts - 1:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"[OUTBOUND] {method} {url} failed ({e.__class__.__name__}), retrying in {delay:.1f}s.")
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                    return resp
+                delay = self._backoff(attempt, resp)
+                if resp.status_code == 429:
+                    bucket.throttled += 1
+                    bucket.pause(delay)
+                print(f"[OUTBOUND] {method} {url} answered {resp.status_code}, retrying in {delay:.1f}s.")
+            bucket.retries += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, client: httpx.AsyncClient, url: str, priority: str = None, **kwargs):
+        return await self.request(client, "GET", url, priority=priority, **kwargs)
+
+    def stats(self) -> dict:
+        return {host: bucket.stats() for host, bucket in sorted(self.buckets.items())}
+
+
+# Retry-After is either a number of seconds or a date
+def _parse_retry_after(value: str):
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+_scheduler = None
+
+
+def get_scheduler() -> OutboundScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = OutboundScheduler()
+    return _scheduler
+
+
+# A coroutine, so it's read on the event loop of the scrapers (arun_scraper) and not in the middle of its changes
+async def outbound_stats() -> dict:
+    return get_scheduler().stats()
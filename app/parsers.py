@@ -0,0 +1,197 @@
+import re
+
+from bs4 import BeautifulSoup, Comment, FeatureNotFound, NavigableString
+from django.conf import settings
+
+
+# The address of MobyGames is taken from settings.py, so the scrapers can be pointed at the fake sites server (see
+# fake_sites.py) instead of the real website
+def mobygames_url() -> str:
+    return getattr(settings, "MOBYGAMES_URL", "https://www.mobygames.com").rstrip("/")
+
+
+# Tags after which the browser would start a new line of text
+_BLOCK_TAGS = {"address", "article", "br", "dd", "div", "dl", "dt", "h1", "h2", "h3", "h4", "h5", "h6", "li", "ol", "p",
+               "section", "table", "tbody", "td", "th", "tr", "ul"}
+
+# The places on the MobyGames game page where the description of the game can be found, in the order they are checked
+_DESCRIPTION_SELECTORS = ["#description-text", "#description-text .text-content", "div#description",
+                          "div.description-content"]
+
+
+# Every page is parsed exactly once. lxml is several times faster than Python's built-in "html.parser", and since it's
+# only a different parser under the same BeautifulSoup interface, nothing else has to change. If lxml isn't installed
+# it falls back to the built-in parser
+def make_soup(html: str) -> BeautifulSoup:
+    parser = getattr(settings, "SCRAPER_HTML_PARSER", "lxml")
+    try:
+        return BeautifulSoup(html or "", parser)
+    except FeatureNotFound:
+        return BeautifulSoup(html or "", "html.parser")
+
+
+# BeautifulSoup's get_text() glues all the text together, while Playwright's inner_text() used to return it the way the
+# browser shows it, with every block element in a new line. The search results rely on that (the first line is the
+# game's title), so this function imitates inner_text() for the pages that are no longer opened in the browser
+def element_text(tag) -> str:
+    parts = []
+
+    def walk(node):
+        for el in node.children:
+            if isinstance(el, NavigableString):
+                if not isinstance(el, Comment):
+                    parts.append(str(el))
+            elif el.name not in ("script", "style"):
+                is_block = el.name in _BLOCK_TAGS
+                if is_block:
+                    parts.append("\n")
+                walk(el)
+                if is_block:
+                    parts.append("\n")
+
+    walk(tag)
+    lines = [re.sub(r"\s+", " ", ln).strip() for ln in "".join(parts).split("\n")]
+    return "\n".join(ln for ln in lines if ln)
+
+
+def _absolute(href: str) -> str:
+    if href and href.startswith("/"):
+        return f"{mobygames_url()}{href}"
+    return href
+
+
+# MobyGames keeps the extra information about the game (compilations, base games, DLCs...) in bordered boxes with a
+# bold heading. This finds the box with the given heading
+def _bordered_box(soup: BeautifulSoup, heading: str):
+    for div in soup.find_all("div", class_="border"):
+        b = div.find("b")
+        if b and heading in b.get_text(strip=True):
+            return div
+    return None
+
+
+# The "This Compilation Includes" list - the games (with their urls and years) a compilation is made of
+def _compilation_games(soup: BeautifulSoup) -> list:
+    games = []
+    box = _bordered_box(soup, "This Compilation Includes")
+    if box is None:
+        return games
+    for li in box.select("ul li"):
+        links = li.find_all("a", href=True)
+        if not links:
+            continue
+        year_tag = li.find("small", class_="text-muted")
+        games.append({
+            "title": links[-1].get_text(strip=True),
+            "url": _absolute(links[-1]["href"]),
+            "year": year_tag.get_text(strip=True) if year_tag else None,
+        })
+    return games
+
+
+# The link from the "Base Game" box, present on the pages of the game's editions
+def _base_game_url(soup: BeautifulSoup) -> str | None:
+    box = _bordered_box(soup, "Base Game")
+    if box is None:
+        return None
+    link = box.find("ul")
+    if not link:
+        return None
+    hrefs = [a["href"] for a in link.find_all("a", href=True) if "game" in a["href"]]
+    return _absolute(hrefs[-1]) if hrefs else None
+
+
+# The <dt>/<dd> pairs (e.g. "Released" - "January 1st 2025") of one of the metadata boxes on the game page
+def _metadata(soup: BeautifulSoup, box_selector: str) -> list:
+    dt_tags = soup.select(f"{box_selector} dl.metadata dt")
+    dd_tags = soup.select(f"{box_selector} dl.metadata dd")
+    return [(dt.get_text(" ", strip=True), dd) for dt, dd in zip(dt_tags, dd_tags)]
+
+
+# The description of the game on MobyGames, as a list of paragraphs. It's used as the "plot" of games which don't have
+# one on Wikipedia
+def parse_description(soup: BeautifulSoup) -> str:
+    for selector in _DESCRIPTION_SELECTORS:
+        tag = soup.select_one(selector)
+        if not tag or not tag.decode_contents().strip():
+            continue
+        paragraphs = [p.get_text(" ", strip=True) for p in tag.find_all("p")]
+        if not paragraphs:
+            raw_text = tag.get_text(" ", strip=True)
+            paragraphs = [raw_text] if raw_text else []
+        return "\n".join(paragraphs).strip()
+    return ""
+
+
+# Everything the scrapers need from a MobyGames game page, taken from one parsed snapshot of the page. It used to be
+# dozens of separate calls to the browser (and three separate BeautifulSoup parses of the same html). Now it's a plain
+# function of the html, so it can be checked against a saved page without the network or the browser
+def parse_game_page(page) -> dict:
+    soup = page if isinstance(page, BeautifulSoup) else make_soup(page)
+
+    title_tag = soup.select_one("h1.mb-0")
+    title = title_tag.get_text(" ", strip=True) if title_tag else None
+
+    # Both released and studio (visible on MobyGames as "Developers") are in the same div
+    released = None
+    developers = []
+    for label, dd in _metadata(soup, "div.info-release"):
+        if label == "Released":
+            released = dd.get_text(" ", strip=True)
+        elif label == "Developers":
+            # Made into a list in case of multiple studios working on the game
+            developers = [a.get_text(" ", strip=True) for a in dd.find_all("a")]
+
+    genres = []
+    for label, dd in _metadata(soup, "div.info-genres"):
+        if label == "Genre":
+            genres = [a.get_text(" ", strip=True) for a in dd.find_all("a")]
+            break
+
+    # Mobyscore, a score given by MobyGames official reviewers (it has a different structure from the rest)
+    score_tag = soup.select_one("div.info-score div.mobyscore")
+    cover_tag = soup.select_one("div.info-box img.img-box")
+
+    return {
+        "title": title,
+        "released": released,
+        "developers": developers,
+        "genres": genres,
+        "score": score_tag.get_text(strip=True) if score_tag else None,
+        "cover_image_url": cover_tag.get("src") if cover_tag else None,
+        "compilation_games": _compilation_games(soup),
+        "base_game_url": _base_game_url(soup),
+        "description": parse_description(soup),
+    }
+
+
+# The game results from the MobyGames search page (the rows of other types, e.g. companies or people, are skipped). For
+# every game there is its url, the description shown on the website (title, year, platforms) and the url of its
+# thumbnail (None when the row has no image)
+def parse_search_results(page, limit: int = 5) -> list:
+    soup = page if isinstance(page, BeautifulSoup) else make_soup(page)
+    results = []
+    for row in soup.select("table.table.mb tbody tr")[:limit * 2]:
+        td = row.select_one("td:nth-child(2)")
+        if not td:
+            continue
+        text = element_text(td).strip()
+        if not (text.startswith("GAME:") or text.startswith("ADULT GAME:")):
+            continue
+
+        clean_text = re.sub(r'^(ADULT\s+)?GAME:\s*', '', text, flags=re.IGNORECASE).strip()
+        lines = [ln.strip() for ln in clean_text.splitlines() if ln.strip()]
+        filtered = [ln for ln in lines if "mature content" not in ln.lower() and ln != "View Content"]
+
+        link_el = td.select_one("b a[href]") or td.select_one("a[href]")
+        href = link_el.get("href") if link_el else None
+        img = row.select_one("td:nth-child(1) img")
+
+        results.append({
+            "url": f"{mobygames_url()}{href}" if href and not href.startswith("http") else href,
+            "description": "\n".join(filtered),
+            "thumbnail": img.get("src") if img else None,
+        })
+        if len(results) >= limit:
+            break
+    return results
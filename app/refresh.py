@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Games, GamePlots, UserHistory
+from .outbound import PRIORITY_BULK, with_priority
+from .utils import scrape_game_info_admin
+
+
+# Runs the admin reload of one game and saves only what actually changed. When the Wikipedia plot has the same hash as
+# the last time, nothing is scraped or summarized and only "refreshed_at" is moved. When it's different, the plot, the
+# summary and the hash are saved (only the fields which are different), and the same goes for the Wikipedia url. The
+# result is "unchanged", "updated" or "failed" (no MobyGames url, or the game page, Wikipedia or the summarizer failed -
+# nothing is saved then, not even "refreshed_at", so the game is tried again the next time). With force=True the summary
+# is generated again even for an unchanged plot
+async def refresh_game(game: Games, force: bool = False) -> str:
+    if not game.mobygames_url:
+        return "failed"
+
+    plot = await GamePlots.objects.filter(game_id=game).afirst()
+    known_hash = None if force or not plot else plot.plot_hash
+    data = await scrape_game_info_admin(game.mobygames_url, settings.MEDIA_ROOT, plot_hash=known_hash)
+    now = timezone.now()
+    if data.get("error"):
+        print(f"[REFRESH] {game.title}: {data['error']}")
+        return "failed"
+
+    if data.get("wikipedia_url") and data["wikipedia_url"] != game.wikipedia_url:
+        game.wikipedia_url = data["wikipedia_url"]
+        await game.asave(update_fields=["wikipedia_url"])
+
+    if data.get("unchanged"):
+        await GamePlots.objects.filter(id=plot.id).aupdate(refreshed_at=now)
+        return "unchanged"
+
+    # The placeholders ("## No Plot Found" when the article has no plot section, "## No Summary Available" when the plot
+    # is too short to be summarized) only go into a plot which doesn't have anything yet, they never replace the plot or
+    # the summary already saved
+    if not plot:
+        plot = GamePlots(game_id=game)
+    fields = {}
+    if data.get("plot_hash"):
+        fields["full_plot"] = data["full_plot"]
+        fields["plot_hash"] = data["plot_hash"]
+    if data.get("plot_hash") and "No Summary Available" not in data["summary"]:
+        fields["summary"] = data["summary"]
+    if not plot.full_plot:
+        fields.setdefault("full_plot", data.get("full_plot") or "## No Plot Found")
+    if not plot.summary:
+        fields.setdefault("summary", data.get("summary") or "## No Summary Available")
+
+    changed = [name for name, value in fields.items() if getattr(plot, name) != value]
+    for name in changed:
+        setattr(plot, name, fields[name])
+    plot.refreshed_at = now
+    if plot.pk is None:
+        await plot.asave()
+    else:
+        await plot.asave(update_fields=changed + ["refreshed_at"])
+    return "updated" if changed else "unchanged"
+
+
+# The order in which the catalog is refreshed. The games whose plot hasn't been checked for "stale_after" (or ever) go
+# first and among them (and later among the rest) the ones viewed by the most users go first
+def catalog_order(stale_after: timedelta, limit: int = None) -> list:
+    cutoff = timezone.now() - stale_after
+    views = dict(UserHistory.objects.values("game_id").annotate(n=Count("user_id", distinct=True))
+                 .values_list("game_id", "n"))
+    refreshed = {}
+    for game_id, refreshed_at in GamePlots.objects.values_list("game_id", "refreshed_at"):
+        # A game has one plot, but in case of duplicates the oldest refresh counts
+        previous = refreshed.get(game_id)
+        if game_id not in refreshed or refreshed_at is None or (previous and refreshed_at < previous):
+            refreshed[game_id] = refreshed_at
+
+    order = {}
+    games = Games.objects.exclude(mobygames_url__isnull=True).exclude(mobygames_url="")
+    for game_id in games.values_list("id", flat=True):
+        refreshed_at = refreshed.get(game_id)
+        stale = refreshed_at is None or refreshed_at < cutoff
+        order[game_id] = (not stale, -views.get(game_id, 0), refreshed_at.timestamp() if refreshed_at else 0.0)
+    ids = sorted(order, key=lambda game_id: order[game_id])
+    return ids[:limit] if limit else ids
+
+
+# The progress of the refresh is saved into a JSON file after every game (through a temporary file, so it's never
+# half-written), which is what lets a refresh killed in the middle continue where it stopped
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {}
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data = json.load(f)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def start(self, order: list):
+        self.data = {"started_at": timezone.now().isoformat(), "finished_at": None, "order": order, "done": {}}
+        self.save()
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.data.get("finished_at"))
+
+    def pending(self) -> list:
+        done = self.data.get("done", {})
+        return [game_id for game_id in self.data.get("order", []) if str(game_id) not in done]
+
+    def mark(self, game_id: int, status: str):
+        self.data["done"][str(game_id)] = status
+        self.save()
+
+    def finish(self):
+        self.data["finished_at"] = timezone.now().isoformat()
+        self.save()
+
+    def counts(self) -> dict:
+        counts = {}
+        for status in self.data.get("done", {}).values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+
+# Refreshes the games from the checkpoint, "concurrency" of them at the same time (they share the browser pool, the
+# outbound scheduler with the bulk priority, so the users' searches still go first, and the HTTP cache, so the pages
+# which haven't changed are barely downloaded). After "max_duration" seconds no new games are started, the running ones
+# are finished and the rest is left in the checkpoint for the next run
+async def refresh_catalog(checkpoint: Checkpoint, concurrency: int, max_duration: float = None, force: bool = False,
+                          on_progress=None):
+    deadline = time.monotonic() + max_duration if max_duration else None
+    pending = checkpoint.pending()
+    queue = asyncio.Queue()
+    for game_id in pending:
+        queue.put_nowait(game_id)
+
+    async def worker():
+        while not queue.empty():
+            if deadline and time.monotonic() > deadline:
+                return
+            game_id = queue.get_nowait()
+            game = await Games.objects.filter(id=game_id).afirst()
+            if game is None:
+                status = "missing"
+            else:
+                try:
+                    status = await with_priority(PRIORITY_BULK, refresh_game(game, force=force))
+                except Exception as e:
+                    print(f"[REFRESH] Could not refresh the game {game_id}: {e}")
+                    status = "failed"
+            checkpoint.mark(game_id, status)
+            if on_progress:
+                on_progress(game_id, game.title if game else None, status)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    if not checkpoint.pending():
+        checkpoint.finish()
@@ -0,0 +1,130 @@
+import hashlib
+import re
+import time
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+
+KEY_PREFIX = "search:"
+INDEX_KEY = KEY_PREFIX + "index"
+HITS_KEY = KEY_PREFIX + "hits"
+MISSES_KEY = KEY_PREFIX + "misses"
+
+
+# The same game is searched in many different ways - "The Witcher 3", "the witcher 3 " or "The Witcher 3:" all give the
+# same results on MobyGames. The query is case-folded, the punctuation is removed and the whitespace is collapsed, so
+# all of them end up under one key
+def normalize_query(query: str) -> str:
+    query = unicodedata.normalize("NFKC", query or "").casefold()
+    query = re.sub(r"[^\w\s]", " ", query)
+    return re.sub(r"\s+", " ", query).strip()
+
+
+# The query is hashed, because Memcached doesn't accept keys with spaces (or longer than 250 characters)
+def _key(normalized: str) -> str:
+    return KEY_PREFIX + "q:" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _atime_key(normalized: str) -> str:
+    return KEY_PREFIX + "atime:" + hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+# The hits and misses are counted with cache.incr. It's atomic on Redis and Memcached, but the file based cache reads
+# the number, adds one and writes it back, so two processes counting at the same moment lose one of the counts. The
+# stats are only exact with one of the atomic backends (DJANGO_CACHE_BACKEND), with the file based one they're an
+# approximation
+def _incr(key: str):
+    # cache.add only sets the counter when it doesn't exist yet, so the two processes can't reset each other's counts
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+# The cache backends don't know anything about the least recently used entries (and the file based one removes random
+# entries when it's full), so every query keeps the time it was last used under its own key. A hit only writes that one
+# key, so the processes never overwrite each other's hits. The list of the cached queries (INDEX_KEY) is changed only
+# when a new query is cached, and when there are more than SEARCH_CACHE_MAX_ENTRIES of them, the least recently used
+# ones are removed - a tenth of the limit at once, so the times aren't read for every new query. Two processes caching
+# new queries at the same moment can still lose one of them from the list, but such a query only stays in the cache
+# until its TTL runs out
+def _touch(normalized: str):
+    cache.set(_atime_key(normalized), time.time(), timeout=getattr(settings, "SEARCH_CACHE_TTL", 6 * 60 * 60))
+
+
+def _add_to_index(normalized: str):
+    max_entries = getattr(settings, "SEARCH_CACHE_MAX_ENTRIES", 500)
+    index = cache.get(INDEX_KEY, [])
+    if normalized in index:
+        return
+    index.append(normalized)
+    if len(index) > max_entries:
+        atimes = cache.get_many([_atime_key(q) for q in index])
+        # The queries whose time is gone have already expired
+        index.sort(key=lambda q: atimes.get(_atime_key(q), 0))
+        keep = max(1, max_entries - max_entries // 10)
+        evicted, index = index[:-keep], index[-keep:]
+        cache.delete_many([_key(q) for q in evicted] + [_atime_key(q) for q in evicted])
+    cache.set(INDEX_KEY, index, timeout=None)
+
+
+def get_cached_results(query: str):
+    normalized = normalize_query(query)
+    results = cache.get(_key(normalized)) if normalized else None
+    if results is None:
+        _incr(MISSES_KEY)
+        return None
+    _incr(HITS_KEY)
+    _touch(normalized)
+    print(f"[SEARCH CACHE] Hit for '{normalized}'")
+    return results
+
+
+# An empty list isn't cached, because it's also what the scraper returns when MobyGames couldn't be reached
+def set_cached_results(query: str, results: list):
+    normalized = normalize_query(query)
+    if not normalized or not results:
+        return
+    cache.set(_key(normalized), results, timeout=getattr(settings, "SEARCH_CACHE_TTL", 6 * 60 * 60))
+    _touch(normalized)
+    _add_to_index(normalized)
+
+
+# The search with the cache in front of it. Popular titles are returned straight from the cache and only the rest
+# goes to MobyGames
+def cached_search(query: str, search):
+    results = get_cached_results(query)
+    if results is None:
+        results = search(query)
+        set_cached_results(query, results)
+    return results
+
+
+# The same for the async views - "search" is a coroutine function and the cache is read in a thread
+async def acached_search(query: str, search):
+    results = await sync_to_async(get_cached_results)(query)
+    if results is None:
+        results = await search(query)
+        await sync_to_async(set_cached_results)(query, results)
+    return results
+
+
+def cache_stats() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    index = cache.get(INDEX_KEY, [])
+    atimes = cache.get_many([_atime_key(q) for q in index])
+    recent = sorted((q for q in index if _atime_key(q) in atimes), key=lambda q: atimes[_atime_key(q)], reverse=True)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "entries": len(recent),
+        "max_entries": getattr(settings, "SEARCH_CACHE_MAX_ENTRIES", 500),
+        "ttl": getattr(settings, "SEARCH_CACHE_TTL", 6 * 60 * 60),
+        "recent_queries": recent[:10],
+    }
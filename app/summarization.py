@@ -0,0 +1,357 @@
+import os
+import re
+import time
+from multiprocessing.connection import AuthenticationError, Client
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from transformers import pipeline
+
+from .summary_cache import get_summaries, save_summaries, summary_cache_enabled, summary_key
+
+
+# The length tiers of the summaries. A text shorter than 80 words isn't summarized at all, the longer ones get a summary
+# whose length grows with them. The texts of 500 words and more may be too long for the model, so they are split into
+# chunks and every chunk is summarized with the "long" arguments (see split_chunks)
+TIERS = {
+    "short": {"max_length": 120, "min_length": 50},   # 80 - 199 words
+    "medium": {"max_length": 160, "min_length": 80},  # 200 - 499 words
+    "long": {"max_length": 180, "min_length": 80},    # 500 words and more, for every chunk
+}
+
+
+def word_count(text: str) -> int:
+    return len((text or "").split())
+
+
+def tier_for(words: int) -> str | None:
+    if words < 80:
+        return None
+    if words < 200:
+        return "short"
+    if words < 500:
+        return "medium"
+    return "long"
+
+
+# Where the sentences end - after ".", "!" or "?" (also followed by a quote or a bracket) and at the end of a paragraph
+_sentence_end = re.compile(r'(?<=[.!?])\s+|(?<=[.!?]["\'\u201d\u2019)])\s+|\n+')
+
+
+def split_sentences(text: str) -> list:
+    return [s.strip() for s in _sentence_end.split(text or "") if s.strip()]
+
+
+# The model can't take more than 1024 tokens, so the long texts are divided into chunks. They used to be slices of 3500
+# characters, which cut the sentences in half and could still be longer than 1024 tokens (the rest was silently cut off
+# by the model, after it had been processed anyway). Now the chunks are made of whole sentences, as many of them as
+# fit into SUMMARIZER_CHUNK_TOKENS tokens of the model's own tokenizer, so there are fewer and fuller chunks and nothing
+# is cut off. With SUMMARIZER_CHUNK_OVERLAP the last sentences of a chunk are repeated at the start of the next one (at
+# most a quarter of the budget), so the summary of the next chunk knows what it continues. A sentence longer than the
+# whole budget is divided by words. Without a tokenizer (e.g. a model that doesn't have one) the tokens are estimated
+# from the words
+def split_chunks(text: str, tokenizer=None, max_tokens: int = None, overlap: int = None) -> list:
+    max_tokens = max_tokens or getattr(settings, "SUMMARIZER_CHUNK_TOKENS", 1000)
+    if tokenizer is not None and getattr(tokenizer, "model_max_length", None):
+        # The room for the special tokens the model adds to every text
+        max_tokens = min(max_tokens, tokenizer.model_max_length - 2)
+    overlap = getattr(settings, "SUMMARIZER_CHUNK_OVERLAP", 0) if overlap is None else overlap
+
+    def count(parts: list) -> list:
+        if tokenizer is None:
+            return [int(len(p.split()) * 1.4) + 1 for p in parts]
+        return [len(ids) for ids in tokenizer(parts, add_special_tokens=False)["input_ids"]]
+
+    sentences = []
+    parts = split_sentences(text)
+    for sentence, tokens in zip(parts, count(parts)):
+        if tokens <= max_tokens:
+            sentences.append((sentence, tokens))
+            continue
+        words = sentence.split()
+        step = max(1, len(words) * max_tokens // tokens)
+        pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        sentences.extend(zip(pieces, count(pieces)))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for sentence, tokens in sentences:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(s for s, _ in current))
+            carried, carried_tokens = [], 0
+            for previous in reversed(current[-overlap:] if overlap else []):
+                if carried_tokens + previous[1] > max_tokens // 4:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[1]
+            # The repeated sentences are only a hint, the next sentence mustn't be pushed over the budget by them
+            if carried_tokens + tokens > max_tokens:
+                carried, carried_tokens = [], 0
+            current, current_tokens = carried, carried_tokens
+        current.append((sentence, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(s for s, _ in current))
+    return chunks
+
+
+# How many threads torch uses for the model. By default it takes every core of the machine, which is fine for one
+# process, but not when the summarizer service runs next to the web server on the same host
+def configure_torch_threads(threads: int = None):
+    threads = threads or getattr(settings, "SUMMARIZER_TORCH_THREADS", None)
+    if not threads:
+        return
+    import torch
+    torch.set_num_threads(threads)
+    print(f"[SUMMARY] torch uses {threads} thread(s).")
+
+
+# The ways the summarization model can be run, chosen with SUMMARIZER_BACKEND. Every one of them gives a transformers
+# pipeline, so the engine below works with all of them the same way:
+#   "torch"      - the model as it is, in full precision (the default)
+#   "torch-int8" - the weights of the linear layers quantized to int8 when the model is loaded, which makes it
+#                  noticeably faster on CPU and smaller in the memory, with summaries very close to the original ones
+#   "onnx"       - the model exported to ONNX and run by ONNX Runtime. It needs "pip install optimum[onnxruntime]"
+#                  and the exported model is saved into SUMMARIZER_ONNX_DIR, so it's exported only the first time
+# "python manage.py benchmark_summarizer --backends torch,torch-int8,onnx" compares their speed and their summaries
+def _load_torch(model_name: str):
+    return pipeline("summarization", model=model_name)
+
+
+def _load_torch_int8(model_name: str):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("summarization", model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+
+
+def _load_onnx(model_name: str):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImproperlyConfigured('SUMMARIZER_BACKEND "onnx" needs optimum with ONNX Runtime: '
+                                   'pip install optimum[onnxruntime]')
+    from transformers import AutoTokenizer
+
+    onnx_dir = getattr(settings, "SUMMARIZER_ONNX_DIR", os.path.join(settings.BASE_DIR, ".cache", "onnx"))
+    export_dir = os.path.join(onnx_dir, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        model = ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        print(f"[SUMMARY] Exporting {model_name} to ONNX into {export_dir}, only the first time...")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+    return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+BACKENDS = {
+    "torch": _load_torch,
+    "torch-int8": _load_torch_int8,
+    "onnx": _load_onnx,
+}
+
+
+def backend_name() -> str:
+    return getattr(settings, "SUMMARIZER_BACKEND", "torch")
+
+
+def model_name() -> str:
+    return getattr(settings, "SUMMARIZER_MODEL", "sshleifer/distilbart-cnn-12-6")
+
+
+# Loads the model with the given backend (the one from the settings by default)
+def load_summarizer(backend: str = None):
+    backend = backend or backend_name()
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(f'Unknown SUMMARIZER_BACKEND "{backend}", it has to be one of: '
+                                   f'{", ".join(BACKENDS)}')
+    start = time.perf_counter()
+    model = BACKENDS[backend](model_name())
+    print(f"[SUMMARY] Loaded {model_name()} ({backend}) in {time.perf_counter() - start:.1f}s.")
+    return model
+
+
+# Model for summarization is used a couple of times in the project therefore it's declared only once. It's also in case
+# of future need to change the summarization model (SUMMARIZER_MODEL) or the way it runs (SUMMARIZER_BACKEND)
+summarizer = None
+def get_summarizer():
+    global summarizer
+    if summarizer is None:
+        configure_torch_threads()
+        summarizer = load_summarizer()
+    return summarizer
+
+
+# Summarizing a plot used to mean one call of the model for every section and every chunk of a long section, strictly
+# one after another, so the model never got more than one text at a time, which wastes most of what the CPU can do.
+# The engine first collects every text that needs a summary (all the sections of the plot and the chunks of the long
+# ones), groups them by their tier (the texts of one call have to share max_length and min_length) and sends every
+# group through the model in batches of SUMMARIZER_BATCH_SIZE. Inside a group the texts are sorted by their length, so
+# the texts of one batch are padded as little as possible. The summaries are then put back in the order of the texts
+# (and the chunks of one text are joined again), so the callers can rebuild the plot under its headings. With
+# batch_size=1 it's the same as the old loop, which is what the benchmark compares it to
+#
+# Every summary the model makes is saved into the summary cache (see summary_cache.py) under the hash of the text, its
+# tier and "model_id", and the texts already in it aren't sent to the model at all. A reload or a new import of a game
+# whose plot didn't change is then summarized without the model, and when only one section changed, only that one goes
+# to the model. The benchmark turns the cache off with cache=False, otherwise it would measure the database
+class SummarizationEngine:
+    def __init__(self, model=None, batch_size: int = None, model_id: str = None, cache: bool = None):
+        self._model = model
+        self.batch_size = max(1, batch_size or getattr(settings, "SUMMARIZER_BATCH_SIZE", 8))
+        self.model_id = model_id or f"{model_name()}:{backend_name()}"
+        self.cache = summary_cache_enabled() if cache is None else cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.model_calls = 0
+        self.texts = 0
+        self.words = 0
+        self.seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_summarizer()
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return getattr(self.model, "tokenizer", None)
+
+    # Returns the summary of every text, in the same order. The texts shorter than 80 words are returned as they are
+    def summarize(self, texts: list) -> list:
+        texts = [(t or "").strip() for t in texts]
+        tiers = [tier_for(word_count(t)) for t in texts]
+        # One list of parts per text, the chunks of a long text are summarized separately and joined at the end
+        parts = [None] * len(texts)
+
+        keys = {}
+        cached = {}
+        if self.cache:
+            keys = {i: summary_key(text, tier, self.model_id)
+                    for i, (text, tier) in enumerate(zip(texts, tiers)) if tier}
+            cached = get_summaries(list(set(keys.values())))
+
+        groups = {tier: [] for tier in TIERS}
+        summarized = []
+        for i, text in enumerate(texts):
+            tier = tiers[i]
+            if tier is None:
+                continue
+            if keys.get(i) in cached:
+                parts[i] = [cached[keys[i]]]
+                self.cache_hits += 1
+                continue
+            if self.cache:
+                self.cache_misses += 1
+            summarized.append(i)
+            chunks = split_chunks(text, self.tokenizer) if tier == "long" else [text]
+            parts[i] = [None] * len(chunks)
+            for n, chunk in enumerate(chunks):
+                groups[tier].append((i, n, chunk))
+
+        for tier, pieces in groups.items():
+            if self.batch_size > 1:
+                pieces.sort(key=lambda piece: len(piece[2]), reverse=True)
+            for start in range(0, len(pieces), self.batch_size):
+                batch = pieces[start:start + self.batch_size]
+                summaries = self._run(tier, [chunk for _, _, chunk in batch])
+                for (i, n, _), summary in zip(batch, summaries):
+                    parts[i][n] = summary
+
+        summaries = [text if parts[i] is None else " ".join(parts[i]) for i, text in enumerate(texts)]
+        if self.cache:
+            save_summaries([(keys[i], tiers[i], summaries[i]) for i in summarized], self.model_id)
+        return summaries
+
+    def _run(self, tier: str, batch: list) -> list:
+        start = time.perf_counter()
+        results = self.model(batch, batch_size=len(batch), do_sample=False, truncation=True, **TIERS[tier])
+        elapsed = time.perf_counter() - start
+
+        words = sum(word_count(t) for t in batch)
+        self.model_calls += 1
+        self.texts += len(batch)
+        self.words += words
+        self.seconds += elapsed
+        print(f"[SUMMARY] {len(batch)} {tier} text(s), {words} words in {elapsed:.1f}s")
+        # A list of texts gives one result per text, either a dictionary or a list with one dictionary in it
+        return [(r[0] if isinstance(r, list) else r)["summary_text"].strip() for r in results]
+
+    def stats(self) -> dict:
+        return {
+            "model_calls": self.model_calls,
+            "texts": self.texts,
+            "words": self.words,
+            "seconds": round(self.seconds, 3),
+            "words_per_second": round(self.words / self.seconds, 1) if self.seconds else 0.0,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+class SummarizerUnavailable(RuntimeError):
+    pass
+
+
+def service_address():
+    host, _, port = getattr(settings, "SUMMARIZER_SERVICE_ADDRESS", "").rpartition(":")
+    return (host or "127.0.0.1", int(port)) if port else None
+
+
+def service_authkey() -> bytes:
+    return (getattr(settings, "SUMMARIZER_SERVICE_AUTHKEY", None) or settings.SECRET_KEY).encode("utf-8")
+
+
+# The client of the summarizer service (python manage.py run_summarizer, see summarizer_service.py). It has the same
+# summarize() as the engine, so the functions in utils.py don't know whether the model runs in this process or in the
+# service. Every call opens its own connection (it's a local socket, so it costs next to nothing) and waits for the
+# summaries at most SUMMARIZER_SERVICE_TIMEOUT seconds. When the service isn't running, the summary fails with
+# SummarizerUnavailable instead of loading the model into the web server after all
+class RemoteSummarizer:
+    def __init__(self, address, authkey: bytes, timeout: float = None):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout or getattr(settings, "SUMMARIZER_SERVICE_TIMEOUT", 600)
+
+    def _request(self, message: dict) -> dict:
+        try:
+            conn = Client(self.address, authkey=self.authkey)
+        except (OSError, AuthenticationError) as e:
+            raise SummarizerUnavailable(f"The summarizer service at {self.address[0]}:{self.address[1]} "
+                                        f"is not available ({e}).")
+        with conn:
+            conn.send(message)
+            if not conn.poll(self.timeout):
+                raise SummarizerUnavailable(f"The summarizer service didn't answer in {self.timeout:.0f}s.")
+            response = conn.recv()
+        if "error" in response:
+            raise RuntimeError(f"The summarizer service failed: {response['error']}")
+        return response
+
+    def summarize(self, texts: list) -> list:
+        if not any(tier_for(word_count(t)) for t in texts):
+            # Nothing to summarize, the service isn't needed at all
+            return [(t or "").strip() for t in texts]
+        return self._request({"op": "summarize", "texts": list(texts)})["summaries"]
+
+    def stats(self) -> dict:
+        return self._request({"op": "stats"})["stats"]
+
+
+_engine = None
+
+
+# The engine the views and the scrapers use. With SUMMARIZER_SERVICE_ADDRESS set it's the client of the summarizer
+# service, so the model is loaded once per host in the service and not in every web server process
+def get_summarization_engine():
+    global _engine
+    if _engine is None:
+        address = service_address()
+        _engine = RemoteSummarizer(address, service_authkey()) if address else SummarizationEngine()
+    return _engine
@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .summarization import SummarizationEngine
+
+
+# One request waiting for the model
+class SummaryJob:
+    def __init__(self, texts: list):
+        self.texts = texts
+        self.summaries = None
+        self.error = None
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+
+
+# The summarizer used to be loaded lazily by whichever web server process needed it first, so every process could end up
+# with its own copy of the model in the memory, and a summary kept that process busy for minutes. The service is one
+# process which owns the model and which the web servers send the texts to over a local socket (see RemoteSummarizer in
+# summarization.py). Every connection is handled by its own thread, which only puts the texts into the queue and waits.
+# The model itself runs in one thread: it takes the first job from the queue together with every other job waiting at
+# that moment (up to SUMMARIZER_SERVICE_MAX_TEXTS texts) and summarizes all their texts at once, so the texts of several
+# games share the batches of the engine
+class SummarizerService:
+    def __init__(self, address, authkey: bytes, engine: SummarizationEngine = None, max_texts: int = None):
+        self.address = address
+        self.authkey = authkey
+        self.engine = engine or SummarizationEngine()
+        self.max_texts = max_texts or getattr(settings, "SUMMARIZER_SERVICE_MAX_TEXTS", 64)
+        self.jobs = queue.Queue()
+        self.served = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.started_at = time.time()
+
+    def serve_forever(self):
+        threading.Thread(target=self._model_loop, name="summarizer-model", daemon=True).start()
+        # The backlog of the socket is 1 by default, the other clients connecting at the same moment would be dropped
+        with Listener(self.address, backlog=64, authkey=self.authkey) as listener:
+            print(f"[SUMMARIZER] Listening on {self.address[0]}:{self.address[1]}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # A client with a wrong key or one which disconnected in the middle of the handshake
+                    print(f"[SUMMARIZER] Rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message.get("op") == "stats":
+                conn.send({"stats": self.stats()})
+                return
+            if message.get("op") != "summarize":
+                conn.send({"error": f"Unknown operation {message.get('op')!r}"})
+                return
+
+            job = SummaryJob(message.get("texts") or [])
+            self.jobs.put(job)
+            job.done.wait()
+            try:
+                conn.send({"error": job.error} if job.error else {"summaries": job.summaries})
+            except OSError:
+                # The client gave up waiting
+                pass
+
+    def _take_jobs(self) -> list:
+        jobs = [self.jobs.get()]
+        count = len(jobs[0].texts)
+        while count < self.max_texts:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            jobs.append(job)
+            count += len(job.texts)
+        return jobs
+
+    def _model_loop(self):
+        while True:
+            jobs = self._take_jobs()
+            texts = [text for job in jobs for text in job.texts]
+            start = time.perf_counter()
+            # The summary cache is read from the database in this thread, so its connection is renewed like the ones
+            # of the web requests when it gets too old (or the database dropped it)
+            close_old_connections()
+            try:
+                summaries = self.engine.summarize(texts)
+            except Exception as e:
+                # One bad text fails the whole merged batch, so every job is tried once more on its own and only the
+                # one which really can't be summarized gets the error
+                print(f"[SUMMARIZER] Summary of {len(jobs)} request(s) failed: {e}")
+                summaries = None
+                error = str(e)
+
+            position = 0
+            for job in jobs:
+                if summaries is not None:
+                    job.summaries = summaries[position:position + len(job.texts)]
+                    position += len(job.texts)
+                elif len(jobs) == 1:
+                    job.error = error
+                else:
+                    try:
+                        job.summaries = self.engine.summarize(job.texts)
+                    except Exception as job_error:
+                        print(f"[SUMMARIZER] Summary failed: {job_error}")
+                        job.error = str(job_error)
+                if job.error:
+                    self.failed += 1
+                else:
+                    self.wait_total += start - job.queued_at
+                    self.served += 1
+                job.done.set()
+            print(f"[SUMMARIZER] {len(jobs)} request(s), {len(texts)} text(s) in {time.perf_counter() - start:.1f}s, "
+                  f"{self.jobs.qsize()} waiting")
+
+    def stats(self) -> dict:
+        return {
+            **self.engine.stats(),
+            "requests": self.served,
+            "failed": self.failed,
+            "waiting": self.jobs.qsize(),
+            "avg_queue_wait": round(self.wait_total / self.served, 3) if self.served else 0.0,
+            "uptime": round(time.time() - self.started_at),
+        }
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import SummaryCache
+
+
+# The counters of this process (the summarizer service or the web server, whichever runs the model)
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def summary_cache_enabled() -> bool:
+    return getattr(settings, "SUMMARY_CACHE_ENABLED", True)
+
+
+# The key of a summary - the hash of the text, the tier it was summarized with (the tier decides the length of the
+# summary) and the model which made it (another model or backend makes different summaries, so they are kept apart).
+# The long texts are summarized chunk by chunk, so the size and the overlap of the chunks change their summary too
+def summary_key(text: str, tier: str, model_id: str) -> str:
+    parts = [model_id, tier]
+    if tier == "long":
+        parts.append(f"{getattr(settings, 'SUMMARIZER_CHUNK_TOKENS', 1000)}:"
+                     f"{getattr(settings, 'SUMMARIZER_CHUNK_OVERLAP', 0)}")
+    key = "\0".join(parts + [(text or "").strip()])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# The summaries already in the cache, by their key. A failing database never stops a summary, the texts are then simply
+# summarized again
+def get_summaries(keys: list) -> dict:
+    if not keys:
+        return {}
+    try:
+        found = dict(SummaryCache.objects.filter(cache_key__in=keys).values_list("cache_key", "summary"))
+        if found:
+            SummaryCache.objects.filter(cache_key__in=list(found)).update(hits=F("hits") + 1,
+                                                                          last_used_at=timezone.now())
+    except Exception as e:
+        print(f"[SUMMARY CACHE] Could not read the cache: {e}")
+        found = {}
+    with _lock:
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(set(keys)) - len(found)
+    return found
+
+
+# Saves the new summaries, entries is a list of (key, tier, summary). Two processes summarizing the same text at once
+# both try to save it, the second one is ignored
+def save_summaries(entries: list, model_id: str):
+    if not entries:
+        return
+    try:
+        SummaryCache.objects.bulk_create(
+            [SummaryCache(cache_key=key, tier=tier, model_id=model_id, summary=summary)
+             for key, tier, summary in entries],
+            ignore_conflicts=True,
+        )
+    except Exception as e:
+        print(f"[SUMMARY CACHE] Could not save the summaries: {e}")
+
+
+def summary_cache_stats() -> dict:
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    totals = SummaryCache.objects.aggregate(hits=Sum("hits"))
+    return {
+        "entries": SummaryCache.objects.count(),
+        "total_hits": totals["hits"] or 0,
+        "process": {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        },
+    }
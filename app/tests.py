@@ -1,3 +1,928 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import fetchers, http_cache, outbound, wikipedia
+from .browser_pool import BrowserPool, _ContextSlot, _PooledBrowser, run_scraper
+from .covers import cover_path, cover_url, store_cover
+from .fake_sites import FakeSites
+from .http_cache import cached_get, content_hash
+from .imports import _acquire_lock, _lock_held, _release_lock, _save_game
+from .jobs import enqueue_job, prune_finished_jobs
+from .models import Games, GamePlots, ImportLock, ScrapeJob, ScrapeJobWatcher, UserModel
+from .outbound import PRIORITY_ADMIN, PRIORITY_BULK, PRIORITY_INTERACTIVE, HostBucket, OutboundScheduler
+from .parsers import parse_game_page, parse_search_results
+from .refresh import Checkpoint, refresh_catalog, refresh_game
+from .search_cache import cache_stats, get_cached_results, set_cached_results
+from .summarization import SummarizationEngine, split_chunks
+from .summarizer_service import SummarizerService, SummaryJob
+from .utils import scrape_game_info, search_mobygames, summarize_plot_sections
+from .views import job_status_view, legacy_result_thumbnail
+from .wikipedia import WikipediaClient, WikipediaFixtureMissing
+
+
+MOBYGAMES_FIXTURES = os.path.join(settings.BASE_DIR, "app", "fixtures", "fake_sites", "mobygames")
+
+
+def _mobygames_page(*parts) -> str:
+    with open(os.path.join(MOBYGAMES_FIXTURES, *parts), encoding="utf-8") as f:
+        return f.read()
+
+
+# The parsers are plain functions of the html, so they're checked against the MobyGames pages saved for the fake sites
+# server. The links on these pages are relative and they're made absolute with MOBYGAMES_URL
+@override_settings(MOBYGAMES_URL="https://www.mobygames.com")
+class MobyGamesParserTests(SimpleTestCase):
+    def test_game_page(self):
+        game = parse_game_page(_mobygames_page("game", "101.html"))
+        self.assertEqual(game["title"], "The Witcher 3: Wild Hunt")
+        self.assertEqual(game["released"], "May 19, 2015 on Windows")
+        self.assertEqual(game["developers"], ["CD Projekt RED"])
+        self.assertEqual(game["genres"], ["Role-playing (RPG)"])
+        self.assertEqual(game["score"], "9.1")
+        self.assertEqual(game["cover_image_url"], "{{BASE_URL}}/images/cover-101.jpg")
+        self.assertEqual(game["compilation_games"], [])
+        self.assertIsNone(game["base_game_url"])
+        self.assertTrue(game["description"].startswith("An open world role-playing game"))
+
+    def test_edition_page_links_to_base_game(self):
+        game = parse_game_page(_mobygames_page("game", "102.html"))
+        self.assertEqual(game["title"], "The Witcher 3: Wild Hunt - Game of the Year Edition")
+        self.assertEqual(game["released"], "August 30, 2016 on Windows")
+        self.assertEqual(game["score"], "9.3")
+        self.assertEqual(game["compilation_games"], [])
+        self.assertEqual(game["base_game_url"], "https://www.mobygames.com/game/101/the-witcher-3-wild-hunt/")
+
+    def test_compilation_page(self):
+        game = parse_game_page(_mobygames_page("game", "105.html"))
+        self.assertEqual(game["title"], "The Witcher: Trilogy")
+        self.assertEqual(game["released"], "2015 on Windows")
+        self.assertEqual(game["developers"], ["CD Projekt RED"])
+        self.assertEqual(game["genres"], ["Compilation"])
+        self.assertIsNone(game["score"])
+        self.assertEqual(game["cover_image_url"], "{{BASE_URL}}/images/cover-105.jpg")
+        self.assertIsNone(game["base_game_url"])
+        self.assertEqual(game["compilation_games"], [
+            {"title": "The Witcher", "url": "https://www.mobygames.com/game/104/the-witcher/", "year": "2007"},
+            {"title": "The Witcher 2: Assassins of Kings",
+             "url": "https://www.mobygames.com/game/103/the-witcher-2-assassins-of-kings/", "year": "2011"},
+            {"title": "The Witcher 3: Wild Hunt", "url": "https://www.mobygames.com/game/101/the-witcher-3-wild-hunt/",
+             "year": "2015"},
+        ])
+
+    def test_search_results(self):
+        results = parse_search_results(_mobygames_page("search", "the-witcher.html"))
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0], {
+            "url": "https://www.mobygames.com/game/101/the-witcher-3-wild-hunt/",
+            "description": "The Witcher 3: Wild Hunt (2015)\nWindows, PlayStation 4, Xbox One",
+            "thumbnail": "{{BASE_URL}}/images/thumb-101.jpg",
+        })
+        self.assertEqual(results[2]["url"], "https://www.mobygames.com/game/105/the-witcher-trilogy/")
+
+        self.assertEqual(len(parse_search_results(_mobygames_page("search", "the-witcher.html"), limit=2)), 2)
+        self.assertEqual([r["url"] for r in parse_search_results(_mobygames_page("search", "tetris.html"))],
+                         ["https://www.mobygames.com/game/106/tetris/"])
+
+
+# The Wikipedia client replays the API responses saved in app/fixtures/wikipedia, so these tests never touch the network
+class WikipediaReplayTests(SimpleTestCase):
+    def setUp(self):
+        self.client = WikipediaClient(article_url="https://en.wikipedia.org/wiki/", fixture_mode="replay")
+
+    def test_resolve_titles_follows_normalization_and_redirects(self):
+        resolved = async_to_sync(self.client.resolve_titles)(["the Witcher 3: Wild Hunt", "Witcher 3",
+                                                              "Nonexistent Game"])
+        self.assertEqual(resolved, {
+            "the Witcher 3: Wild Hunt": "The Witcher 3: Wild Hunt",
+            "Witcher 3": "The Witcher 3: Wild Hunt",
+            "Nonexistent Game": None,
+        })
+
+    def test_get_plots(self):
+        plots = async_to_sync(self.client.get_plots)(["The Witcher 3: Wild Hunt", "Tetris", "Nonexistent Game"])
+
+        witcher = plots["The Witcher 3: Wild Hunt"]
+        self.assertEqual(witcher["url"], "https://en.wikipedia.org/wiki/The_Witcher_3:_Wild_Hunt")
+        self.assertEqual(list(witcher["plot"]), ["Setting", "Plot"])
+        self.assertEqual(list(witcher["plot"]["Plot"]), ["Main story", "Hearts of Stone"])
+        self.assertEqual(len(witcher["plot_hash"]), 64)
+        self.assertNotIn("error", witcher)
+
+        # The article exists, but it has no plot section
+        self.assertEqual(plots["Tetris"]["title"], "Tetris")
+        self.assertEqual(plots["Tetris"]["plot"], {})
+        self.assertIsNone(plots["Tetris"]["plot_hash"])
+        self.assertNotIn("error", plots["Tetris"])
+
+        self.assertEqual(plots["Nonexistent Game"], {"title": None, "url": None, "plot": {}, "plot_hash": None})
+
+    def test_unchanged_plot_is_skipped(self):
+        titles = ["The Witcher 3: Wild Hunt", "Tetris", "Nonexistent Game"]
+        first = async_to_sync(self.client.get_plots)(titles)["The Witcher 3: Wild Hunt"]
+        second = async_to_sync(self.client.get_plots)(
+            titles, skip_if_hash={"The Witcher 3: Wild Hunt": first["plot_hash"]}
+        )["The Witcher 3: Wild Hunt"]
+        self.assertTrue(second["unchanged"])
+        self.assertIsNone(second["plot"])
+        self.assertEqual(second["plot_hash"], first["plot_hash"])
+
+    def test_missing_fixture(self):
+        with self.assertRaises(WikipediaFixtureMissing):
+            async_to_sync(self.client.get_plots)(["Some Game Nobody Recorded"])
+
+    def test_extract_plot(self):
+        html = (
+            '<div class="mw-parser-output"><div class="hatnote">For the novel, see The Witcher.</div>'
+            '<div class="mw-heading mw-heading2"><h2 id="Plot">Plot</h2>'
+            '<span class="mw-editsection">[edit]</span></div>'
+            '<p>The hunter wakes up in the keep.<sup class="reference">[1]</sup></p>'
+            '<div class="mw-heading mw-heading3"><h3 id="Ending">Ending</h3></div>'
+            '<p>He follows the thieves to the capital.</p>'
+            '<div class="mw-heading mw-heading2"><h2 id="Reception">Reception</h2></div>'
+            '<p>It was well received.</p></div>'
+        )
+        plot = WikipediaClient.extract_plot(html)
+        self.assertNotIn("[1]", str(plot))
+        self.assertNotIn("[edit]", str(plot))
+        self.assertNotIn("well received", str(plot))
+        self.assertIn("He follows the thieves to the capital.", plot["Ending"])
+
+
+# The whole search and scrape, from the MobyGames pages to the Wikipedia plot, against the fake sites server. The plain
+# HTTP fetcher is used, so the browser isn't needed
+class FakeSitesEndToEndTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sites = FakeSites(latency=0)
+        cls.sites.start()
+        cls.tmp = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            **cls.sites.settings(), SCRAPER_FETCHERS=["http"], MEDIA_ROOT=cls.tmp,
+            SCRAPER_HTTP_CACHE_DIR=os.path.join(cls.tmp, "http"),
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.sites.stop()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    # The fetcher, the Wikipedia client and the scheduler read the settings when they are created, so they're created
+    # again with the ones pointing at the fake sites (and once more afterwards)
+    def setUp(self):
+        self.reset()
+        self.addCleanup(self.reset)
+
+    def reset(self):
+        fetchers._fetcher = None
+        wikipedia._client = None
+        outbound._scheduler = None
+
+    def test_search(self):
+        results = run_scraper(search_mobygames("The Witcher 3"))
+        self.assertEqual([r["url"] for r in results], [
+            f"{self.sites.base_url}/game/101/the-witcher-3-wild-hunt/",
+            f"{self.sites.base_url}/game/102/the-witcher-3-wild-hunt-game-of-the-year-edition/",
+            f"{self.sites.base_url}/game/105/the-witcher-trilogy/",
+        ])
+        self.assertTrue(results[0]["description"].startswith("The Witcher 3: Wild Hunt (2015)"))
+        self.assertTrue(all(r["image"] for r in results))
+
+        self.assertEqual(run_scraper(search_mobygames("no such game")), [])
+
+    def test_scrape_game(self):
+        data = run_scraper(scrape_game_info(f"{self.sites.base_url}/game/101/the-witcher-3-wild-hunt/",
+                                            media_root=self.tmp))
+        self.assertEqual(data["title"], "The Witcher 3: Wild Hunt")
+        self.assertEqual(data["studio"], "CD Projekt RED")
+        self.assertEqual(data["genre"], "Role-playing (RPG)")
+        self.assertFalse(data["is_compilation"])
+        self.assertIn("### Setting", data["full_plot"])
+        self.assertIn("#### Hearts of Stone", data["full_plot"])
+        self.assertEqual(data["wikipedia_url"], f"{self.sites.base_url}/wiki/The_Witcher_3:_Wild_Hunt")
+        self.assertTrue(data["cover_image"])
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, data["cover_image"])))
+
+    def test_scrape_compilation(self):
+        data = run_scraper(scrape_game_info(f"{self.sites.base_url}/game/105/the-witcher-trilogy/",
+                                            media_root=self.tmp))
+        self.assertTrue(data["is_compilation"])
+        self.assertEqual(len(data["included_games"]), 3)
+
+    def test_scrape_game_without_article(self):
+        data = run_scraper(scrape_game_info(f"{self.sites.base_url}/game/106/tetris/", media_root=self.tmp))
+        self.assertEqual(data["title"], "Tetris")
+        self.assertIn("Falling blocks", data["full_plot"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+                   SEARCH_CACHE_MAX_ENTRIES=10)
+class SearchCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_same_query_written_differently(self):
+        set_cached_results("The Witcher 3:", [{"url": "/game/101/"}])
+        self.assertEqual(get_cached_results("  the witcher 3 "), [{"url": "/game/101/"}])
+        self.assertIsNone(get_cached_results("the witcher 2"))
+        stats = cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_least_recently_used_are_evicted(self):
+        for i in range(10):
+            set_cached_results(f"game {i}", [{"url": f"/game/{i}/"}])
+        # The first game is used again, so the second one is now the least recently used
+        get_cached_results("game 0")
+        set_cached_results("game 10", [{"url": "/game/10/"}])
+
+        self.assertIsNotNone(get_cached_results("game 0"))
+        self.assertIsNone(get_cached_results("game 1"))
+        self.assertIsNotNone(get_cached_results("game 10"))
+        self.assertLessEqual(cache_stats()["entries"], 10)
+        self.assertEqual(cache_stats()["recent_queries"][0], "game 10")
+
+
+# Stands in for the summarization engine, it fails every batch with the text "bad" in it
+class _FailingEngine:
+    def __init__(self):
+        self.calls = []
+
+    def summarize(self, texts):
+        self.calls.append(list(texts))
+        if "bad" in texts:
+            raise ValueError("Can't summarize this text")
+        return [f"summary of {text}" for text in texts]
+
+    def stats(self):
+        return {}
+
+
+class SummarizerServiceTests(SimpleTestCase):
+    def test_bad_request_does_not_fail_the_others(self):
+        engine = _FailingEngine()
+        service = SummarizerService(("127.0.0.1", 0), b"test", engine=engine)
+        jobs = [SummaryJob(["one", "two"]), SummaryJob(["bad"]), SummaryJob(["three"])]
+        for job in jobs:
+            service.jobs.put(job)
+        threading.Thread(target=service._model_loop, daemon=True).start()
+        for job in jobs:
+            self.assertTrue(job.done.wait(5))
+
+        self.assertEqual(engine.calls[0], ["one", "two", "bad", "three"])
+        self.assertEqual(jobs[0].summaries, ["summary of one", "summary of two"])
+        self.assertEqual(jobs[1].error, "Can't summarize this text")
+        self.assertIsNone(jobs[1].summaries)
+        self.assertEqual(jobs[2].summaries, ["summary of three"])
+        self.assertEqual((service.served, service.failed), (2, 1))
+
+
+class LegacyThumbnailTests(SimpleTestCase):
+    def get(self, n):
+        request = RequestFactory().get(f"/media/results/result_{n}.png")
+        request.session = {"ai_last_results": [{"url": "/game/101/", "image": "/media/results/abc.jpg"},
+                                               {"url": "/game/102/"}]}
+        return legacy_result_thumbnail(request, n)
+
+    def test_redirects_to_the_thumbnail_of_the_last_search(self):
+        self.assertEqual(self.get(1)["Location"], "/media/results/abc.jpg")
+        self.assertEqual(self.get(2)["Location"], "/media/results/default_icon.png")
+        self.assertEqual(self.get(9)["Location"], "/media/results/default_icon.png")
+
+
+# One token for every word, so the sizes of the chunks are easy to count
+class _WordTokenizer:
+    model_max_length = 100000
+
+    def __call__(self, parts, add_special_tokens=False):
+        return {"input_ids": [[0] * len(part.split()) for part in parts]}
+
+
+def _sentence(name: str, words: int) -> str:
+    return " ".join([name] + ["word"] * (words - 1)) + "."
+
+
+class SplitChunksTests(SimpleTestCase):
+    def tokens(self, chunk: str) -> int:
+        return len(chunk.split())
+
+    def test_chunks_stay_within_the_budget(self):
+        text = " ".join(_sentence(f"s{i}", n) for i, n in enumerate([50, 10, 67, 30, 95, 5, 40, 60]))
+        for overlap in (0, 1, 2):
+            chunks = split_chunks(text, _WordTokenizer(), max_tokens=100, overlap=overlap)
+            self.assertTrue(all(self.tokens(c) <= 100 for c in chunks), (overlap, [self.tokens(c) for c in chunks]))
+
+    def test_carried_sentences_are_dropped_when_they_do_not_fit(self):
+        sentences = [_sentence("a", 40), _sentence("b", 20), _sentence("c", 85)]
+        chunks = split_chunks(" ".join(sentences), _WordTokenizer(), max_tokens=100, overlap=1)
+        # "b" would be repeated, but together with "c" it's 105 tokens
+        self.assertEqual(chunks, [" ".join(sentences[0:2]), sentences[2]])
+
+    def test_splits_at_sentence_boundaries(self):
+        sentences = [_sentence(f"s{i}", 30) for i in range(5)]
+        chunks = split_chunks(" ".join(sentences), _WordTokenizer(), max_tokens=70, overlap=0)
+        self.assertEqual(chunks, [" ".join(sentences[0:2]), " ".join(sentences[2:4]), sentences[4]])
+
+    def test_overlap_repeats_the_last_sentence(self):
+        sentences = [_sentence("a", 40), _sentence("b", 20), _sentence("c", 50)]
+        chunks = split_chunks(" ".join(sentences), _WordTokenizer(), max_tokens=100, overlap=1)
+        self.assertEqual(chunks, [" ".join(sentences[0:2]), " ".join(sentences[1:3])])
+
+    def test_sentence_longer_than_the_budget_is_divided_by_words(self):
+        chunks = split_chunks(_sentence("long", 250), _WordTokenizer(), max_tokens=100, overlap=0)
+        self.assertEqual([self.tokens(c) for c in chunks], [100, 100, 50])
+
+
+class ImportDeduplicationTests(TestCase):
+    url = "https://www.mobygames.com/game/101/the-witcher-3-wild-hunt/"
+
+    def test_only_one_process_gets_the_lock(self):
+        self.assertTrue(_acquire_lock(self.url, "first", 300))
+        self.assertFalse(_acquire_lock(self.url, "second", 300))
+        self.assertTrue(_lock_held(self.url))
+
+        # Only the process holding the lock can remove it
+        _release_lock(self.url, "second")
+        self.assertTrue(_lock_held(self.url))
+        _release_lock(self.url, "first")
+        self.assertFalse(_lock_held(self.url))
+
+    def test_expired_lock_is_taken_over(self):
+        self.assertTrue(_acquire_lock(self.url, "dead", -1))
+        self.assertFalse(_lock_held(self.url))
+        self.assertTrue(_acquire_lock(self.url, "alive", 300))
+        self.assertEqual(ImportLock.objects.get(url=self.url).token, "alive")
+
+    def test_game_is_saved_once(self):
+        data = {"title": "The Witcher 3: Wild Hunt", "release_date": "2015", "studio": "CD Projekt RED",
+                "score": 9.1, "mobygames_url": self.url, "full_plot": "## Plot", "summary": "## Summary"}
+        first = _save_game(dict(data))
+        second = _save_game(dict(data))
+        self.assertEqual(first.status, "created")
+        self.assertEqual((second.status, second.game_id), ("existing", first.game_id))
+        self.assertEqual(Games.objects.filter(mobygames_url=self.url).count(), 1)
+        self.assertEqual(GamePlots.objects.filter(game_id=first.game_id).count(), 1)
+
+    def test_mobygames_url_is_unique(self):
+        Games.objects.create(title="A", release_date="2015", studio="S", score=1, mobygames_url=self.url)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Games.objects.create(title="B", release_date="2015", studio="S", score=1, mobygames_url=self.url)
+
+
+# Stand-ins for the Playwright objects, so the pool can be tested without launching Chromium. "fail_on_context" makes
+# that context of the browser fail to open
+class _FakeContext:
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        return _FakePage()
+
+
+class _FakePage:
+    url = "about:blank"
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class _FakeBrowser:
+    def __init__(self, fail_on_context=None):
+        self.fail_on_context = fail_on_context
+        self.contexts_opened = 0
+        self.closed = False
+
+    async def new_context(self, **kwargs):
+        self.contexts_opened += 1
+        if self.contexts_opened == self.fail_on_context:
+            raise RuntimeError("Context could not be created")
+        return _FakeContext()
+
+    def is_connected(self):
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeChromium:
+    def __init__(self, fail_on_context=None):
+        self.fail_on_context = fail_on_context
+        self.launched = []
+
+    async def launch(self, **kwargs):
+        browser = _FakeBrowser(self.fail_on_context)
+        self.launched.append(browser)
+        return browser
+
+
+class BrowserPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.chromium = _FakeChromium()
+
+    def pool(self, **kwargs):
+        pool = BrowserPool(browsers=1, contexts_per_browser=2, **kwargs)
+        pool._playwright = SimpleNamespace(chromium=self.chromium)
+        pool._started = True
+        pool._free = asyncio.Queue()
+        entry = _PooledBrowser(0, pool.contexts_per_browser)
+        pool._entries.append(entry)
+        for j in range(pool.contexts_per_browser):
+            pool._free.put_nowait(_ContextSlot(entry, j))
+        return pool, entry
+
+    def test_partial_launch_is_torn_down(self):
+        self.chromium.fail_on_context = 2
+        pool, entry = self.pool()
+
+        with self.assertRaises(RuntimeError):
+            async_to_sync(pool._launch)(entry)
+        self.assertTrue(self.chromium.launched[0].closed)
+        self.assertIsNone(entry.browser)
+        self.assertEqual(entry.contexts, [])
+        self.assertEqual(pool._owners, {})
+
+    def test_browser_without_all_contexts_is_unhealthy(self):
+        pool, entry = self.pool()
+        async_to_sync(pool._launch)(entry)
+        self.assertTrue(entry.is_healthy())
+
+        entry.contexts.pop()
+        self.assertFalse(entry.is_healthy())
+
+    def test_draining_browser_refuses_new_leases(self):
+        pool, entry = self.pool(recycle_after=1)
+        order = []
+
+        async def second_lease():
+            async with pool.context() as context:
+                order.append(("second", context, entry.browser))
+
+        async def scenario():
+            async with pool.context() as first:
+                page = await pool.new_page(first)
+                await pool.close_page(page)
+                self.assertTrue(entry.draining)
+
+                # The other context of the browser is free, but the lease has to wait for the recycle
+                waiter = asyncio.ensure_future(second_lease())
+                await asyncio.sleep(0.05)
+                self.assertEqual(order, [])
+                order.append(("first", first, entry.browser))
+            await waiter
+
+        async_to_sync(scenario)()
+        self.assertEqual([name for name, _, _ in order], ["first", "second"])
+        self.assertEqual(len(self.chromium.launched), 2)
+        self.assertIs(order[1][2], self.chromium.launched[1])
+        self.assertFalse(entry.draining)
+        self.assertEqual(pool._free.qsize(), 2)
+
+
+# A fake server for the scheduler. It gives the prepared answers one after another (the last one over and over) and
+# remembers when every request came
+class _ScriptedTransport:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def __call__(self, request):
+        self.calls.append(time.monotonic())
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        status, headers = answer
+        return httpx.Response(status, headers=headers, text="ok")
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.MockTransport(self))
+
+
+@override_settings(SCRAPER_HOST_RATE_LIMITS={"example.test": {"rate": 50, "burst": 1}},
+                   SCRAPER_RETRY_ATTEMPTS=3, SCRAPER_RETRY_BASE_DELAY=0.01, SCRAPER_RETRY_MAX_DELAY=1.0)
+class OutboundSchedulerTests(SimpleTestCase):
+    url = "https://www.example.test/game/101/"
+
+    def request(self, transport, scheduler=None):
+        scheduler = scheduler or OutboundScheduler()
+
+        async def send():
+            async with transport.client() as client:
+                return await scheduler.get(client, self.url)
+        return async_to_sync(send)(), scheduler.bucket(self.url)
+
+    def test_waiting_requests_go_by_priority(self):
+        bucket = HostBucket("www.example.test", rate=50, burst=1)
+        order = []
+
+        async def wait(priority):
+            await bucket.acquire(priority)
+            order.append(priority)
+
+        async def scenario():
+            # The first request takes the only token, the others have to queue behind it
+            await bucket.acquire(PRIORITY_INTERACTIVE)
+            await asyncio.gather(wait(PRIORITY_BULK), wait(PRIORITY_ADMIN), wait(PRIORITY_INTERACTIVE))
+
+        async_to_sync(scenario)()
+        self.assertEqual(order, [PRIORITY_INTERACTIVE, PRIORITY_ADMIN, PRIORITY_BULK])
+        self.assertEqual(bucket.stats()["max_queue_depth"], 3)
+
+    def test_server_errors_are_retried(self):
+        transport = _ScriptedTransport((503, {}), (502, {}), (200, {}))
+        resp, bucket = self.request(transport)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(transport.calls), 3)
+        self.assertEqual((bucket.retries, bucket.throttled), (2, 0))
+
+    def test_network_errors_are_retried(self):
+        transport = _ScriptedTransport(httpx.ConnectError("Connection refused"), (200, {}))
+        resp, bucket = self.request(transport)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual((bucket.errors, bucket.retries), (1, 1))
+
+    def test_last_answer_is_returned_after_the_attempts(self):
+        transport = _ScriptedTransport((500, {}))
+        resp, bucket = self.request(transport)
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(len(transport.calls), 3)
+
+    def test_retry_after_pauses_the_whole_host(self):
+        transport = _ScriptedTransport((429, {"Retry-After": "0.3"}), (200, {}))
+        scheduler = OutboundScheduler()
+        waited = []
+
+        async def scenario():
+            async with transport.client() as client:
+                first = asyncio.ensure_future(scheduler.get(client, self.url))
+                await asyncio.sleep(0.05)
+                # Another request of the same host has to wait for the pause too, not only the retried one
+                started = time.monotonic()
+                await scheduler.acquire(self.url)
+                waited.append(time.monotonic() - started)
+                return await first
+
+        resp = async_to_sync(scenario)()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(scheduler.bucket(self.url).throttled, 1)
+        self.assertGreaterEqual(transport.calls[1] - transport.calls[0], 0.25)
+        self.assertGreaterEqual(waited[0], 0.2)
+
+
+# Stands in for the summarization pipeline. It counts the calls and "summarizes" a text into its first word and the
+# max_length of its tier, so the tests can tell which summary belongs to which text
+class _CountingModel:
+    tokenizer = _WordTokenizer()
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, batch, max_length, **kwargs):
+        self.calls.append(list(batch))
+        return [{"summary_text": f"{text.split()[0]}/{max_length}"} for text in batch]
+
+
+def _text(name: str, words: int) -> str:
+    return " ".join(_sentence(f"{name}{i}", 50) for i in range(words // 50))
+
+
+@override_settings(SUMMARIZER_CHUNK_TOKENS=250, SUMMARIZER_CHUNK_OVERLAP=0)
+class SummaryCacheTests(TestCase):
+    def test_cached_text_skips_the_model(self):
+        model = _CountingModel()
+        texts = [_text("m", 300), _text("l", 600)]
+        first = SummarizationEngine(model, model_id="fake", cache=True).summarize(texts)
+        calls = len(model.calls)
+
+        engine = SummarizationEngine(model, model_id="fake", cache=True)
+        self.assertEqual(engine.summarize(texts), first)
+        self.assertEqual(len(model.calls), calls)
+        self.assertEqual(engine.stats()["cache_hits"], 2)
+
+    def test_other_chunks_are_not_taken_from_the_cache(self):
+        model = _CountingModel()
+        texts = [_text("m", 300), _text("l", 600)]
+        SummarizationEngine(model, model_id="fake", cache=True).summarize(texts)
+
+        # Only the long text is split into chunks, so only its summary depends on their size
+        with self.settings(SUMMARIZER_CHUNK_TOKENS=300):
+            engine = SummarizationEngine(model, model_id="fake", cache=True)
+            summaries = engine.summarize(texts)
+        self.assertEqual((engine.cache_hits, engine.cache_misses), (1, 1))
+        self.assertEqual(summaries[1], "l0/180 l6/180")
+
+
+@override_settings(SUMMARIZER_CHUNK_TOKENS=250, SUMMARIZER_CHUNK_OVERLAP=0)
+class SummarizationEngineTests(SimpleTestCase):
+    def test_summaries_go_back_under_their_headings(self):
+        model = _CountingModel()
+        engine = SummarizationEngine(model, batch_size=2, model_id="fake", cache=False)
+        plot = {
+            "Setting": _text("s", 100),
+            "Story": {"Act 1": _text("l", 600), "Act 2": "Too short to be summarized.", "Act 3": _text("m", 300)},
+            "Ending": _text("e", 150),
+        }
+
+        self.assertEqual(summarize_plot_sections(plot, engine=engine).splitlines(), [
+            "### Setting", "s0/120", "",
+            "### Story",
+            "#### Act 1", "l0/180 l5/180 l10/180", "",
+            "#### Act 2", "Too short to be summarized.", "",
+            "#### Act 3", "m0/160", "",
+            "### Ending", "e0/120",
+        ])
+        # Every call of the model has texts of one tier only and at most batch_size of them
+        self.assertEqual(sorted(len(batch) for batch in model.calls), [1, 1, 2, 2])
+
+
+def _image(size, color=(200, 30, 30, 128), fmt="PNG") -> bytes:
+    buffer = BytesIO()
+    Image.new("RGBA", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(COVER_SIZES={"small": (96, 128), "medium": (400, 520), "large": (640, 900)}, COVER_FORMAT="webp")
+class CoverStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def test_cover_is_saved_in_every_size_and_format(self):
+        path = store_cover(_image((800, 1000)), self.media_root)
+        self.assertRegex(path, r"^covers/[0-9a-f]{2}/[0-9a-f]{64}/large\.jpg$")
+
+        folder = os.path.join(self.media_root, os.path.dirname(path))
+        for size, box in [("small", (96, 128)), ("medium", (400, 520)), ("large", (640, 900))]:
+            for ext, fmt in [("webp", "WEBP"), ("jpg", "JPEG")]:
+                with Image.open(os.path.join(folder, f"{size}.{ext}")) as img:
+                    self.assertEqual(img.format, fmt)
+                    self.assertEqual(img.mode, "RGB")
+                    self.assertLessEqual(img.width, box[0])
+                    self.assertLessEqual(img.height, box[1])
+        # The proportions are kept, the large box is limited by the width
+        with Image.open(os.path.join(folder, "large.jpg")) as img:
+            self.assertEqual(img.size, (640, 800))
+
+    def test_small_cover_is_not_enlarged(self):
+        path = store_cover(_image((50, 60)), self.media_root)
+        with Image.open(os.path.join(self.media_root, path)) as img:
+            self.assertEqual(img.size, (50, 60))
+
+    def test_same_image_is_stored_once(self):
+        data = _image((300, 400))
+        path = store_cover(data, self.media_root)
+        with mock.patch("app.covers.Image.open") as image_open:
+            self.assertEqual(store_cover(data, self.media_root), path)
+        image_open.assert_not_called()
+
+        other = store_cover(_image((300, 400), color=(0, 0, 255, 255)), self.media_root)
+        self.assertNotEqual(other, path)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, "covers", path.split("/")[1]))), 1)
+
+    def test_cover_path_picks_the_size_and_format(self):
+        stored = "covers/ab/" + "ab" * 32 + "/large.jpg"
+        self.assertEqual(cover_path(stored, "small"), "covers/ab/" + "ab" * 32 + "/small.webp")
+        self.assertEqual(cover_path(stored, "medium", "jpg"), "covers/ab/" + "ab" * 32 + "/medium.jpg")
+        self.assertEqual(cover_path(stored, "huge"), "covers/ab/" + "ab" * 32 + "/large.webp")
+        self.assertEqual(cover_url(stored, "small"), f"{settings.MEDIA_URL}covers/ab/{'ab' * 32}/small.webp")
+
+    def test_old_covers_are_used_for_every_size(self):
+        legacy = "game_icons/The Witcher_icon.jpg"
+        self.assertEqual(cover_path(legacy, "small"), legacy)
+        self.assertEqual(cover_path(legacy, "large", "webp"), legacy)
+        self.assertIsNone(cover_path(None))
+        self.assertIsNone(cover_url(""))
+
+
+# A page the tests can change. It answers 304 when the request has its current ETag, unless it doesn't send any ETag
+# at all (like a server which doesn't support the validators)
+class _ChangingPage:
+    def __init__(self, body: str, etag: bool = True):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        etag = f'"{content_hash(self.body)[:16]}"'
+        if self.etag and request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if self.etag:
+            headers["ETag"] = etag
+        return httpx.Response(200, headers=headers, text=self.body)
+
+
+@override_settings(SCRAPER_HTTP_CACHE_ENABLED=True, SCRAPER_HOST_RATE_LIMITS={})
+class HttpCacheTests(SimpleTestCase):
+    url = "https://www.example.test/game/101/"
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = self.settings(SCRAPER_HTTP_CACHE_DIR=cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        outbound._scheduler = None
+
+    def get(self, page):
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(page)) as client:
+                return await cached_get(client, self.url)
+        resp = async_to_sync(send)()
+        return resp.extensions.get("cache"), resp.text
+
+    def test_not_modified_page_is_taken_from_the_cache(self):
+        page = _ChangingPage("<h1>The Witcher</h1>")
+        self.assertEqual(self.get(page), ("new", "<h1>The Witcher</h1>"))
+        self.assertEqual(self.get(page), ("revalidated", "<h1>The Witcher</h1>"))
+        self.assertNotIn("If-None-Match", page.requests[0].headers)
+        self.assertEqual(page.requests[1].headers["If-None-Match"], f'"{content_hash(page.body)[:16]}"')
+
+    def test_same_page_without_validators_is_unchanged(self):
+        page = _ChangingPage("<h1>The Witcher</h1>", etag=False)
+        self.get(page)
+        self.assertEqual(self.get(page), ("unchanged", "<h1>The Witcher</h1>"))
+        self.assertNotIn("If-None-Match", page.requests[1].headers)
+
+    def test_changed_page_replaces_the_saved_one(self):
+        page = _ChangingPage("<h1>The Witcher</h1>")
+        self.get(page)
+        page.body = "<h1>The Witcher 2</h1>"
+        self.assertEqual(self.get(page), ("changed", "<h1>The Witcher 2</h1>"))
+        self.assertEqual(self.get(page), ("revalidated", "<h1>The Witcher 2</h1>"))
+
+    def test_files_are_not_touched_on_the_event_loop(self):
+        page = _ChangingPage("<h1>The Witcher</h1>")
+        loop_threads = set()
+        io_threads = []
+
+        def record(function):
+            def wrapper(*args):
+                io_threads.append(threading.get_ident())
+                return function(*args)
+            return wrapper
+
+        async def send():
+            loop_threads.add(threading.get_ident())
+            async with httpx.AsyncClient(transport=httpx.MockTransport(page)) as client:
+                return await cached_get(client, self.url)
+
+        with mock.patch("app.http_cache._load", record(http_cache._load)), \
+                mock.patch("app.http_cache._save", record(http_cache._save)):
+            async_to_sync(send)()
+        self.assertEqual(len(io_threads), 2)
+        self.assertFalse(loop_threads & set(io_threads))
+
+
+class RefreshTests(TestCase):
+    def setUp(self):
+        self.game = Games.objects.create(title="The Witcher", release_date="2007", studio="CD Projekt RED", score=8.5,
+                                         mobygames_url="https://www.mobygames.com/game/101/the-witcher/")
+        self.plot = GamePlots.objects.create(game_id=self.game, full_plot="## Old plot", summary="## Old summary",
+                                             plot_hash="a" * 64)
+
+    def refresh(self, data):
+        saved = []
+        original = GamePlots.asave
+
+        async def asave(plot, *args, **kwargs):
+            saved.append(kwargs.get("update_fields"))
+            return await original(plot, *args, **kwargs)
+
+        with mock.patch("app.refresh.scrape_game_info_admin", mock.AsyncMock(return_value=data)) as scrape, \
+                mock.patch.object(GamePlots, "asave", asave):
+            status = async_to_sync(refresh_game)(self.game)
+        self.plot.refresh_from_db()
+        return status, saved, scrape
+
+    def test_only_the_changed_fields_are_saved(self):
+        # The plot is different, but it's too short for a summary, so the old summary stays
+        status, saved, scrape = self.refresh({"full_plot": "## New plot", "plot_hash": "b" * 64,
+                                              "summary": "## No Summary Available"})
+        self.assertEqual(status, "updated")
+        self.assertEqual(saved, [["full_plot", "plot_hash", "refreshed_at"]])
+        self.assertEqual((self.plot.full_plot, self.plot.summary), ("## New plot", "## Old summary"))
+        self.assertEqual(scrape.call_args.kwargs["plot_hash"], "a" * 64)
+
+    def test_unchanged_plot_only_moves_refreshed_at(self):
+        status, saved, _ = self.refresh({"unchanged": True})
+        self.assertEqual(status, "unchanged")
+        self.assertEqual(saved, [])
+        self.assertEqual(self.plot.full_plot, "## Old plot")
+        self.assertIsNotNone(self.plot.refreshed_at)
+
+    def test_failed_scrape_saves_nothing(self):
+        status, saved, _ = self.refresh({"error": "Wikipedia is not available"})
+        self.assertEqual(status, "failed")
+        self.assertEqual(saved, [])
+        self.assertIsNone(self.plot.refreshed_at)
+
+    def test_stopped_refresh_continues_from_the_checkpoint(self):
+        games = [self.game] + [Games.objects.create(title=f"Game {i}", release_date="2007", studio="S", score=5,
+                                                    mobygames_url=f"https://www.mobygames.com/game/{i}/")
+                               for i in range(2)]
+        path = os.path.join(tempfile.mkdtemp(), "refresh.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        refreshed = []
+
+        async def slow_refresh(game, force=False):
+            refreshed.append(game.id)
+            await asyncio.sleep(0.1)
+            return "updated"
+
+        checkpoint = Checkpoint(path)
+        checkpoint.start([game.id for game in games])
+        with mock.patch("app.refresh.refresh_game", slow_refresh):
+            # The time runs out after the first game, the rest is left for the next run
+            async_to_sync(refresh_catalog)(checkpoint, concurrency=1, max_duration=0.05)
+            self.assertEqual(refreshed, [games[0].id])
+            self.assertFalse(checkpoint.finished)
+
+            resumed = Checkpoint(path)
+            self.assertTrue(resumed.load())
+            self.assertEqual(resumed.pending(), [games[1].id, games[2].id])
+            async_to_sync(refresh_catalog)(resumed, concurrency=1)
+
+        self.assertEqual(refreshed, [game.id for game in games])
+        self.assertTrue(resumed.finished)
+        self.assertEqual(resumed.counts(), {"updated": 3})
+
+
+# The Users table isn't managed by the migrations, so it's made for these tests only. It has to happen before the
+# transaction of the test case starts, SQLite can't change the schema inside of it
+class ScrapeJobTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(UserModel)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(UserModel)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = UserModel.objects.create(username="geralt", email="geralt@example.com")
+        cls.watcher = UserModel.objects.create(username="ciri", email="ciri@example.com")
+        cls.stranger = UserModel.objects.create(username="yennefer", email="yennefer@example.com")
+        cls.admin = UserModel.objects.create(username="vesemir", email="vesemir@example.com", is_admin=True)
+
+    def status(self, job, user):
+        request = RequestFactory().get(f"/api/jobs/{job.id}/")
+        request.user = user
+        return job_status_view.__wrapped__(request, job.id)
+
+    def test_job_is_shown_only_to_its_users(self):
+        url = "https://www.mobygames.com/game/101/the-witcher/"
+        job = enqueue_job(ScrapeJob.KIND_DETAILS, url, self.owner)
+        # The same game clicked by another user gives the same job
+        self.assertEqual(enqueue_job(ScrapeJob.KIND_DETAILS, url, self.watcher).id, job.id)
+        self.assertEqual(enqueue_job(ScrapeJob.KIND_DETAILS, url, self.owner).id, job.id)
+        self.assertEqual(list(job.watchers.values_list("user_id", flat=True)), [self.watcher.id])
+
+        for user in (self.owner, self.watcher, self.admin):
+            self.assertEqual(self.status(job, user).status_code, 200, user.username)
+        self.assertEqual(self.status(job, self.stranger).status_code, 404)
+
+    def test_old_finished_jobs_are_removed(self):
+        now = timezone.now()
+        old = now - timedelta(days=8)
+        jobs = {
+            "old done": ScrapeJob.objects.create(url="a", status=ScrapeJob.STATUS_DONE, finished_at=old),
+            "old failed": ScrapeJob.objects.create(url="b", status=ScrapeJob.STATUS_FAILED, finished_at=old),
+            "new done": ScrapeJob.objects.create(url="c", status=ScrapeJob.STATUS_DONE, finished_at=now),
+            "old queued": ScrapeJob.objects.create(url="d", status=ScrapeJob.STATUS_QUEUED),
+        }
+        ScrapeJob.objects.filter(id=jobs["old queued"].id).update(created_at=old)
+        ScrapeJobWatcher.objects.create(job_id=jobs["old done"], user_id=self.watcher)
+
+        with self.settings(SCRAPE_JOB_KEEP_FOR=7 * 24 * 60 * 60):
+            self.assertEqual(prune_finished_jobs(), 2)
+        self.assertEqual(sorted(ScrapeJob.objects.values_list("url", flat=True)), ["c", "d"])
+        self.assertFalse(ScrapeJobWatcher.objects.exists())
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+
+
+# Measures how long every step of a scraper takes (downloading the page, Wikipedia, the cover etc.). Instead of one
+# "Finished in X s" it's possible to see which step was actually the slow one. The results are printed at the end and
+# can also be returned to whoever called the scraper
+class StepTimer:
+    def __init__(self, name: str):
+        self.name = name
+        self.steps = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def step(self, step_name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(step_name, time.perf_counter() - start)
+
+    # Adds the time of a step measured somewhere else (e.g. inside the fetcher). A step that happens more than once is
+    # summed up
+    def add(self, step_name: str, seconds: float):
+        self.steps[step_name] = self.steps.get(step_name, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        return {**{k: round(v, 3) for k, v in self.steps.items()}, "total": round(self.total, 3)}
+
+    def report(self):
+        steps = ", ".join(f"{k} {v:.2f}s" for k, v in self.steps.items())
+        print(f"[TIMING] {self.name}: {steps} (total {self.total:.2f}s)")
@@ -26,7 +26,9 @@ urlpatterns = [
     path("app/api/game/<int:pk>/", views.api_game_detail),
     path('games/<int:pk>/rating/', views.game_rating_view, name="game_rating"),
     path('compilation/', views.compilation_view, name='compilation'),
+    path('compilation/import-all/', views.compilation_import_view, name='compilation_import'),
     path("games/<int:pk>/generate-summary/", views.generate_summary_view, name="generate_summary"),
+    path("jobs/<int:job_id>/", views.job_status_view, name="job_status"),
 
     # --- Admin panel ---
     path("admin-panel/", views.admin_panel, name="admin_panel"),
@@ -38,6 +40,10 @@ urlpatterns = [
     path("admin-panel/delete-game/<int:game_id>/", views.admin_delete_game, name="admin_delete_game"),
     path("admin-panel/edit-game-score/<int:game_id>/", views.admin_edit_game_score, name="admin_edit_game_score"),
     path("admin-panel/reload-game/<int:game_id>/", views.admin_reload_game, name="admin_reload_game"),
+    path("admin-panel/search-cache/", views.admin_search_cache_view, name="admin_search_cache"),
+    path("admin-panel/outbound/", views.admin_outbound_view, name="admin_outbound"),
+    path("admin-panel/http-cache/", views.admin_http_cache_view, name="admin_http_cache"),
+    path("admin-panel/summary-cache/", views.admin_summary_cache_view, name="admin_summary_cache"),
 
     # --- Chatbot and history ---
     path("chatbot/", views.chatbot_page, name="chatbot_page"),
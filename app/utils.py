@@ -1,23 +1,28 @@
+import asyncio
+import hashlib
 import os
 import re
 import urllib.parse
 from functools import wraps
-from io import BytesIO
-from shutil import copyfile
 
-import requests
 import time
-from PIL import Image
+from asgiref.sync import sync_to_async
 from bs4 import BeautifulSoup
+from django.conf import settings
 from django.http import JsonResponse, Http404
 from django.shortcuts import redirect
 from django.utils import timezone
-from playwright.async_api import async_playwright
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from transformers import pipeline
 
+from .covers import download_cover
+from .fetchers import ReadyWhen, get_fetcher, get_http_client
 from .models import UserModel, Games, UserHistory
+from .outbound import get_scheduler
+from .parsers import mobygames_url, parse_game_page, parse_search_results
+from .summarization import get_summarization_engine, word_count
+from .timing import StepTimer
+from .wikipedia import get_wikipedia_client
 
 
 # As the name suggests, this function records user history. But what does it mean exactly? Each user has his own user
@@ -66,103 +71,130 @@ def _wants_json(request):
 
 # This is the function responsible for the main mechanism of authorization. It works as a decorator, so basically
 # something that I put before the functions in views.py to make those pages require an authorization handled by this
-# function.
+# function. It works for both the regular views and the async ones (the scraper views). For the async views the check
+# itself, which reads the database, is run in a thread through sync_to_async
 def jwt_required(view_func):
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_wrapped_view(request, *args, **kwargs):
+            wants_json = _wants_json(request)
+            try:
+                denied = await sync_to_async(_jwt_authenticate)(request, wants_json)
+                if denied is not None:
+                    return denied
+                return await view_func(request, *args, **kwargs)
+            except Http404:
+                raise
+            except Exception as e:
+                return _jwt_error_response(e, wants_json)
+
+        return _async_wrapped_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
-
-        # This if statement is meant for the app's scalability as it ignores jwt_required decorator for the superusers
-        # also known as Django session admins. This app currently does not use it but it might in the future.
-        if getattr(request.user, "is_authenticated", False) and getattr(request.user, "is_superuser", False):
-            print("[JWT] SKIPPING JWT CHECK FOR ADMIN (session auth)")
+        wants_json = _wants_json(request)
+        try:
+            denied = _jwt_authenticate(request, wants_json)
+            if denied is not None:
+                return denied
             return view_func(request, *args, **kwargs)
+        except Http404:
+            # nie zmieniamy 404 na 500!!!
+            raise
+        except Exception as e:
+            return _jwt_error_response(e, wants_json)
 
-        wants_json = _wants_json(request)
-        jwt_auth = JWTAuthentication()
+    return _wrapped_view
 
-        token = None
 
-        # Checking the header Authorization Bearer (basically the access token given to each user after logging in)
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            candidate = auth_header.split(" ", 1)[1].strip()
-            if candidate and candidate.lower() not in ("null", "undefined"):
-                token = candidate
+# The check itself. It returns the response (an error or a redirect to the error page) when the user can't see the page
+# and None when the user is authenticated, in which case the user is put into request.user
+def _jwt_authenticate(request, wants_json):
 
-        # If there is no token found in the previous if statement then the app checks cookies
-        if not token:
-            token = request.COOKIES.get("access_token")
+    # This if statement is meant for the app's scalability as it ignores jwt_required decorator for the superusers
+    # also known as Django session admins. This app currently does not use it but it might in the future.
+    if getattr(request.user, "is_authenticated", False) and getattr(request.user, "is_superuser", False):
+        print("[JWT] SKIPPING JWT CHECK FOR ADMIN (session auth)")
+        return None
 
-        # No token means that the user is not logged in
-        if not token:
-            print("[JWT] There is no JSON Web Token (JWT)")
+    jwt_auth = JWTAuthentication()
 
-            if wants_json:
-                return JsonResponse({"error": "There is no JWT"}, status=401)
-            else:
-                # Redirects to the already prepared error 401 page
-                return redirect("/error/401")
+    token = None
 
-        # JWTAuthentication requires Authorization Bearer token
-        request.META["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    # Checking the header Authorization Bearer (basically the access token given to each user after logging in)
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        candidate = auth_header.split(" ", 1)[1].strip()
+        if candidate and candidate.lower() not in ("null", "undefined"):
+            token = candidate
 
-        try:
-            # The attempt to authorize the token
-            user_auth_tuple = jwt_auth.authenticate(request)
-
-            # If the authenticate function returns None then the token is deemed as wrong or expired
-            if not user_auth_tuple:
-                print("[JWT] The token is wrong or expired (authenticate has returned None).")
-                if wants_json:
-                    return JsonResponse(
-                        {"error": "Token JWT is wrong or it expired."},
-                        status=403,
-                    )
-                else:
-                    return redirect("/error/403")
+    # If there is no token found in the previous if statement then the app checks cookies
+    if not token:
+        token = request.COOKIES.get("access_token")
 
-            jwt_user, validated_token = user_auth_tuple
+    # No token means that the user is not logged in
+    if not token:
+        print("[JWT] There is no JSON Web Token (JWT)")
 
-            # Checking if the user exists in the database
-            mapped_user = (
-                UserModel.objects.filter(pk=jwt_user.pk).first()
-                or UserModel.objects.filter(username=jwt_user.username).first()
-                or UserModel.objects.filter(email=jwt_user.email).first()
+        if wants_json:
+            return JsonResponse({"error": "There is no JWT"}, status=401)
+        else:
+            # Redirects to the already prepared error 401 page
+            return redirect("/error/401")
+
+    # JWTAuthentication requires Authorization Bearer token
+    request.META["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+
+    # The attempt to authorize the token
+    user_auth_tuple = jwt_auth.authenticate(request)
+
+    # If the authenticate function returns None then the token is deemed as wrong or expired
+    if not user_auth_tuple:
+        print("[JWT] The token is wrong or expired (authenticate has returned None).")
+        if wants_json:
+            return JsonResponse(
+                {"error": "Token JWT is wrong or it expired."},
+                status=403,
             )
+        else:
+            return redirect("/error/403")
 
-            if not mapped_user:
-                print("[JWT] The user from the token does not exist in the database.")
-                if wants_json:
-                    return JsonResponse({"error": "The user does not exist"}, status=403)
-                else:
-                    return redirect("/error/403")
+    jwt_user, validated_token = user_auth_tuple
 
-            # The user is authenticated
-            request.user = mapped_user
-            print(f"[JWT] Authenticated user: {mapped_user.username}")
+    # Checking if the user exists in the database
+    mapped_user = (
+        UserModel.objects.filter(pk=jwt_user.pk).first()
+        or UserModel.objects.filter(username=jwt_user.username).first()
+        or UserModel.objects.filter(email=jwt_user.email).first()
+    )
 
-            return view_func(request, *args, **kwargs)
+    if not mapped_user:
+        print("[JWT] The user from the token does not exist in the database.")
+        if wants_json:
+            return JsonResponse({"error": "The user does not exist"}, status=403)
+        else:
+            return redirect("/error/403")
 
-        # The authentication failed due to SimpleJWT
-        except Http404:
-            # nie zmieniamy 404 na 500!!!
-            raise
+    # The user is authenticated
+    request.user = mapped_user
+    print(f"[JWT] Authenticated user: {mapped_user.username}")
+    return None
 
-        except AuthenticationFailed as e:
-            print(f"[JWT] AuthenticationFailed: {e}")
-            if wants_json:
-                return JsonResponse({"error": "Token JWT is wrong or it expired."}, status=403)
-            else:
-                return redirect("/error/403")
 
-        except Exception as e:
-            print(f"[JWT] Authentication failed (internal error): {e!r}")
-            if wants_json:
-                return JsonResponse({"error": "Error in JWT authentication."}, status=500)
-            else:
-                return redirect("/error/500")
+# The authentication failed due to SimpleJWT or something else went wrong
+def _jwt_error_response(e, wants_json):
+    if isinstance(e, AuthenticationFailed):
+        print(f"[JWT] AuthenticationFailed: {e}")
+        if wants_json:
+            return JsonResponse({"error": "Token JWT is wrong or it expired."}, status=403)
+        else:
+            return redirect("/error/403")
 
-    return _wrapped_view
+    print(f"[JWT] Authentication failed (internal error): {e!r}")
+    if wants_json:
+        return JsonResponse({"error": "Error in JWT authentication."}, status=500)
+    else:
+        return redirect("/error/500")
 
 
 # Requesting user without throwing errors like jwt_required. Used for simpler functions like saving the game to history
@@ -214,24 +246,6 @@ class CookieJWTAuthentication(JWTAuthentication):
 
 
 
-# Model for summarization is used a couple of times in this file therefore it's declared at the beginning. It's also in
-# case of future need to change the summarization model
-summarizer = None
-def get_summarizer():
-    global summarizer
-    if summarizer is None:
-        summarizer = pipeline("summarization", model="sshleifer/distilbart-cnn-12-6")
-    return summarizer
-
-
-# Further into the code there is a moment where a cover image of the game scraped is being downloaded and this function
-# is so that it can have a proper name when downloaded
-def image_name(title: str) -> str:
-    s = title.lower()
-    s = re.sub(r'[^a-z0-9]+', '_', s)
-    s = re.sub(r'_+', '_', s).strip('_')
-    return s
-
 # Function for extracting game plot from Wikipedia
 def extract_plot_structure(soup: BeautifulSoup) -> dict:
     # Scans the page in search for something resembling plot header by searching this words:
@@ -344,10 +358,7 @@ def build_markdown_with_headings(plot_tree: dict) -> str:
 # it does so for every section (which are divided by mw-heading3 and mw-heading4) it scraped. Also, this function is
 # using total_threshold as an argument, which is set to 200. What it means is that when the total number of words in the
 # plot section on wikipedia doesn't exceed 200 words then the summary is not needed and therefore is neglected
-def summarize_plot_sections(plot_tree: dict, total_threshold: int = 200) -> str | None:
-    def word_count(t: str) -> int:
-        return len((t or "").split())
-
+def summarize_plot_sections(plot_tree: dict, total_threshold: int = 200, engine=None) -> str | None:
     # Counts as the number of words in the scraped plot of the game
     total_words = 0
     for v in plot_tree.values():
@@ -360,10 +371,12 @@ def summarize_plot_sections(plot_tree: dict, total_threshold: int = 200) -> str
     if total_words <= total_threshold:
         return None
 
-    # Summarizer is declared as the one from the first function of the code
-    summarizer = get_summarizer()
-    # This variable serves for adding # so that markdown recognizes headings used
+    # This variable serves for adding # so that markdown recognizes headings used. The places where the summaries go
+    # are left empty and all the texts are summarized at once at the end (see summarization.py), so the model gets
+    # every section of the plot together instead of one after another
     out_lines = []
+    texts = []
+    slots = []
 
     # Makes a summary for every mw-heading3
     for h3, content in plot_tree.items():
@@ -375,70 +388,36 @@ def summarize_plot_sections(plot_tree: dict, total_threshold: int = 200) -> str
                 if not text.strip():
                     continue
                 out_lines.append(f"#### {h4}")
-                wc = word_count(text)
-
-                # There are separate cases for different world counts so that the summary doesn't have a fixed maximum
-                # size for both 200-word and 500-word plots
-                if wc < 80:
-                    summary = text.strip()
-                elif wc < 200:
-                    res = summarizer(text, max_length=120, min_length=50, do_sample=False)
-                    summary = res[0]["summary_text"]
-                elif wc < 500:
-                    res = summarizer(text, max_length=160, min_length=80, do_sample=False)
-                    summary = res[0]["summary_text"]
-                # The model that I'm using has a maximum of 3500 tokens (which comes out to roughly 600 to 700 words).
-                # If that limit is exceeded then the summarizer refuses to comply and breaks. To prevent that, in case
-                # of such long plots the text is divided into chunks with the maximum length of those 3500 tokens and
-                # all those chunks are summarized separately. It's not a perfect solution, but it's also made for a rare
-                # case. Either way when all the chunks are summarized they are then being reconnected with each other
-                else:
-                    chunks = [text[i:i+3500] for i in range(0, len(text), 3500)]
-                    partials = []
-                    for ch in chunks:
-                        res = summarizer(ch, max_length=180, min_length=80, do_sample=False)
-                        partials.append(res[0]["summary_text"])
-                    summary = " ".join(partials)
-                out_lines.append(summary)
+                slots.append(len(out_lines))
+                out_lines.append(None)
+                texts.append(text)
                 out_lines.append("")
 
         # In case where the value of the key it's using is NOT a dictionary with another mw-heading4's text but a plain
         # text
         else:
-            text = content.strip()
-            wc = word_count(text)
-            if wc < 80:
-                summary = text
-            elif wc < 200:
-                res = summarizer(text, max_length=120, min_length=50, do_sample=False)
-                summary = res[0]["summary_text"]
-            elif wc < 500:
-                res = summarizer(text, max_length=160, min_length=80, do_sample=False)
-                summary = res[0]["summary_text"]
-            else:
-                chunks = [text[i:i+3500] for i in range(0, len(text), 3500)]
-                partials = []
-                for ch in chunks:
-                    res = summarizer(ch, max_length=180, min_length=80, do_sample=False)
-                    partials.append(res[0]["summary_text"])
-                summary = " ".join(partials)
-            out_lines.append(summary)
+            slots.append(len(out_lines))
+            out_lines.append(None)
+            texts.append(content)
             out_lines.append("")
 
+    # There are separate tiers for different word counts so that the summary doesn't have a fixed maximum size for both
+    # 200-word and 500-word plots, and the longest sections are divided into chunks which are summarized separately and
+    # then reconnected with each other
+    summaries = (engine or get_summarization_engine()).summarize(texts)
+    for slot, summary in zip(slots, summaries):
+        out_lines[slot] = summary
+
     return "\n".join(out_lines).strip()
 
 
 
 # Summarizes when full plot has markdown
-def summarize_plot_from_markdown(full_plot_md: str, total_threshold: int = 200) -> str | None:
-    def word_count(t: str) -> int:
-        return len((t or "").split())
-
+def summarize_plot_from_markdown(full_plot_md: str, total_threshold: int = 200, engine=None) -> str | None:
     if not full_plot_md or "No Plot Found" in full_plot_md:
         return None
 
     start_time = time.time()
-    summarizer = get_summarizer()
     lines = full_plot_md.splitlines()
 
     sections = {}
@@ -497,6 +476,8 @@ def summarize_plot_from_markdown(full_plot_md: str, total_threshold: int = 200)
         return None
 
     out_lines = []
+    texts = []
+    slots = []
     print(f"[SUMMARY] Summarizing the ({len(sections)} section, {total_words} total words).")
 
     for h3, content in sections.items():
@@ -509,177 +490,181 @@ def summarize_plot_from_markdown(full_plot_md: str, total_threshold: int = 200)
                 out_lines.append(f"#### {h4}" if h4 != "__main__" else "")
                 wc = word_count(text)
                 print(f"[SUMMARY] Section: {h3} -> {h4} ({wc} words)" if h4 != "__main__" else f"[SUMMARY] Section: {h3} ({wc} words)")
-
-                if wc < 80:
-                    summary = text.strip()
-                elif wc < 200:
-                    res = summarizer(text, max_length=120, min_length=50, do_sample=False)
-                    summary = res[0]["summary_text"]
-                elif wc < 500:
-                    res = summarizer(text, max_length=160, min_length=80, do_sample=False)
-                    summary = res[0]["summary_text"]
-                else:
-                    chunks = [text[i:i + 3500] for i in range(0, len(text), 3500)]
-                    partials = []
-                    for i, ch in enumerate(chunks, 1):
-                        print(f"[SUMMARY]  -> part {i}/{len(chunks)} ({len(ch)} characters)")
-                        res = summarizer(ch, max_length=180, min_length=80, do_sample=False)
-                        partials.append(res[0]["summary_text"])
-                    summary = " ".join(partials)
-
-                out_lines.append(summary.strip())
+                slots.append(len(out_lines))
+                out_lines.append(None)
+                texts.append(text)
                 out_lines.append("")
 
         else:
-            text = content.strip()
-            wc = word_count(text)
-            if wc < 80:
-                summary = text
-            elif wc < 200:
-                res = summarizer(text, max_length=120, min_length=50, do_sample=False)
-                summary = res[0]["summary_text"]
-            elif wc < 500:
-                res = summarizer(text, max_length=160, min_length=80, do_sample=False)
-                summary = res[0]["summary_text"]
-            else:
-                chunks = [text[i:i + 3500] for i in range(0, len(text), 3500)]
-                partials = []
-                for i, ch in enumerate(chunks, 1):
-                    print(f"[SUMMARY]  -> part {i}/{len(chunks)} ({len(ch)} characters)")
-                    res = summarizer(ch, max_length=180, min_length=80, do_sample=False)
-                    partials.append(res[0]["summary_text"])
-                summary = " ".join(partials)
-            out_lines.append(summary.strip())
+            slots.append(len(out_lines))
+            out_lines.append(None)
+            texts.append(content)
             out_lines.append("")
 
+    # All the sections are summarized together, in batches (see summarization.py), and put back under their headings
+    summaries = (engine or get_summarization_engine()).summarize(texts)
+    for slot, summary in zip(slots, summaries):
+        out_lines[slot] = summary
+
     elapsed = time.time() - start_time
     print(f"[SUMMARY] Summary generation finished in {elapsed:.1f}s.")
     return "\n".join(out_lines).strip()
 
 
-# When the user searches a game on the website, the scraper is activated, and it scrapes whatever MobyGames shows as a
-# result of searching the same game. This is the fist instance of using PlayWright in this code. Async function needed
-# for Playwright's asynchronous nature of "await" which, as the name implies, waits for the attributes to be scrapped
-async def search_mobygames(game_name: str):
-    # Search link on MobyGames is encoded in a way that turns non-alphabetic symbols as something else like a simple
-    # space is replaced with "%20" and ":" sign is replaced with "%3A"
-    encoded_name = urllib.parse.quote(game_name)
-    search_url = f"https://www.mobygames.com/search/?q={encoded_name}"
+# Summary of the MobyGames description used when the game has no plot on Wikipedia. Descriptions shorter than 200 words
+# are returned as they are
+def summarize_moby_description(moby_description: str, engine=None) -> str:
+    if word_count(moby_description) <= 200:
+        return moby_description
+    return (engine or get_summarization_engine()).summarize([moby_description])[0]
 
-    try:
-        media_root = "media/results"
-        os.makedirs(media_root, exist_ok=True)
-        for old in os.listdir(media_root):
-            if old.startswith("result_") and old.endswith(".png"):
-                os.remove(os.path.join(media_root, old))
-        print("[CLEANUP] The directory 'media/results' has been cleaned before the new search.")
-    except Exception as e:
-        print(f"[CLEANUP] Error during cleanup: {e}")
 
-    async with async_playwright() as p:
-        # Playwright opens chromium browser to scrap info but # doesn't show browser window (because of headless=True)
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+# The search page is ready either when it has the table with results or when it says that there aren't any
+SEARCH_PAGE_READY = ReadyWhen("table.table.mb tbody tr", text="No results found for that query")
+
+# The game page is ready when it has the game's title
+GAME_PAGE_READY = ReadyWhen("h1.mb-0")
 
-        # User agent needed, so it doesn't consider Playwright as a bot.
-        await page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                          "AppleWebKit/537.36 (KHTML, like Gecko) "
-                          "Chrome/140.0.0.0 Safari/537.36"
-        })
 
-        # Go to the website
-        await page.goto(search_url, timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        await page.wait_for_timeout(1500)
+# The thumbnails of the search results used to be saved as result_1.png ... result_5.png, which meant that every search
+# had to wipe the folder first and two users searching at the same time overwrote each other's images. Now every
+# thumbnail is saved under a hash of its url, so the same image always ends up in the same file, different searches
+# never collide and a repeated search reuses the images which are already there
+def thumbnail_name(src: str) -> str:
+    ext = os.path.splitext(urllib.parse.urlparse(src).path)[1].lower()
+    if ext not in (".png", ".jpg", ".jpeg", ".webp", ".gif"):
+        ext = ".png"
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()[:20] + ext
 
-        # Case where there are no results
+
+# Saves the thumbnail of one search result into the results folder and returns its url. It's downloaded with the shared
+# HTTP client, so it doesn't block the event loop the way requests.get did, and the semaphore keeps the number of
+# downloads at the same time in check. The file is first written under a temporary name and then renamed, so nobody
+# ever sees a half-written image. Whenever something goes wrong the default icon is used instead
+async def download_thumbnail(src: str, results_dir: str, semaphore: asyncio.Semaphore) -> str:
+    results_url = f"{settings.MEDIA_URL}results/"
+    if src and src.startswith("http"):
+        filename = thumbnail_name(src)
+        out_path = os.path.join(results_dir, filename)
         try:
-            html = await page.content()
-            if "No results found for that query" in html:
-                print("[INFO] No results found on MobyGames for this query.")
-                await browser.close()
-                return []
+            if os.path.exists(out_path):
+                # Marks the image as recently used, so the cleanup doesn't remove it
+                os.utime(out_path)
+                return results_url + filename
+
+            async with semaphore:
+                resp = await get_scheduler().get(get_http_client(), src)
+            if resp.status_code == 200:
+                tmp_path = f"{out_path}.{os.getpid()}.{id(resp)}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(resp.content)
+                os.replace(tmp_path, out_path)
+                return results_url + filename
         except Exception as e:
-            print(f"[!] Error while checking for 'No results found': {e}")
-
-        # When searching a game on MobyGames there is a field of text at the top of the page which informs you that this
-        # page either excludes or includes games marked as Adult.
-        adult_toggle = page.locator("p:has-text('This search excludes games marked as Adult')")
-        if await adult_toggle.count() > 0:
-            click_here = adult_toggle.locator("a:has-text('Click here')")
-            if await click_here.count() > 0:
-                await click_here.first.click()
-                await page.wait_for_load_state("networkidle")
-
-        # Wait for everything to load
-        await page.wait_for_selector("table.table.mb tbody tr", timeout=20000)
-        rows = await page.query_selector_all("table.table.mb tbody tr")
-
-        media_root = "media/results"
-        results = []
-        index = 0
-
-        for row in rows[:10]:
-            td = await row.query_selector("td:nth-child(2)")
-            if not td:
-                continue
-            text = (await td.inner_text()).strip()
-            if not (text.startswith("GAME:") or text.startswith("ADULT GAME:")):
-                continue
+            print(f"Error during download of the thumbnail {src}: {e}")
 
-            clean_text = re.sub(r'^(ADULT\s+)?GAME:\s*', '', text, flags=re.IGNORECASE).strip()
-            lines = [ln.strip() for ln in clean_text.splitlines() if ln.strip()]
-            filtered = [ln for ln in lines if "mature content" not in ln.lower() and ln != "View Content"]
-            clean_text = "\n".join(filtered)
+    return results_url + "default_icon.png"
 
-            link_el = await td.query_selector("b a") or await td.query_selector("a")
-            href = await link_el.get_attribute("href") if link_el else None
-            full_url = f"https://www.mobygames.com{href}" if href and not href.startswith("http") else href
 
-            try:
-                img_td = await row.query_selector("td:nth-child(1) img")
-                index += 1
-                if img_td:
-                    src = await img_td.get_attribute("src")
-                    if src and src.startswith("http"):
-                        resp = requests.get(src, timeout=10)
-                        if resp.status_code == 200:
-                            out_path = os.path.join(media_root, f"result_{index}.png")
-                            with open(out_path, "wb") as f:
-                                f.write(resp.content)
-                        else:
-                            default_icon = os.path.join(media_root, "default_icon.png")
-                            out_path = os.path.join(media_root, f"result_{index}.png")
-                            if os.path.exists(default_icon):
-                                copyfile(default_icon, out_path)
-                    else:
-                        default_icon = os.path.join(media_root, "default_icon.png")
-                        out_path = os.path.join(media_root, f"result_{index}.png")
-                        if os.path.exists(default_icon):
-                            copyfile(default_icon, out_path)
-                else:
-                    default_icon = os.path.join(media_root, "default_icon.png")
-                    out_path = os.path.join(media_root, f"result_{index}.png")
-                    if os.path.exists(default_icon):
-                        copyfile(default_icon, out_path)
-            except Exception as e:
-                print(f"Error during download of the result_{index}: {e}")
+# Removes the thumbnails which haven't been used by any search for SEARCH_THUMBNAIL_TTL seconds (and the old
+# result_N.png files). The default icon is never removed
+def cleanup_thumbnails(results_dir: str, ttl: int):
+    removed = 0
+    cutoff = time.time() - ttl
+    try:
+        for name in os.listdir(results_dir):
+            path = os.path.join(results_dir, name)
+            if name == "default_icon.png" or not os.path.isfile(path):
+                continue
+            if os.path.getmtime(path) < cutoff or name.startswith("result_"):
+                os.remove(path)
+                removed += 1
+    except Exception as e:
+        print(f"[CLEANUP] Error during cleanup: {e}")
+    if removed:
+        print(f"[CLEANUP] Removed {removed} expired thumbnails from '{results_dir}'.")
+
 
-            results.append({"url": full_url, "description": clean_text})
+_last_thumbnail_cleanup = 0.0
 
-            if len(results) >= 5:
-                break
 
-        if len(results) == 0:
-            print("[INFO] No valid game results found in search results.")
-            await browser.close()
-            return []
-        elif len(results) < 5:
-            print(f"[INFO] Only {len(results)} valid game results found (less than expected).")
+# Starts the cleanup in a background thread, at most once every SEARCH_THUMBNAIL_CLEANUP_INTERVAL seconds, so the
+# search itself never waits for it
+def schedule_thumbnail_cleanup(results_dir: str):
+    global _last_thumbnail_cleanup
+    now = time.time()
+    if now - _last_thumbnail_cleanup < getattr(settings, "SEARCH_THUMBNAIL_CLEANUP_INTERVAL", 600):
+        return
+    _last_thumbnail_cleanup = now
+    ttl = getattr(settings, "SEARCH_THUMBNAIL_TTL", 24 * 60 * 60)
+    asyncio.get_running_loop().run_in_executor(None, cleanup_thumbnails, results_dir, ttl)
+
 
-        await browser.close()
-        return results
+# When the user searches a game on the website, the scraper is activated, and it scrapes whatever MobyGames shows as a
+# result of searching the same game. The search page is rendered on MobyGames' server, so it's downloaded with the
+# fetcher (a simple HTTP request, with Playwright only as a fallback) and read with BeautifulSoup. It's still an async
+# function, because all the scrapers run on the event loop of the browser pool
+async def search_mobygames(game_name: str):
+    # Search link on MobyGames is encoded in a way that turns non-alphabetic symbols as something else like a simple
+    # space is replaced with "%20" and ":" sign is replaced with "%3A"
+    encoded_name = urllib.parse.quote(game_name)
+    search_url = f"{mobygames_url()}/search/?q={encoded_name}"
+
+    results_dir = os.path.join(settings.MEDIA_ROOT, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    schedule_thumbnail_cleanup(results_dir)
+
+    fetcher = get_fetcher()
+    timer = StepTimer(f"search_mobygames('{game_name}')")
+
+    # Go to the website. The page is complete either when it has the table with results or when it says that there
+    # aren't any
+    with timer.step("search page"):
+        result = await fetcher.fetch(search_url, ready=SEARCH_PAGE_READY)
+    if result is None:
+        print("[!] Could not download the search page from MobyGames.")
+        return []
+
+    # Case where there are no results
+    if "No results found for that query" in result.html:
+        print("[INFO] No results found on MobyGames for this query.")
+        return []
+
+    # When searching a game on MobyGames there is a field of text at the top of the page which informs you that this
+    # page either excludes or includes games marked as Adult. The "Click here" link leads to the same search with the
+    # adult games included
+    for p_tag in result.soup.find_all("p"):
+        if "This search excludes games marked as Adult" not in p_tag.get_text(" ", strip=True):
+            continue
+        click_here = next((a for a in p_tag.find_all("a", href=True) if "Click here" in a.get_text()), None)
+        if click_here and not click_here["href"].startswith("#"):
+            with timer.step("adult toggle"):
+                adult_result = await fetcher.fetch(urllib.parse.urljoin(result.url, click_here["href"]),
+                                                   ready=SEARCH_PAGE_READY)
+            if adult_result is not None and adult_result.ok:
+                result = adult_result
+        break
+
+    results = parse_search_results(result.soup, limit=5)
+
+    # All the thumbnails are downloaded at the same time, so the search takes as long as the slowest of them instead of
+    # all of them added together
+    semaphore = asyncio.Semaphore(getattr(settings, "SCRAPER_THUMBNAIL_CONCURRENCY", 5))
+    with timer.step("thumbnails"):
+        images = await asyncio.gather(*(download_thumbnail(r.pop("thumbnail"), results_dir, semaphore)
+                                        for r in results))
+    # Every result carries the url of its own thumbnail
+    for r, image in zip(results, images):
+        r["image"] = image
+    timer.report()
+
+    if len(results) == 0:
+        print("[INFO] No valid game results found in search results.")
+        return []
+    elif len(results) < 5:
+        print(f"[INFO] Only {len(results)} valid game results found (less than expected).")
+
+    return results
 
 
 # This is a function for scraping the game's attributes such as genre or when it was released as well as its plot from
@@ -698,354 +683,242 @@ async def search_mobygames(game_name: str):
 # the game on MobyGames where the scraper got its attributes from. More about how it all works is in the code bellow
 async def scrape_game_info(url: str, media_root: str, save_image: bool = True, is_base: bool = False):
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                          "AppleWebKit/537.36 (KHTML, like Gecko) "
-                          "Chrome/140.0.0.0 Safari/537.36"
-        })
-
-        await page.goto(url, timeout=30000)
-        await page.wait_for_load_state("networkidle")
-
-        # Scrape the title as the first thing it does
-        title = None
-        if await page.query_selector("h1.mb-0"):
-            title = (await page.inner_text("h1.mb-0")).strip()
-
-        # Checks for that "This Compilation Includes" tag
-        compilation_games = []
-        try:
-            await page.wait_for_timeout(1000)
-            html = await page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            for div in soup.find_all("div", class_="border"):
-                b = div.find("b")
-                if b and "This Compilation Includes" in b.get_text(strip=True):
-                    for li in div.select("ul li"):
-                        links = li.find_all("a", href=True)
-                        if not links:
-                            continue
-                        href = links[-1]["href"]
-                        if href.startswith("/"):
-                            href = f"https://www.mobygames.com{href}"
-                        title_ = links[-1].get_text(strip=True)
-                        year_tag = li.find("small", class_="text-muted")
-                        year = year_tag.get_text(strip=True) if year_tag else None
-
-                        compilation_games.append({
-                            "title": title_,
-                            "url": href,
-                            "year": year
-                        })
-                    break
-        except Exception as e:
-            print(f"[!] Compilation check failed: {e}")
+    fetcher = get_fetcher()
+    timer = StepTimer(f"scrape_game_info({url})")
 
-        # If it does find this tag then it scrapes the links to the games this compilation includes
-        if compilation_games:
-            try:
-                page_title = (await page.inner_text("h1.mb-0")).strip()
-            except:
-                page_title = "Unknown Compilation"
-
-            await browser.close()
-            print(f"[DEBUG] Compilation detected: {page_title} ({len(compilation_games)} games)")
-            for g in compilation_games:
-                print(f"  - {g['title']} ({g['year']}) -> {g['url']}")
-            return {
-                "is_compilation": True,
-                "title": page_title,
-                "included_games": compilation_games
-            }
-
-        # Just in case the scraper looks for the words bellow to decide whether the base game does indeed take the user
-        # to the base version of the game (probably not needed but made just in case in the initial version)
-        EDITION_KEYWORDS = [
-            "edition", "remaster", "definitive", "goty", "game of the year",
-            "complete", "ultimate", "director's cut", "hd", "collection"
-        ]
-
-        base_game_url = None
-        if not is_base:
-            try:
-                await page.wait_for_timeout(1000)
-                html = await page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                for div in soup.find_all("div", class_="border"):
-                    b = div.find("b")
-                    if b and "Base Game" in b.get_text(strip=True):
-                        link = div.find("ul")
-                        if link and link.find("a", href=True):
-                            hrefs = [a["href"] for a in link.find_all("a", href=True) if "game" in a["href"]]
-                            if hrefs:
-                                href = hrefs[-1]
-                                if href.startswith("/"):
-                                    href = f"https://www.mobygames.com{href}"
-                                base_game_url = href
-                                break
-            except Exception as e:
-                print(f"[!] Base Game check failed: {e}")
-
-        # Only the original game editions return the website to the base game
-        if base_game_url and not is_base:
-            if title and any(k in title.lower() for k in EDITION_KEYWORDS):
-                print(f"→ Edition detected in title '{title}' → following base game: {base_game_url}")
-                await browser.close()
-                return await scrape_game_info(base_game_url, media_root, save_image, is_base=True)
-            else:
-                print(f"[INFO] 'Base Game' present, but '{title}' is not an edition -> staying on this page.")
-
-        # The regular case of scraping the game. The variables bellow are the attributes Playwright tries to scrape from
-        # MobyGames page for the chosen game
-        released = None
-        studio = []
-        moby_score = None
-        genre = []
-        cover_image_url = None
-
-        # Both released and studio (visible on MobyGames as "Developers") are in the same div, therefore they are
-        # scraped together here
-        if await page.query_selector("div.info-release"):
-            # Names of the values (such as "Released")
-            dt_tags = await page.query_selector_all("div.info-release dl.metadata dt")
-            # The values themselves (Such as "January 1st 2025")
-            dd_tags = await page.query_selector_all("div.info-release dl.metadata dd")
-            for dt, dd in zip(dt_tags, dd_tags):
-                label = (await dt.inner_text()).strip()
-                # if Playwright finds the searched values then it will scrape its information
-                if label == "Released":
-                    released = (await dd.inner_text()).strip()
-                elif label == "Developers":
-                    # Made into a list in case of multiple studios working on the game
-                    dev_links = await dd.query_selector_all("a")
-                    studio = [(await link.inner_text()).strip() for link in dev_links]
-
-        # Get info about game's genre
-        if await page.query_selector("div.info-genres"):
-            dt_tags = await page.query_selector_all("div.info-genres dl.metadata dt")
-            dd_tags = await page.query_selector_all("div.info-genres dl.metadata dd")
-            for dt, dd in zip(dt_tags, dd_tags):
-                label = (await dt.inner_text()).strip()
-                if label == "Genre":
-                    genre_links = await dd.query_selector_all("a")
-                    genre = [(await link.inner_text()).strip() for link in genre_links]
-                    break
-
-        # Get info about game's Mobyscore, a score given by MobyGames official reviewers (it has a different structure
-        # from the rest of the searched values)
-        if await page.query_selector("div.info-score div.mobyscore"):
-            moby_score = (await page.inner_text("div.info-score div.mobyscore")).strip()
-
-        if await page.query_selector("div.info-box img.img-box"):
-            cover_image_url = await page.get_attribute("div.info-box img.img-box", "src")
-
-        # Get the game's cover image url and download it into the media/game_icons folder in a jpg format. Additionally
-        # thanks to the image_name function discussed earlier the image's name is made easier to search it
-        local_image_relpath = None
-        if save_image and cover_image_url and title:
-            try:
-                resp = requests.get(cover_image_url, timeout=10)
-                resp.raise_for_status()
-                img = Image.open(BytesIO(resp.content)).convert("RGB")
-                filename = f"{image_name(title)}_icon.jpg"
-                out_dir = os.path.join(media_root, "game_icons")
-                os.makedirs(out_dir, exist_ok=True)
-                path = os.path.join(out_dir, filename)
-                img.save(path, "JPEG", quality=90)
-                local_image_relpath = f"game_icons/{filename}"
-                print(f"[DEBUG] Saved icon OK: {path}")
-            except Exception as e:
-                print(f"[ERROR] Could not save image: {e}")
-
-        # The entire process of scraping plot from Wikipedia
-        full_plot_md = None
-        summary_md = None
-        structured_plot = {}
-        wiki_url = None
-        if title:
-            # Wikipedia urls are usually simple enough to use this simple solution:
-            wiki_url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
-            print(f"[DEBUG] Wikipedia lookup: {wiki_url}")
-            try:
-                await page.goto(wiki_url, timeout=30000)
-                html = await page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                # Removes the "[ edit ]", "See also" and references when scraping Wikipedia text
-                for e in soup.select("span.mw-editsection, div.hatnote, sup.reference"):
-                    e.decompose()
-                # Uses extract_plot_structure described earlier to scrape the plot
-                structured_plot = extract_plot_structure(soup)
-                if structured_plot:
-                    # Made solely for markdown library which differentiates different headings
-                    full_plot_md = build_markdown_with_headings(structured_plot)
-                    #summary_md = summarize_plot_sections(structured_plot)
-            except Exception as e:
-                print(f"[!] Wikipedia scrape failed: {e}")
+    # The game page is downloaded only once and every step below reads from it. The page is complete when it has the
+    # game's title
+    with timer.step("game page"):
+        result = await fetcher.fetch(url, ready=GAME_PAGE_READY)
+    if result is None or not result.ok:
+        print(f"[!] Could not download the game page: {url}")
+        return None
+    for step_name, seconds in result.timings.items():
+        timer.add(f"game page/{step_name}", seconds)
+    soup = result.soup
+
+    # Every attribute of the game is read from this one parsed page, the compilation and base game checks included
+    game = parse_game_page(result.soup)
+    title = game["title"]
+    compilation_games = game["compilation_games"]
+
+    # If it does find this tag then it scrapes the links to the games this compilation includes
+    if compilation_games:
+        page_title = title or "Unknown Compilation"
+
+        print(f"[DEBUG] Compilation detected: {page_title} ({len(compilation_games)} games)")
+        for g in compilation_games:
+            print(f"  - {g['title']} ({g['year']}) -> {g['url']}")
+        timer.report()
+        return {
+            "is_compilation": True,
+            "title": page_title,
+            "included_games": compilation_games
+        }
 
-        # There has to be a separate function that scrapes the game's plot when Wikipedia page is non-existent. The code
-        # bellow deals with that issue by scraping the description of MobyGames page of that game in a similar way to
-        # the Wikipedia scraper
-        if not full_plot_md:
+    # Just in case the scraper looks for the words bellow to decide whether the base game does indeed take the user
+    # to the base version of the game (probably not needed but made just in case in the initial version)
+    EDITION_KEYWORDS = [
+        "edition", "remaster", "definitive", "goty", "game of the year",
+        "complete", "ultimate", "director's cut", "hd", "collection"
+    ]
+
+    base_game_url = None if is_base else game["base_game_url"]
+
+    # Only the original game editions return the website to the base game
+    if base_game_url and not is_base:
+        if title and any(k in title.lower() for k in EDITION_KEYWORDS):
+            print(f"→ Edition detected in title '{title}' → following base game: {base_game_url}")
+            timer.report()
+            return await scrape_game_info(base_game_url, media_root, save_image, is_base=True)
+        else:
+            print(f"[INFO] 'Base Game' present, but '{title}' is not an edition -> staying on this page.")
+
+    # The regular case of scraping the game. The attributes bellow are the ones the scraper found on the MobyGames page
+    # for the chosen game (see parse_game_page in parsers.py)
+    released = game["released"]
+    studio = game["developers"]
+    moby_score = game["score"]
+    genre = game["genres"]
+    cover_image_url = game["cover_image_url"]
+
+    # Get the game's cover image url, download it and save it into the cover store in all the sizes the website uses
+    # (see covers.py). The covers are stored by their content, so the title of the game doesn't matter anymore. The
+    # download and the resizing don't depend on Wikipedia, so they run in the background while the plot is downloaded
+    # below and the cover is only waited for at the end
+    cover_task = None
+    if save_image and cover_image_url and title:
+        async def save_cover():
+            cover_start = time.perf_counter()
             try:
-                if page.url != url:
-                    await page.goto(url, timeout=30000)
-                for sel in ["[data-target='#description-text']", "a[href='#description-text']"]:
-                    if await page.query_selector(sel):
-                        await page.click(sel)
-                        await page.wait_for_timeout(500)
-                        break
-
-                html_desc = None
-                for selector in ["#description-text", "#description-text .text-content",
-                                 "div#description", "div.description-content"]:
-                    if await page.query_selector(selector):
-                        html_desc = await page.inner_html(selector)
-                        if html_desc:
-                            break
-
-                if html_desc:
-                    soup_desc = BeautifulSoup(html_desc, "html.parser")
-                    paragraphs = [p.get_text(" ", strip=True) for p in soup_desc.find_all("p")]
-                    if not paragraphs:
-                        raw_text = soup_desc.get_text(" ", strip=True)
-                        paragraphs = [raw_text] if raw_text else []
-                    moby_description = "\n".join(paragraphs).strip()
-                    if moby_description:
-                        full_plot_md = f"## Description\n\n{moby_description}"
-
-                        words = len(moby_description.split())
-                        if words > 200:
-                            summarizer = get_summarizer()
-                            if words < 500:
-                                res = summarizer(moby_description, max_length=160, min_length=80, do_sample=False)
-                                summary_text = res[0]["summary_text"]
-                            else:
-                                chunks = [moby_description[i:i + 3500] for i in range(0, len(moby_description), 3500)]
-                                partials = []
-                                for ch in chunks:
-                                    res = summarizer(ch, max_length=180, min_length=80, do_sample=False)
-                                    partials.append(res[0]["summary_text"])
-                                summary_text = " ".join(partials)
-                        else:
-                            summary_text = moby_description
-
-                        summary_md = (
-                            f"## Description\n\n{summary_text}\n\n"
-                            "*This summary is based on the game's description from MobyGames. "
-                            "For a detailed storyline, try asking the chatbot below.*"
-                        )
-
-                        full_plot_md += (
-                            "\n\n*Note: This section is based on the game's description from MobyGames "
-                            "and may not represent the actual storyline. You can use the chatbot to learn more about the plot.*"
-                        )
-
-
+                path = await download_cover(cover_image_url, media_root)
+                print(f"[DEBUG] Saved cover OK: {path}")
+                return path
             except Exception as e:
-                print(f"[!] Fallback Moby description error: {e}")
-
-        # When the game has absolutely no plot available anywhere then the app returns this as a final measure instead
-        # of just having None in the database
-        if not full_plot_md:
-            full_plot_md = (
-                "## No Plot Found\n\n"
-                "No plot was found for this game. "
-                "It might be a gameplay-focused title without a defined storyline.\n\n"
-                "*Tip: You can ask the chatbot to learn more about the game's background or lore.*"
-            )
-
-        if not summary_md:
-            summary_md = (
-                "## No Summary Available\n\n"
-                "No summary was found for this game. "
-                "You can use the chatbot to learn more about its background, lore, or general storyline."
-            )
-
-        await browser.close()
-
-        # What this entire file returns at the end of the day
-        await browser.close()
+                print(f"[ERROR] Could not save image: {e}")
+                return None
+            finally:
+                timer.add("cover image", time.perf_counter() - cover_start)
+
+        cover_task = asyncio.create_task(save_cover())
+
+    # The entire process of scraping plot from Wikipedia
+    full_plot_md = None
+    summary_md = None
+    structured_plot = {}
+    wiki_url = None
+    if title:
+        # Wikipedia urls are usually simple enough to use this simple solution:
+        wiki_url = get_wikipedia_client().article_link(title)
+        print(f"[DEBUG] Wikipedia lookup: {wiki_url}")
+        try:
+            # Only the plot section of the article is downloaded through the Wikipedia API (redirects included)
+            with timer.step("wikipedia"):
+                wiki = await get_wikipedia_client().get_plot(title)
+            wiki_url = wiki["url"] or wiki_url
+            structured_plot = wiki["plot"]
+            if structured_plot:
+                # Made solely for markdown library which differentiates different headings
+                full_plot_md = build_markdown_with_headings(structured_plot)
+        except Exception as e:
+            print(f"[!] Wikipedia scrape failed: {e}")
 
-        # What this entire file returns at the end of the day
-        return {
-            "title": title or "Unknown",
-            "release_date": released,
-            "studio": ", ".join(studio) if studio else None,
-            "genre": ", ".join(genre) if genre else None,
-            "score": moby_score,
-            "cover_image": local_image_relpath,
-            "full_plot": full_plot_md,
-            "summary": summary_md,
-            "is_compilation": False,
-            "mobygames_url": url,
-            "wikipedia_url": wiki_url
-        }
+    # There has to be a separate function that scrapes the game's plot when Wikipedia page is non-existent. The code
+    # bellow deals with that issue by reading the description of MobyGames page of that game (it's already in the page
+    # downloaded at the beginning, it's just collapsed on the website) in a similar way to the Wikipedia scraper
+    if not full_plot_md:
+        try:
+            moby_description = game["description"]
+            if moby_description:
+                full_plot_md = f"## Description\n\n{moby_description}"
 
+                with timer.step("description summary"):
+                    summary_text = await asyncio.to_thread(summarize_moby_description, moby_description)
 
+                summary_md = (
+                    f"## Description\n\n{summary_text}\n\n"
+                    "*This summary is based on the game's description from MobyGames. "
+                    "For a detailed storyline, try asking the chatbot below.*"
+                )
 
+                full_plot_md += (
+                    "\n\n*Note: This section is based on the game's description from MobyGames "
+                    "and may not represent the actual storyline. You can use the chatbot to learn more about the plot.*"
+                )
 
-# Scrape game info but for admin that automatically makes the summary right after the scraping process
-async def scrape_game_info_admin(url: str, media_root: str, save_image: bool = True):
+        except Exception as e:
+            print(f"[!] Fallback Moby description error: {e}")
+
+    # When the game has absolutely no plot available anywhere then the app returns this as a final measure instead
+    # of just having None in the database
+    if not full_plot_md:
+        full_plot_md = (
+            "## No Plot Found\n\n"
+            "No plot was found for this game. "
+            "It might be a gameplay-focused title without a defined storyline.\n\n"
+            "*Tip: You can ask the chatbot to learn more about the game's background or lore.*"
+        )
+
+    if not summary_md:
+        summary_md = (
+            "## No Summary Available\n\n"
+            "No summary was found for this game. "
+            "You can use the chatbot to learn more about its background, lore, or general storyline."
+        )
+
+    local_image_relpath = await cover_task if cover_task else None
+    timer.report()
+
+    # What this entire file returns at the end of the day
+    return {
+        "title": title or "Unknown",
+        "release_date": released,
+        "studio": ", ".join(studio) if studio else None,
+        "genre": ", ".join(genre) if genre else None,
+        "score": moby_score,
+        "cover_image": local_image_relpath,
+        "full_plot": full_plot_md,
+        "summary": summary_md,
+        "is_compilation": False,
+        "mobygames_url": url,
+        "wikipedia_url": wiki_url,
+        "timings": timer.as_dict(),
+    }
+
+
+# Scrape game info but for admin that automatically makes the summary right after the scraping process. "plot_hash" is
+# the hash of the Wikipedia plot saved the last time. When the plot is still the same, it isn't saved again and the
+# summary isn't generated again - the result only says "unchanged": True (both pages are revalidated with the
+# HTTP cache, so in that case almost nothing is even downloaded). When the game page, Wikipedia or the summarizer failed,
+# the result has "error" with the reason, so the caller knows that the placeholders aren't the real plot and summary
+async def scrape_game_info_admin(url: str, media_root: str, save_image: bool = True, plot_hash: str = None):
 
     print(f"[ADMIN RELOAD] Starting the scraping process for the url: {url}")
-    start_time = time.time()
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                          "AppleWebKit/537.36 (KHTML, like Gecko) "
-                          "Chrome/140.0.0.0 Safari/537.36"
-        })
+    timer = StepTimer(f"scrape_game_info_admin({url})")
 
-        await page.goto(url, timeout=30000)
-        await page.wait_for_load_state("networkidle")
+    title = None
+    with timer.step("game page"):
+        result = await get_fetcher().fetch(url, ready=GAME_PAGE_READY)
+    if result is not None and result.ok:
+        title = parse_game_page(result.soup)["title"]
 
-        title = None
-        if await page.query_selector("h1.mb-0"):
-            title = (await page.inner_text("h1.mb-0")).strip()
+    full_plot_md = None
+    summary_md = None
+    wiki_url = None
+    scraped_hash = None
+    error = None if title else "The game page couldn't be downloaded"
 
-        full_plot_md = None
-        summary_md = None
-        wiki_url = None
-
-        if title:
-            wiki_url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
-            print(f"[ADMIN RELOAD] Wikipedia url: {wiki_url}")
-
-            try:
-                await page.goto(wiki_url, timeout=30000)
-                html = await page.content()
-                soup = BeautifulSoup(html, "html.parser")
-                for e in soup.select("span.mw-editsection, div.hatnote, sup.reference"):
-                    e.decompose()
-
-                structured_plot = extract_plot_structure(soup)
-                if structured_plot:
-                    full_plot_md = build_markdown_with_headings(structured_plot)
-                    summary_md = summarize_plot_sections(structured_plot)
-                    print("[ADMIN RELOAD] The summary has been successfully generated.")
-            except Exception as e:
-                print(f"[ADMIN RELOAD] Wikipedia scrape failed: {e}")
-
-        if not full_plot_md:
-            full_plot_md = "## No Plot Found\n\nNo plot could be scraped for this game."
-        if not summary_md:
-            summary_md = "## No Summary Available\n\nNo summary could be generated."
-
-        await browser.close()
-        elapsed = time.time() - start_time
-        print(f"[ADMIN RELOAD] Finished in {elapsed:.1f}s")
-
-        return {
-            "title": title or "Unknown",
-            "full_plot": full_plot_md,
-            "summary": summary_md,
-            "wikipedia_url": wiki_url,
-        }
+    if title:
+        wiki_url = get_wikipedia_client().article_link(title)
+        print(f"[ADMIN RELOAD] Wikipedia url: {wiki_url}")
 
+        try:
+            with timer.step("wikipedia"):
+                wiki = await get_wikipedia_client().get_plot(title, skip_if_hash=plot_hash)
+            wiki_url = wiki["url"] or wiki_url
+            if wiki.get("error"):
+                raise RuntimeError(wiki["error"])
+            if wiki.get("unchanged"):
+                timer.report()
+                print(f"[ADMIN RELOAD] The plot of '{title}' hasn't changed, nothing to summarize.")
+                return {
+                    "title": title,
+                    "unchanged": True,
+                    "plot_hash": wiki["plot_hash"],
+                    "wikipedia_url": wiki_url,
+                    "timings": timer.as_dict(),
+                }
+            structured_plot = wiki["plot"]
+            if structured_plot:
+                full_plot_md = build_markdown_with_headings(structured_plot)
+                # All the scrapers share one event loop, so the model runs in a separate thread to not stall every
+                # other scraper while the summary is being generated
+                with timer.step("summary"):
+                    summary_md = await asyncio.to_thread(summarize_plot_sections, structured_plot)
+                scraped_hash = wiki["plot_hash"]
+                print("[ADMIN RELOAD] The summary has been successfully generated.")
+        except Exception as e:
+            # Wikipedia being down and the summarizer being unavailable (SummarizerUnavailable) both end up here
+            print(f"[ADMIN RELOAD] Wikipedia scrape failed: {e}")
+            full_plot_md = summary_md = scraped_hash = None
+            error = str(e) or type(e).__name__
+
+    if not full_plot_md:
+        full_plot_md = "## No Plot Found\n\nNo plot could be scraped for this game."
+    if not summary_md:
+        summary_md = "## No Summary Available\n\nNo summary could be generated."
+
+    timer.report()
+    print(f"[ADMIN RELOAD] Finished in {timer.total:.1f}s")
+
+    data = {
+        "title": title or "Unknown",
+        "full_plot": full_plot_md,
+        "summary": summary_md,
+        "wikipedia_url": wiki_url,
+        "plot_hash": scraped_hash,
+        "timings": timer.as_dict(),
+    }
+    if error:
+        data["error"] = error
+    return data
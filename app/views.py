@@ -1,10 +1,10 @@
-import asyncio
 import json
 import re
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 import markdown
 import os
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
@@ -14,7 +14,7 @@ from django.db.models import Avg, Count
 from django.db.models.functions import Trim
 from django.http import FileResponse
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseRedirect
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework import viewsets, serializers
@@ -25,10 +25,21 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Games, GamePlots, UserModel, UserHistory, ChatBot, UserRatings
+from .browser_pool import arun_scraper, run_scraper
+from .compilations import compilation_payload, get_compilation, get_fresh_compilation
+from .covers import cover_path, cover_url
+from .http_cache import http_cache_stats
+from .imports import import_compilation, import_game
+from .jobs import can_see_job, enqueue_job, job_status
+from .models import Games, GamePlots, UserModel, UserHistory, ChatBot, UserRatings, ScrapeJob
+from .outbound import PRIORITY_ADMIN, PRIORITY_BULK, outbound_stats, with_priority
+from .refresh import refresh_game
+from .search_cache import acached_search, cache_stats
 from .serializers import (GamesSerializer, GamePlotsSerializer, UserSerializer)
+from .summarization import SummarizerUnavailable, get_summarization_engine
+from .summary_cache import summary_cache_stats
 from .utils import (search_mobygames, scrape_game_info, record_user_history, jwt_required, _wants_json,
-                    summarize_plot_from_markdown, scrape_game_info_admin)
+                    summarize_plot_from_markdown)
 
 
 def react_index(request):
@@ -266,7 +277,7 @@ def game_detail(request, pk: int):
 # JavaScript that don’t include CSRF tokens. In the code below it's used to access MobyGames website for scraping
 @jwt_required
 @csrf_exempt
-def search_view(request):
+async def search_view(request):
     if request.method == "GET":
         index_path = os.path.join(
             settings.BASE_DIR,
@@ -290,17 +301,27 @@ def search_view(request):
     if not game:
         return HttpResponseBadRequest('Missing "game"')
 
-    results = asyncio.run(search_mobygames(game))
+    # The same titles are searched over and over again, so the results are cached (see search_cache.py)
+    results = await acached_search(game, lambda q: arun_scraper(search_mobygames(q)))
 
     if request.headers.get("Accept") == "application/json":
         return JsonResponse({"query": game, "results": results})
 
-    request.session["ai_last_results"] = results
-    request.session["ai_last_query"] = game
+    await request.session.aset("ai_last_results", results)
+    await request.session.aset("ai_last_query", game)
 
     return JsonResponse({"redirect": "/app/results/"})
 
 
+# The thumbnails used to be saved as media/results/result_<n>.png, one set for everybody, and that's the address the
+# built frontend (main.js) still asks for until it's built again from the sources, which read the "image" of every
+# result. This sends such a request to the thumbnail of the n-th result of the user's last search
+def legacy_result_thumbnail(request, n):
+    results = request.session.get('ai_last_results') or []
+    image = results[n - 1].get("image") if 0 < n <= len(results) else None
+    return HttpResponseRedirect(image or f"{settings.MEDIA_URL}results/default_icon.png")
+
+
 # Displays the results of searching the game
 @jwt_required
 def results_view(request):
@@ -345,73 +366,6 @@ def safe_json(obj):
 
 
 
-# This function is used for scraping the game plots and everything about the game from Mobygames
-@jwt_required
-def details_view(request):
-    url = request.GET.get('url')
-    if not url:
-        return HttpResponseBadRequest('Missing url')
-
-    title_guess = None
-    for r in request.session.get('ai_last_results', []):
-        if r.get('url') == url:
-            first_line = (r.get('description') or '').splitlines()[0].strip()
-            m = re.match(r'(.+?)\s*\((?:[^)]*)\)\s*', first_line)
-            title_guess = (m.group(1) if m else first_line).strip()
-            break
-
-    if title_guess:
-        existing = Games.objects.filter(title__iexact=title_guess).first()
-        if existing:
-            record_user_history(request.user, existing)
-            return redirect('game_detail_page', pk=existing.id)
-
-    data = asyncio.run(scrape_game_info(url, media_root=settings.MEDIA_ROOT, save_image=True))
-
-    if not data:
-        print(f"[ERROR] Scraper returned None for URL: {url}")
-        return render(request, "frontend/error.html", {
-            "message": "Could not get the data on this game. Please try again."
-        })
-
-    if data.get("is_compilation"):
-        return redirect(f"/app/compilation/?url={url}")
-
-    for key, val in list(data.items()):
-        if isinstance(val, Decimal):
-            data[key] = float(val)
-
-    try:
-        if data.get('score'):
-            data['score'] = Decimal(str(data['score']))
-        else:
-            data['score'] = None
-    except (InvalidOperation, TypeError, ValueError):
-        data['score'] = None
-
-    games = Games.objects.create(
-        title=data.get('title') or 'Unknown',
-        release_date=data.get('release_date'),
-        genre=data.get('genre'),
-        studio=data.get('studio'),
-        score=data.get('score'),
-        cover_image=data.get('cover_image'),
-        mobygames_url=data.get('mobygames_url'),
-        wikipedia_url=data.get('wikipedia_url'),
-    )
-
-    GamePlots.objects.create(
-        game_id=games,
-        full_plot=data.get('full_plot') or '',
-        summary=data.get('summary') if "No Summary Available" in (data.get('summary') or "") else ''
-    )
-
-    record_user_history(request.user, games)
-    return redirect('game_detail_page', pk=games.id)
-
-
-
-
 @jwt_required
 def game_detail_page(request, pk):
 
@@ -426,14 +380,7 @@ def game_detail_page(request, pk):
         full_plot_html = markdown.markdown(full_plot_md or "")
         summary_html = markdown.markdown(summary_md or "")
 
-        cover_value = game.cover_image
-        if not cover_value:
-            cover_url = None
-        else:
-            if hasattr(cover_value, "url"):
-                cover_url = cover_value.url
-            else:
-                cover_url = f"/media/{cover_value}"
+        cover = cover_url(game.cover_image, "large")
 
         return JsonResponse({
             "id": game.id,
@@ -444,7 +391,7 @@ def game_detail_page(request, pk):
             "score": float(game.score) if game.score is not None else None,
             "mobygames_url": game.mobygames_url,
             "wikipedia_url": game.wikipedia_url,
-            "cover_image": cover_url,
+            "cover_image": cover,
             "full_plot_html": full_plot_html,
             "summary_html": summary_html,
         })
@@ -469,12 +416,7 @@ def api_game_detail(request, pk):
     full_plot_html = markdown.markdown(plot.full_plot if plot else "")
     summary_html = markdown.markdown(plot.summary if plot else "")
 
-    cover = None
-    if game.cover_image:
-        if hasattr(game.cover_image, "url"):
-            cover = game.cover_image.url
-        else:
-            cover = "/media/" + str(game.cover_image)
+    cover = cover_url(game.cover_image, "large")
 
     try:
         score_value = float(game.score) if game.score is not None else None
@@ -500,28 +442,67 @@ def api_game_detail(request, pk):
 # This function deals with that cursed game compilation situation I described multiple times in this project. But
 # essentially the only thing it does is redirecting the user to the corresponding urls
 @jwt_required
-def compilation_view(request):
+async def compilation_view(request):
     url = request.GET.get("url")
     if not url:
         return JsonResponse({"error": "Missing URL"}, status=400)
 
-    result = asyncio.run(scrape_game_info(url, settings.MEDIA_ROOT))
+    is_json = request.headers.get("x-requested-with") == "XMLHttpRequest" or request.GET.get("format") == "json"
+
+    # The compilation was most likely saved a moment ago, when the game turned out to be one (see compilations.py)
+    compilation = await sync_to_async(get_fresh_compilation)(url)
+    if compilation and is_json:
+        return JsonResponse(compilation_payload(compilation))
 
-    if not result.get("is_compilation"):
+    # The compilation is read by the worker and the page polls the job (see jobs.py)
+    if getattr(settings, "SCRAPE_JOBS_ENABLED", False):
+        if is_json:
+            job = await sync_to_async(enqueue_job)(ScrapeJob.KIND_COMPILATION, url, request.user)
+            return JsonResponse(job_status(job), status=202)
+        index_path = os.path.join(settings.BASE_DIR, "frontend", "static", "frontend", "index.html")
+        return FileResponse(open(index_path, "rb"))
+
+    result = await arun_scraper(get_compilation(url))
+
+    if not result:
         return JsonResponse({"error": "Not a compilation"}, status=400)
 
-    if request.headers.get("x-requested-with") == "XMLHttpRequest" or request.GET.get("format") == "json":
-        return JsonResponse({
-            "title": result.get("title"),
-            "included_games": result.get("included_games", [])
-        })
+    if is_json:
+        return JsonResponse(result)
 
     index_path = os.path.join(settings.BASE_DIR, "frontend", "static", "frontend", "index.html")
     return FileResponse(open(index_path, "rb"))
 
 
+# Imports every game of the compilation at once instead of making the user open them one by one. It works like the
+# details page - the job is queued and the page polls its progress (with the status of every game)
+@csrf_exempt
+@jwt_required
+@require_http_methods(["POST"])
+async def compilation_import_view(request):
+    url = request.GET.get("url")
+    if not url and request.content_type and "application/json" in request.content_type:
+        try:
+            url = (json.loads(request.body.decode("utf-8")).get("url") or "").strip()
+        except (ValueError, AttributeError):
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not url:
+        return JsonResponse({"error": "Missing URL"}, status=400)
+
+    if getattr(settings, "SCRAPE_JOBS_ENABLED", False):
+        job = await sync_to_async(enqueue_job)(ScrapeJob.KIND_COMPILATION_IMPORT, url, request.user)
+        return JsonResponse(job_status(job), status=202)
+
+    # Nobody waits for the whole collection at once, so its requests go after the searches and the single games
+    result = await arun_scraper(with_priority(PRIORITY_BULK, import_compilation(url)))
+    if result is None:
+        return JsonResponse({"error": "Not a compilation"}, status=400)
+    return JsonResponse(result)
+
+
+# This function is used for scraping the game plots and everything about the game from Mobygames
 @jwt_required
-def details_view(request):
+async def details_view(request):
     url = request.GET.get('url')
     if not url:
         return JsonResponse({"error": "Missing url"}, status=400)
@@ -529,7 +510,7 @@ def details_view(request):
     is_json = request.headers.get("x-requested-with") == "XMLHttpRequest" or request.GET.get("format") == "json"
 
     title_guess = None
-    for r in request.session.get('ai_last_results', []):
+    for r in await request.session.aget('ai_last_results', []):
         if r.get('url') == url:
             first_line = (r.get('description') or '').splitlines()[0].strip()
             m = re.match(r'(.+?)\s*\((?:[^)]*)\)\s*', first_line)
@@ -537,53 +518,65 @@ def details_view(request):
             break
 
     if title_guess:
-        existing = Games.objects.filter(title__iexact=title_guess).first()
+        existing = await Games.objects.filter(title__iexact=title_guess).afirst()
         if existing:
-            record_user_history(request.user, existing)
+            await sync_to_async(record_user_history)(request.user, existing)
             if is_json:
                 return JsonResponse({"redirect_game_id": existing.id})
             return redirect('game_detail_page', pk=existing.id)
 
-    data = asyncio.run(scrape_game_info(url, media_root=settings.MEDIA_ROOT, save_image=True))
+    # The game is imported by the worker in the background (see jobs.py). The view only queues the job and returns its
+    # id, which the page then polls. A plain visit gets the page itself, which asks for the job on its own
+    if getattr(settings, "SCRAPE_JOBS_ENABLED", False):
+        if is_json:
+            job = await sync_to_async(enqueue_job)(ScrapeJob.KIND_DETAILS, url, request.user)
+            return JsonResponse(job_status(job), status=202)
+        index_path = os.path.join(settings.BASE_DIR, "frontend", "static", "frontend", "index.html")
+        return FileResponse(open(index_path, "rb"))
+
+    # Many users can click the same result at the same time, so the import goes through import_game, which makes sure
+    # the game is scraped and saved only once (see imports.py)
+    result = await arun_scraper(import_game(url))
 
-    if not data:
-        return JsonResponse({"error": "Scraper failed"}, status=500) if is_json else render(...)
+    if result.status == "failed":
+        if is_json:
+            return JsonResponse({"error": "Scraper failed"}, status=500)
+        # The error page of the frontend (see react_error_page)
+        return redirect("/error/500")
 
-    if data.get("is_compilation"):
+    if result.status == "compilation":
         if is_json:
             return JsonResponse({"redirect_compilation": True})
         return redirect(f"/app/compilation/?url={url}")
 
-    for key, val in list(data.items()):
-        if isinstance(val, Decimal):
-            data[key] = float(val)
-
-    game = Games.objects.create(
-        title=data.get('title') or 'Unknown',
-        release_date=data.get('release_date'),
-        genre=data.get('genre'),
-        studio=data.get('studio'),
-        score=data.get('score'),
-        cover_image=data.get('cover_image'),
-        mobygames_url=data.get('mobygames_url'),
-        wikipedia_url=data.get('wikipedia_url'),
-    )
-
-    GamePlots.objects.create(
-        game_id=game,
-        full_plot=data.get('full_plot') or '',
-        summary=data.get('summary') or ''
-    )
-
-    record_user_history(request.user, game)
+    game = await Games.objects.aget(id=result.game_id)
+    await sync_to_async(record_user_history)(request.user, game)
 
     if is_json:
+        if result.status == "existing":
+            return JsonResponse({"redirect_game_id": game.id})
         return JsonResponse({"new_game_id": game.id})
 
     return redirect('game_detail_page', pk=game.id)
 
 
 
+# The status of a queued import, polled by the frontend until the job is done or has failed. Once the game is imported
+# it's added to the user's history, the same way as when the game is opened. The jobs of other users look the same as
+# the ones which don't exist
+@jwt_required
+def job_status_view(request, job_id):
+    job = ScrapeJob.objects.filter(id=job_id).first()
+    if not job or not can_see_job(job, request.user):
+        return JsonResponse({"error": "This job does not exist"}, status=404)
+
+    if job.status == ScrapeJob.STATUS_DONE and job.game_id_id:
+        game = Games.objects.filter(id=job.game_id_id).first()
+        if game:
+            record_user_history(request.user, game)
+    return JsonResponse(job_status(job))
+
+
 @jwt_required
 def my_library_view(request):
 
@@ -631,12 +624,8 @@ def my_library_api(request):
 
         user_rating = UserRatings.objects.filter(user_id=user, game_id=game).first()
 
-        cover = None
-        if game.cover_image:
-            if hasattr(game.cover_image, "url"):
-                cover = game.cover_image.url
-            else:
-                cover = "/media/" + str(game.cover_image)
+        # The library shows the covers as tiles, so the medium size is enough
+        cover = cover_url(game.cover_image, "medium")
 
         output.append({
             "id": game.id,
@@ -728,7 +717,8 @@ def explore_view(request):
             games_out.append({
                 "id": game.id,
                 "title": game.title,
-                "cover_image": game.cover_image,
+                # The explore page adds "/media/" itself, so it gets the path of the medium cover
+                "cover_image": cover_path(game.cover_image, "medium"),
                 "score": float(game.score) if game.score is not None else None,
                 "rating": round(avg_rating, 2) if avg_rating else None,
             })
@@ -965,12 +955,8 @@ def chatbot_page(request):
         games = []
         for h in history:
             g = h.game_id
-            cover = None
-            if g.cover_image:
-                if hasattr(g.cover_image, "url"):
-                    cover = g.cover_image.url
-                else:
-                    cover = "/media/" + str(g.cover_image)
+            # The covers in the list of games are tiny
+            cover = cover_url(g.cover_image, "small")
 
             games.append({
                 "id": g.id,
@@ -1055,6 +1041,9 @@ def generate_summary_view(request, pk):
         print(f"[SUMMARY] Zakończono streszczenie gry '{game.title}'")
         return JsonResponse({"summary": summary_html})
 
+    except SummarizerUnavailable as e:
+        print(f"[SUMMARY ERROR] {e}")
+        return JsonResponse({"error": "The summarizer is not available right now, try again later."}, status=503)
     except Exception as e:
         print(f"[SUMMARY ERROR] {e}")
         return JsonResponse({"error": f"There was an error during summary generation: {e}"}, status=500)
@@ -1281,11 +1270,11 @@ def admin_games_view(request):
 @csrf_exempt
 @jwt_required
 @require_http_methods(["POST"])
-def admin_reload_game(request, game_id):
+async def admin_reload_game(request, game_id):
     if not getattr(request.user, "is_admin", False):
         return JsonResponse({"error": "Unauthorized"}, status=403)
 
-    game = Games.objects.filter(id=game_id).first()
+    game = await Games.objects.filter(id=game_id).afirst()
     if not game:
         return JsonResponse({"error": "The game doesn't exist"}, status=404)
 
@@ -1294,18 +1283,17 @@ def admin_reload_game(request, game_id):
 
     try:
         print(f"[ADMIN RELOAD] Running the scraping process again for the game: {game.title}")
-        data = asyncio.run(scrape_game_info_admin(game.mobygames_url, settings.MEDIA_ROOT))
-
-        plot = GamePlots.objects.filter(game_id=game).first()
-        if not plot:
-            plot = GamePlots.objects.create(game_id=game)
-
-        plot.full_plot = data.get("full_plot") or "## No Plot Found"
-        plot.summary = data.get("summary") or "## No Summary Available"
-        plot.save(update_fields=["full_plot", "summary"])
-
-        game.wikipedia_url = data.get("wikipedia_url")
-        game.save(update_fields=["wikipedia_url"])
+        # With ?force=1 the summary is generated again even when the plot hasn't changed
+        force = request.GET.get("force") == "1"
+        status = await arun_scraper(with_priority(PRIORITY_ADMIN, refresh_game(game, force=force)))
+
+        if status == "failed":
+            return JsonResponse({"error": "The game couldn't be reloaded (MobyGames, Wikipedia or the summarizer "
+                                          "failed), the saved plot and summary were kept."}, status=502)
+        if status == "unchanged":
+            print(f"[ADMIN RELOAD] The plot of '{game.title}' hasn't changed.")
+            return JsonResponse({"message": f"The plot of '{game.title}' hasn't changed since the last reload.",
+                                 "unchanged": True})
 
         print(f"[ADMIN RELOAD] The game '{game.title}' has been reloaded.")
         return JsonResponse({"message": f"The game '{game.title}' has been reloaded and updated."})
@@ -1314,6 +1302,45 @@ def admin_reload_game(request, game_id):
         return JsonResponse({"error": f"There was an error during the reload process: {e}"}, status=500)
 
 
+# Hit/miss counters and the most recent entries of the search cache
+@jwt_required
+def admin_search_cache_view(request):
+    if not getattr(request.user, "is_admin", False):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+    return JsonResponse(cache_stats())
+
+
+# How many of the scraped pages were revalidated from the HTTP cache of this process instead of downloaded again
+@jwt_required
+def admin_http_cache_view(request):
+    if not getattr(request.user, "is_admin", False):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+    return JsonResponse(http_cache_stats())
+
+
+# How many summaries came from the summary cache instead of the model - the entries in the database and the hit rate
+# of whoever runs the model (the summarizer service when it's used, this process otherwise)
+@jwt_required
+def admin_summary_cache_view(request):
+    if not getattr(request.user, "is_admin", False):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+    stats = summary_cache_stats()
+    try:
+        stats["summarizer"] = get_summarization_engine().stats()
+    except SummarizerUnavailable as e:
+        stats["summarizer"] = {"error": str(e)}
+    return JsonResponse(stats)
+
+
+# The state of the outbound scheduler of this process - for every host the number of requests, retries and 429s, how
+# many requests are waiting right now and how long the requests of every priority had to wait
+@jwt_required
+async def admin_outbound_view(request):
+    if not getattr(request.user, "is_admin", False):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+    return JsonResponse({"hosts": await arun_scraper(outbound_stats())})
+
+
 def information_view(request):
     index_path = os.path.join(
         settings.BASE_DIR,
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import os
+import urllib.parse
+
+from django.conf import settings
+
+from .fetchers import get_http_client
+from .http_cache import cached_get, content_hash
+from .parsers import make_soup
+
+
+# The names of the Wikipedia sections (their anchors, to be exact) which hold the game's plot. It's the same list that
+# extract_plot_structure in utils.py uses when looking for the plot heading
+PLOT_SECTIONS = ["Plot", "Synopsis", "Premise", "Story", "Lore"]
+
+# The query API accepts up to 50 titles in one request
+MAX_TITLES_PER_QUERY = 50
+
+
+class WikipediaFixtureMissing(LookupError):
+    pass
+
+
+# Downloading and rendering the whole article just to read one of its sections was a waste of bandwidth and CPU. This
+# client asks the MediaWiki API only for the things it needs: first it checks which articles exist (many titles in one
+# request), then it asks for the list of sections of the article and finally for the html of the plot section alone.
+#
+# For the offline tests there is also a fixture mode. With WIKIPEDIA_FIXTURE_MODE = "record" every API response is
+# saved into WIKIPEDIA_FIXTURE_DIR, and with "replay" the responses are read back from there without touching the
+# network at all
+class WikipediaClient:
+    def __init__(self, api_url: str = None, article_url: str = None, fixture_mode: str = None,
+                 fixture_dir: str = None):
+        self.api_url = api_url or getattr(settings, "WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+        self.article_url = article_url or getattr(settings, "WIKIPEDIA_ARTICLE_URL", "https://en.wikipedia.org/wiki/")
+        self.fixture_mode = (fixture_mode or getattr(settings, "WIKIPEDIA_FIXTURE_MODE", "off")).lower()
+        self.fixture_dir = fixture_dir or getattr(
+            settings, "WIKIPEDIA_FIXTURE_DIR", os.path.join(settings.BASE_DIR, "app", "fixtures", "wikipedia")
+        )
+
+    def article_link(self, title: str) -> str:
+        return self.article_url + urllib.parse.quote(title.replace(" ", "_"), safe="_()'!,:")
+
+    # The name of the fixture file is a hash of the request parameters, so the same request always ends up in the same
+    # file no matter in which order the parameters were given
+    def _fixture_path(self, params: dict) -> str:
+        key = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return os.path.join(self.fixture_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    async def _api(self, **params) -> dict:
+        params = {"format": "json", "formatversion": "2", **params}
+
+        if self.fixture_mode == "replay":
+            path = self._fixture_path(params)
+            if not os.path.exists(path):
+                raise WikipediaFixtureMissing(f"No recorded Wikipedia response for {params}")
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["response"]
+
+        resp = await cached_get(get_http_client(), self.api_url, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+
+        if self.fixture_mode == "record":
+            os.makedirs(self.fixture_dir, exist_ok=True)
+            with open(self._fixture_path(params), "w", encoding="utf-8") as f:
+                json.dump({"params": params, "response": data}, f, ensure_ascii=False, indent=1)
+        return data
+
+    # Checks which of the given titles have an article. Redirects are followed, so e.g. "Witcher 3" is turned into the
+    # title of the real article. The result maps every title that was asked for to its canonical title (or None when
+    # there is no such article)
+    async def resolve_titles(self, titles) -> dict:
+        resolved = {}
+        titles = [t for t in dict.fromkeys(titles) if t]
+        for i in range(0, len(titles), MAX_TITLES_PER_QUERY):
+            batch = titles[i:i + MAX_TITLES_PER_QUERY]
+            data = await self._api(action="query", titles="|".join(batch), redirects="1")
+            query = data.get("query", {})
+
+            # The API first normalizes the titles (e.g. first letter capitalized) and then follows the redirects
+            mapping = {}
+            for item in query.get("normalized", []) + query.get("redirects", []):
+                mapping[item["from"]] = item["to"]
+            existing = {p["title"] for p in query.get("pages", []) if not p.get("missing") and not p.get("invalid")}
+
+            for title in batch:
+                final = title
+                seen = set()
+                while final in mapping and final not in seen:
+                    seen.add(final)
+                    final = mapping[final]
+                resolved[title] = final if final in existing else None
+        return resolved
+
+    # The list of sections of the article, without its text
+    async def sections(self, title: str) -> list:
+        data = await self._api(action="parse", page=title, prop="sections", redirects="1")
+        return data.get("parse", {}).get("sections", [])
+
+    # The html of only one section of the article (the heading included)
+    async def section_html(self, title: str, index) -> str:
+        data = await self._api(action="parse", page=title, section=str(index), prop="text", redirects="1",
+                               disableeditsection="1", disabletoc="1", disablelimitreport="1")
+        return data.get("parse", {}).get("text", "")
+
+    # The plot of the article (see extract_plot) and its hash. None when the article has no plot section. The hash is
+    # taken over the extracted text and not over the html - the html of the same section differs a little between two
+    # parses (e.g. the limit report comment, which is why it's turned off too) and the hash would never match
+    async def plot_section(self, title: str):
+        sections = await self.sections(title)
+        plot_section = None
+        for section in sections:
+            if str(section.get("level")) == "2" and section.get("anchor") in PLOT_SECTIONS:
+                plot_section = section
+                break
+        if plot_section is None:
+            return None
+
+        html = await self.section_html(title, plot_section["index"])
+        if not html:
+            return None
+        plot = self.extract_plot(html)
+        return {"plot": plot, "hash": self.plot_hash(plot)}
+
+    @staticmethod
+    def plot_hash(plot: dict) -> str:
+        return content_hash(json.dumps(plot, sort_keys=True, ensure_ascii=False))
+
+    @staticmethod
+    def extract_plot(html: str) -> dict:
+        # Imported here, because utils.py imports this module
+        from .utils import extract_plot_structure
+
+        soup = make_soup(html)
+        # Removes the "See also" and references when scraping Wikipedia text
+        for e in soup.select("span.mw-editsection, div.hatnote, sup.reference"):
+            e.decompose()
+        return extract_plot_structure(soup)
+
+    # The plot of the article and its hash. When the hash is the same as "skip_if_hash" (the hash saved the last time the
+    # plot was scraped), the plot hasn't changed and it doesn't have to be saved (nor summarized) again - "plot" is None
+    # and "unchanged" is True
+    async def _plot_for(self, title: str, skip_if_hash: str = None) -> dict:
+        section = await self.plot_section(title)
+        if section is None:
+            return {"plot": {}, "plot_hash": None}
+        if skip_if_hash and section["hash"] == skip_if_hash:
+            return {"plot": None, "plot_hash": section["hash"], "unchanged": True}
+        return {"plot": section["plot"], "plot_hash": section["hash"]}
+
+    # Finds the plots of many games at once. The existence of all the articles is checked in one request and then the
+    # plot sections are downloaded in parallel. For every title the result has the canonical title, the url of the
+    # article, its plot (an empty dictionary when the article has no plot section) and the hash of the plot. When the plot
+    # couldn't be downloaded, the plot is empty as well and "error" says why
+    async def get_plots(self, titles, skip_if_hash: dict = None) -> dict:
+        resolved = await self.resolve_titles(titles)
+        skip_if_hash = skip_if_hash or {}
+
+        async def one(title, canonical):
+            if not canonical:
+                return title, {"title": None, "url": None, "plot": {}, "plot_hash": None}
+            try:
+                plot = await self._plot_for(canonical, skip_if_hash.get(title))
+            except WikipediaFixtureMissing:
+                raise
+            except Exception as e:
+                # Not the same as an article without a plot section, so "error" tells the callers not to save the
+                # empty plot over the one they already have
+                print(f"[WIKIPEDIA] Could not get the plot of '{canonical}': {e}")
+                plot = {"plot": {}, "plot_hash": None, "error": str(e)}
+            return title, {"title": canonical, "url": self.article_link(canonical), **plot}
+
+        results = await asyncio.gather(*(one(t, c) for t, c in resolved.items()))
+        return dict(results)
+
+    async def get_plot(self, title: str, skip_if_hash: str = None) -> dict:
+        plots = await self.get_plots([title], skip_if_hash={title: skip_if_hash} if skip_if_hash else None)
+        return plots.get(title) or {"title": None, "url": None, "plot": {}, "plot_hash": None}
+
+
+_client = None
+
+
+def get_wikipedia_client() -> WikipediaClient:
+    global _client
+    if _client is None:
+        _client = WikipediaClient()
+    return _client
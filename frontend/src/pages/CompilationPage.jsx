@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { useSearchParams, useNavigate } from "react-router-dom";
 import "./CompilationPage.css";
+import { pollJob } from "../utils/pollJob";
 
 function CompilationPage() {
   const [searchParams] = useSearchParams();
@@ -9,6 +10,7 @@ function CompilationPage() {
   const url = searchParams.get("url");
   const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [importJob, setImportJob] = useState(null);
 
   useEffect(() => {
     async function loadData() {
@@ -18,14 +20,42 @@ function CompilationPage() {
         headers: { "x-requested-with": "XMLHttpRequest" }
       });
 
-      const json = await res.json();
-      setData(json);
+      let json = await res.json();
+
+      // The compilation is read in the background, so the page waits for the job to finish
+      if (json.job_id) {
+        json = await pollJob(json.job_id);
+      }
+
+      setData(json.included_games ? json : null);
       setLoading(false);
     }
 
     loadData();
   }, [url]);
 
+  // Imports all the games of the compilation at once. The status of every game is shown next to it while it's running
+  async function importAll() {
+    const res = await fetch(`/app/compilation/import-all/?url=${encodeURIComponent(url)}`, {
+      method: "POST",
+      headers: { "x-requested-with": "XMLHttpRequest" }
+    });
+
+    let job = await res.json();
+    setImportJob(job);
+    if (job.job_id) {
+      job = await pollJob(job.job_id, { onProgress: setImportJob });
+    }
+    setImportJob(job);
+  }
+
+  const gameStatus = (gameUrl) => {
+    const game = (importJob?.games || []).find((g) => g.url === gameUrl);
+    return game ? game.status : null;
+  };
+
+  const importRunning = Boolean(importJob?.job_id) && !["done", "failed"].includes(importJob.status);
+
   if (!url) return <p style={{ padding: 20 }}>Missing URL</p>;
   if (loading)
   return (
@@ -57,6 +87,7 @@ function CompilationPage() {
             <div>
               <strong>{g.title}</strong>
               {g.year && <span> {g.year}</span>}
+              {gameStatus(g.url) && <span className="import-status"> ({gameStatus(g.url)})</span>}
             </div>
 
             <button
@@ -69,6 +100,10 @@ function CompilationPage() {
         ))}
       </ul>
 
+      <button className="details-btn import-all-btn" onClick={importAll} disabled={importRunning}>
+        {importRunning ? (importJob.progress || "Importing...") : "Import all games"}
+      </button>
+
       <button className="back-link" onClick={() => navigate(-1)}>
         Go Back
       </button>
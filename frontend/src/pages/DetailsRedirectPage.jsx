@@ -1,11 +1,13 @@
 import { useSearchParams, useNavigate } from "react-router-dom";
 import React, { useEffect, useState } from "react";
+import { pollJob } from "../utils/pollJob";
 
 export default function DetailsRedirectPage() {
   const [searchParams] = useSearchParams();
   const navigate = useNavigate();
   const url = searchParams.get("url");
   const [loading, setLoading] = useState(true);
+  const [progress, setProgress] = useState("");
 
   useEffect(() => {
     async function load() {
@@ -16,7 +18,14 @@ export default function DetailsRedirectPage() {
         headers: { "x-requested-with": "XMLHttpRequest" }
       });
 
-      const data = await res.json();
+      let data = await res.json();
+
+      // The game is imported in the background, so the page waits for the job to finish
+      if (data.job_id) {
+        data = await pollJob(data.job_id, {
+          onProgress: (job) => setProgress(job.progress || "")
+        });
+      }
 
       if (data.redirect_game_id) {
         navigate(`/app/games/${data.redirect_game_id}`);
@@ -37,7 +46,7 @@ export default function DetailsRedirectPage() {
   return (
   <div className="center-loader redirect-loader">
     <div className="spinner"></div>
-    <span>Loading game details...</span>
+    <span>{progress ? `Loading game details... (${progress})` : "Loading game details..."}</span>
   </div>
 );
 }
@@ -65,7 +65,7 @@ function SearchResultsPage() {
             >
               <div className="result-thumb">
                 <img
-                  src={`/media/results/result_${idx + 1}.png`}
+                  src={r.image || `/media/results/result_${idx + 1}.png`}
                   onError={(e) => {
                     e.target.src = "/media/results/default_icon.png";
                   }}
@@ -0,0 +1,17 @@
+// Asks for the status of a queued scrape job until it's done or has failed. onProgress gets every status on the way,
+// so the page can show what the worker is doing at the moment
+export async function pollJob(jobId, { interval = 1000, onProgress } = {}) {
+  while (true) {
+    const res = await fetch(`/app/jobs/${jobId}/`, {
+      headers: { "x-requested-with": "XMLHttpRequest" }
+    });
+    const job = await res.json();
+
+    if (onProgress) onProgress(job);
+    if (!res.ok || job.status === "done" || job.status === "failed") {
+      return job;
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+}
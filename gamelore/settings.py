@@ -57,6 +57,7 @@ TEMPLATES = [
 
 
 WSGI_APPLICATION = 'gamelore.wsgi.application'
+ASGI_APPLICATION = 'gamelore.asgi.application'
 
 DATABASES = {
     'default': {
@@ -130,10 +131,161 @@ LOGIN_URL = '/app/login/'
 AUTH_USER_MODEL = 'app.UserModel'
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+# Scraper settings. The scrapers share a pool of warm Chromium browsers instead of launching a new one on every request.
+# Every browser has a few contexts and a browser is restarted after it has opened the given number of pages
+SCRAPER_POOL_BROWSERS = int(os.getenv("SCRAPER_POOL_BROWSERS", 2))
+SCRAPER_POOL_CONTEXTS_PER_BROWSER = int(os.getenv("SCRAPER_POOL_CONTEXTS_PER_BROWSER", 2))
+SCRAPER_POOL_RECYCLE_AFTER_PAGES = int(os.getenv("SCRAPER_POOL_RECYCLE_AFTER_PAGES", 200))
+
+# The pooled browsers only download these resource types from these domains. Images, fonts, stylesheets, ads and
+# analytics are blocked, the estimates are used to report roughly how many bytes the blocking saved
+SCRAPER_ALLOWED_RESOURCE_TYPES = ["document", "script", "xhr", "fetch"]
+SCRAPER_ALLOWED_DOMAINS = ["mobygames.com", "wikipedia.org", "wikimedia.org"]
+SCRAPER_BLOCKED_SIZE_ESTIMATES = {
+    "image": 40_000,
+    "font": 60_000,
+    "stylesheet": 30_000,
+    "media": 200_000,
+    "script": 50_000,
+    "other": 5_000,
+}
+
+# MobyGames and Wikipedia pages are downloaded with a pooled HTTP client first. The browser is used only when the static
+# html doesn't have the elements the scraper needs (the environment variable is a comma separated list, e.g. "http")
+SCRAPER_FETCHERS = os.getenv("SCRAPER_FETCHERS", "http,browser").split(",")
+SCRAPER_HTTP_TIMEOUT = 20
+SCRAPER_HTTP_MAX_CONNECTIONS = 20
+SCRAPER_HTTP_MAX_KEEPALIVE = 10
+# How long (in milliseconds) the browser waits for the elements a scraper needs before it gives up
+SCRAPER_READY_TIMEOUT = 20000
+# How many search result thumbnails are downloaded at the same time
+SCRAPER_THUMBNAIL_CONCURRENCY = 5
+# Search thumbnails are kept in media/results under a hash of their url. The ones not used by any search for
+# SEARCH_THUMBNAIL_TTL seconds are removed by a background cleanup running at most every SEARCH_THUMBNAIL_CLEANUP_INTERVAL
+SEARCH_THUMBNAIL_TTL = int(os.getenv("SEARCH_THUMBNAIL_TTL", 24 * 60 * 60))
+SEARCH_THUMBNAIL_CLEANUP_INTERVAL = 600
+# Outbound requests of the scrapers are paced per host with token buckets: "rate" requests per second with bursts of up
+# to "burst" requests. The hosts are matched by the domain, the ones not listed here aren't limited. The requests
+# answered with 429/5xx are tried SCRAPER_RETRY_ATTEMPTS times in total, with a random backoff growing from
+# SCRAPER_RETRY_BASE_DELAY up to SCRAPER_RETRY_MAX_DELAY seconds
+SCRAPER_HOST_RATE_LIMITS = {
+    "mobygames.com": {"rate": 4, "burst": 8},
+    "wikipedia.org": {"rate": 10, "burst": 20},
+    "wikimedia.org": {"rate": 10, "burst": 20},
+}
+SCRAPER_RETRY_ATTEMPTS = 3
+SCRAPER_RETRY_BASE_DELAY = 0.5
+SCRAPER_RETRY_MAX_DELAY = 10.0
+# The scraped pages are kept in SCRAPER_HTTP_CACHE_DIR with their ETag/Last-Modified and content hash and revalidated
+# the next time they are needed. The entries not used for SCRAPER_HTTP_CACHE_MAX_AGE seconds are removed
+SCRAPER_HTTP_CACHE_ENABLED = os.getenv("SCRAPER_HTTP_CACHE_ENABLED", "1") == "1"
+SCRAPER_HTTP_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "http")
+SCRAPER_HTTP_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# The parser BeautifulSoup uses for the scraped pages ("html.parser" is used when lxml is not installed)
+SCRAPER_HTML_PARSER = "lxml"
+
+# The address of MobyGames. Together with WIKIPEDIA_API_URL and WIKIPEDIA_ARTICLE_URL below it can be pointed at the
+# fake sites server ("python manage.py run_fake_sites"), which serves the pages saved in FAKE_SITES_FIXTURE_DIR
+MOBYGAMES_URL = os.getenv("MOBYGAMES_URL", "https://www.mobygames.com")
+FAKE_SITES_FIXTURE_DIR = os.path.join(BASE_DIR, "app", "fixtures", "fake_sites")
+
+# The plot is taken from the MediaWiki API. "record" saves every API response into WIKIPEDIA_FIXTURE_DIR and "replay"
+# reads them back from there, so the scraper can be tested without the network
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIPEDIA_ARTICLE_URL = os.getenv("WIKIPEDIA_ARTICLE_URL", "https://en.wikipedia.org/wiki/")
+WIKIPEDIA_FIXTURE_MODE = os.getenv("WIKIPEDIA_FIXTURE_MODE", "off")
+WIKIPEDIA_FIXTURE_DIR = os.path.join(BASE_DIR, "app", "fixtures", "wikipedia")
+
+# The cache shared by all the worker processes (the search results are kept there). The file based cache needs no extra
+# services, but e.g. Redis can be used by changing the backend and the location
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("DJANGO_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("DJANGO_CACHE_LOCATION", os.path.join(BASE_DIR, ".cache")),
+    }
+}
+
+# The search results are cached under the normalized query for SEARCH_CACHE_TTL seconds. When there are more than
+# SEARCH_CACHE_MAX_ENTRIES queries in the cache, the least recently used ones are removed. The TTL should be shorter
+# than SEARCH_THUMBNAIL_TTL, so the cached results never point to thumbnails which have already been removed. The hit
+# and miss counters are only exact with a cache whose incr is atomic (Redis or Memcached through DJANGO_CACHE_BACKEND),
+# with the file based cache the processes can lose some of each other's counts
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 6 * 60 * 60))
+SEARCH_CACHE_MAX_ENTRIES = 500
+
+# A game is imported by one process at a time. The others wait for it (checking the database every
+# IMPORT_LOCK_POLL_INTERVAL seconds). The lock is a row in the ImportLocks table and it expires by itself after
+# IMPORT_LOCK_TIMEOUT seconds
+IMPORT_LOCK_TIMEOUT = 300
+IMPORT_LOCK_POLL_INTERVAL = 0.5
+
+# With SCRAPE_JOBS_ENABLED = True the games are imported in the background by "python manage.py run_scrape_worker" and
+# the views only queue the jobs (nothing is imported while the worker isn't running). It's off by default, because the
+# pages have to poll the jobs and that needs the frontend built from the current sources (npm run build). Off, the views
+# scrape the game themselves, the way they used to
+SCRAPE_JOBS_ENABLED = os.getenv("SCRAPE_JOBS_ENABLED", "0") == "1"
+SCRAPE_WORKER_CONCURRENCY = int(os.getenv("SCRAPE_WORKER_CONCURRENCY", 3))
+SCRAPE_WORKER_POLL_INTERVAL = 1.0
+# Every worker moves the heartbeat of its running jobs every SCRAPE_JOB_HEARTBEAT_INTERVAL seconds. A job whose heartbeat
+# is older than SCRAPE_JOB_STALE_AFTER seconds (its worker died) is put back into the queue, at most
+# SCRAPE_JOB_MAX_ATTEMPTS times
+SCRAPE_JOB_HEARTBEAT_INTERVAL = 30
+SCRAPE_JOB_STALE_AFTER = 2 * 60
+SCRAPE_JOB_MAX_ATTEMPTS = 3
+# The finished jobs are kept for SCRAPE_JOB_KEEP_FOR seconds (so the pages polling them still get their result) and
+# then removed by the worker
+SCRAPE_JOB_KEEP_FOR = 7 * 24 * 60 * 60
+
+# The summarization model and the way it runs on the CPU: "torch", "torch-int8" (quantized when it's loaded) or "onnx"
+# (ONNX Runtime, needs "pip install optimum[onnxruntime]", the exported model is kept in SUMMARIZER_ONNX_DIR)
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "sshleifer/distilbart-cnn-12-6")
+SUMMARIZER_BACKEND = os.getenv("SUMMARIZER_BACKEND", "torch")
+SUMMARIZER_ONNX_DIR = os.path.join(BASE_DIR, ".cache", "onnx")
+# Every summary is saved into the SummaryCache table under the hash of the text, its length tier and the model, so the
+# same text is never summarized twice
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "1") == "1"
+# How many texts (plot sections and chunks of the long ones) the summarizer model gets in one call
+SUMMARIZER_BATCH_SIZE = int(os.getenv("SUMMARIZER_BATCH_SIZE", 8))
+# The long sections are split into chunks of whole sentences of at most SUMMARIZER_CHUNK_TOKENS tokens of the model (it
+# takes 1024 at most), with the last SUMMARIZER_CHUNK_OVERLAP sentences of a chunk repeated at the start of the next one
+SUMMARIZER_CHUNK_TOKENS = 1000
+SUMMARIZER_CHUNK_OVERLAP = 1
+# With SUMMARIZER_SERVICE_ADDRESS (host:port) set, the summaries are made by the summarizer service
+# ("python manage.py run_summarizer") instead of loading the model into every web server process. The key protects the
+# socket (SECRET_KEY when it's not set). A summary waits for the service at most SUMMARIZER_SERVICE_TIMEOUT seconds and
+# the service puts at most SUMMARIZER_SERVICE_MAX_TEXTS texts of the waiting requests into one run of the model.
+# SUMMARIZER_TORCH_THREADS limits the threads torch uses for the model (all the cores when it's not set)
+SUMMARIZER_SERVICE_ADDRESS = os.getenv("SUMMARIZER_SERVICE_ADDRESS", "")
+SUMMARIZER_SERVICE_AUTHKEY = os.getenv("SUMMARIZER_SERVICE_AUTHKEY")
+SUMMARIZER_SERVICE_TIMEOUT = 600
+SUMMARIZER_SERVICE_MAX_TEXTS = 64
+SUMMARIZER_TORCH_THREADS = int(os.getenv("SUMMARIZER_TORCH_THREADS", 0)) or None
+
+# Game covers are stored by the hash of their content in media/covers, in every size below (the box the cover is shrunk
+# into, its proportions are kept), each in WebP and JPEG. "large" is the one saved in the database and shown on the game
+# page, "medium" goes to the explore page and the library, "small" to the chatbot's list. COVER_FORMAT is the one sent
+# to the browser
+COVER_SIZES = {"small": (96, 128), "medium": (400, 520), "large": (640, 900)}
+COVER_FORMAT = os.getenv("COVER_FORMAT", "webp")
+COVER_WEBP_QUALITY = 80
+COVER_JPEG_QUALITY = 85
+# How many covers are decoded and resized at the same time (in a pool of threads, next to the event loop of the scrapers)
+COVER_WORKERS = int(os.getenv("COVER_WORKERS", 2))
+
+# The list of games in a compilation is scraped again when it's older than this
+COMPILATION_MAX_AGE_DAYS = 30
+# How many games of a compilation are imported at the same time by "Import all"
+COMPILATION_IMPORT_CONCURRENCY = int(os.getenv("COMPILATION_IMPORT_CONCURRENCY", 4))
+
+# "python manage.py refresh_catalog" refreshes CATALOG_REFRESH_CONCURRENCY games at a time, the ones not refreshed for
+# CATALOG_REFRESH_STALE_DAYS days first. Its progress is kept in CATALOG_REFRESH_CHECKPOINT
+CATALOG_REFRESH_CONCURRENCY = int(os.getenv("CATALOG_REFRESH_CONCURRENCY", 4))
+CATALOG_REFRESH_STALE_DAYS = 7
+CATALOG_REFRESH_CHECKPOINT = os.path.join(BASE_DIR, ".cache", "refresh_catalog.json")
+
 handler404 = "app.views.react_404"
 handler500 = "app.views.react_500"
 handler403 = "app.views.react_403"
 handler400 = "app.views.react_400"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
@@ -2,13 +2,14 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from app.views import react_index
+from app.views import legacy_result_thumbnail, react_index
 import os
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('app/', include('app.urls')),
     path('', react_index, name='home'),
+    path('media/results/result_<int:n>.png', legacy_result_thumbnail),
     re_path(r'^(?!media/|static/).*$', react_index),
 ]
 